@@ -42,6 +42,13 @@ class Settings(BaseSettings):
     STOCK_DATA_CACHE_HOURS: int = 4  # 股價資料快取時間（小時）
     CRYPTO_DATA_CACHE_MINUTES: int = 15  # 幣價資料快取時間（分鐘）
     HISTORY_DEFAULT_YEARS: int = 10  # 歷史資料預設年數
+    HISTORY_STORE: str = "db"  # db：stock_prices；arrow：另存 Arrow 欄式檔讀取（需要 pyarrow）
+    HISTORY_STORE_DIR: str = "data/history"
+    # stock_prices 另建 date 的 BRIN 索引（跨代號依日期掃描時用；重建時改依日期排列）
+    STOCK_PRICES_BRIN: bool = False
+    
+    # 臨時休市（颱風假等），格式 "tw:2026-07-24,us:2026-01-09"，見 app/utils/market_calendar.py
+    MARKET_EXTRA_CLOSURES: str = ""
     
     # 技術指標預設參數
     MA_SHORT: int = 20
@@ -61,6 +68,21 @@ class Settings(BaseSettings):
     BREAKOUT_THRESHOLD: float = 2.0  # 突破預警門檻 (%)
     VOLUME_ALERT_RATIO: float = 2.0  # 量比警戒倍數
     
+    # 多 worker 時只有取得鎖的行程執行排程（PostgreSQL advisory lock；SQLite 用 lock file）
+    SCHEDULER_LEADER_RETRY_SECONDS: int = 30
+    SCHEDULER_LOCK_FILE: Optional[str] = None  # 預設為 SQLite 資料庫檔旁的 .scheduler.lock
+    
+    # Prometheus /metrics（設定後需帶 Authorization: Bearer <token>）
+    METRICS_TOKEN: Optional[str] = None
+    
+    # 外部資料來源：live 連線、replay 回放（離線壓測用，見 app/data_sources/replay.py）
+    DATA_PROVIDER: str = "live"
+    REPLAY_DATA_DIR: str = "data/replay"
+    REPLAY_LATENCY_MS: float = 0.0
+    REPLAY_LATENCY_JITTER_MS: float = 0.0
+    REPLAY_ERROR_RATE: float = 0.0  # 0 ~ 1
+    REPLAY_SEED: int = 42
+    
     def get_admin_line_ids(self) -> List[str]:
         """取得管理員 LINE User ID 列表"""
         if not self.ADMIN_LINE_USER_IDS:
@@ -1,14 +1,28 @@
 """
 CoinGecko API 資料來源
 抓取加密貨幣價格資料
+
+- CoinGeckoClient：同步版（排程、CLI 用）
+- AsyncCoinGeckoClient：非同步版（API 路由用），共用連線池，
+  相同的請求同時進行時只打一次
+- 兩者共用同一個 token bucket，合計不超過免費 API 的速率限制
 """
+import asyncio
+import threading
+import weakref
 import requests
+import httpx
 import pandas as pd
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any, List
+from typing import AsyncGenerator, Optional, Dict, Any, List, Tuple
 import logging
 import time
 
+from app.data_sources.provider import get_provider
+from app.utils.metrics import track_upstream
+from app.utils.perf import span
+
 logger = logging.getLogger(__name__)
 
 # CoinGecko API 基礎 URL
@@ -22,34 +36,256 @@ CRYPTO_MAP = {
     "ETHEREUM": "ethereum",
 }
 
+# 免費 API 限制：~30 次/分鐘，允許短暫連續 3 次
+RATE_PER_SECOND = 0.5
+BURST = 3
+
+REQUEST_TIMEOUT = 15
+
+# CoinGecko OHLC 只支援特定天數
+OHLC_VALID_DAYS = [1, 7, 14, 30, 90, 180, 365]
+
+COIN_INFO_PARAMS = {
+    "localization": "false",
+    "tickers": "false",
+    "community_data": "false",
+    "developer_data": "false",
+}
+
+
+class TokenBucket:
+    """
+    Token bucket 速率限制（線程安全，同步與非同步共用）
+    
+    取 token 時在鎖內先預約、算出需要等待的秒數；
+    同步呼叫用 time.sleep，非同步呼叫用 asyncio.sleep，不會卡住 event loop
+    """
+    
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def _reserve(self) -> float:
+        """預約一個 token，返回需等待的秒數"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+    
+    def acquire(self):
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+    
+    async def acquire_async(self):
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+# 同步與非同步客戶端共用
+rate_limiter = TokenBucket(RATE_PER_SECOND, BURST)
+
+
+# ============================================================
+# 參數與回應解析（同步、非同步共用）
+# ============================================================
+
+def _operation(endpoint: str) -> str:
+    """指標用的 endpoint 名稱：coins/bitcoin/ohlc -> coins/{id}/ohlc，避免每個幣一組標籤"""
+    parts = endpoint.strip("/").split("/")
+    if parts[0] == "coins" and len(parts) > 1:
+        parts[1] = "{id}"
+    return "/".join(parts)
+
+
+def _coin_ids(symbols: List[str]) -> Tuple[List[str], Dict[str, str]]:
+    """代號列表轉 CoinGecko ID（去重排序，相同集合會產生相同請求）"""
+    symbol_map: Dict[str, str] = {}
+    for symbol in symbols:
+        coin_id = CRYPTO_MAP.get(symbol.upper())
+        if coin_id and coin_id not in symbol_map:
+            symbol_map[coin_id] = symbol.upper()
+    return sorted(symbol_map), symbol_map
+
+
+def _price_params(coin_ids: List[str]) -> dict:
+    return {
+        "ids": ",".join(coin_ids),
+        "vs_currencies": "usd",
+        "include_24hr_change": "true",
+        "include_24hr_vol": "true",
+        "include_market_cap": "true",
+    }
+
+
+def _parse_price(data: Dict, symbol_map: Dict[str, str]) -> Dict[str, Any]:
+    result = {}
+    for coin_id, values in data.items():
+        symbol = symbol_map.get(coin_id, coin_id.upper())
+        result[symbol] = {
+            "price": values.get("usd"),
+            "change_24h": values.get("usd_24h_change"),
+            "volume_24h": values.get("usd_24h_vol"),
+            "market_cap": values.get("usd_market_cap"),
+        }
+    return result
+
+
+def _parse_coin_info(symbol: str, data: Dict) -> Dict[str, Any]:
+    market_data = data.get("market_data", {})
+    
+    return {
+        "symbol": symbol.upper(),
+        "name": data.get("name"),
+        "current_price": market_data.get("current_price", {}).get("usd"),
+        "market_cap": market_data.get("market_cap", {}).get("usd"),
+        "market_cap_rank": market_data.get("market_cap_rank"),
+        "total_volume": market_data.get("total_volume", {}).get("usd"),
+        "high_24h": market_data.get("high_24h", {}).get("usd"),
+        "low_24h": market_data.get("low_24h", {}).get("usd"),
+        "price_change_24h": market_data.get("price_change_24h"),
+        "price_change_percentage_24h": market_data.get("price_change_percentage_24h"),
+        "price_change_percentage_7d": market_data.get("price_change_percentage_7d"),
+        "price_change_percentage_30d": market_data.get("price_change_percentage_30d"),
+        "price_change_percentage_1y": market_data.get("price_change_percentage_1y"),
+        "ath": market_data.get("ath", {}).get("usd"),
+        "ath_date": market_data.get("ath_date", {}).get("usd"),
+        "ath_change_percentage": market_data.get("ath_change_percentage", {}).get("usd"),
+        "atl": market_data.get("atl", {}).get("usd"),
+        "atl_date": market_data.get("atl_date", {}).get("usd"),
+        "circulating_supply": market_data.get("circulating_supply"),
+        "total_supply": market_data.get("total_supply"),
+        "last_updated": data.get("last_updated"),
+    }
+
+
+def _market_chart_params(days: int) -> dict:
+    return {
+        "vs_currency": "usd",
+        "days": min(days, 365),  # 免費 API 限制
+        "interval": "daily",
+    }
+
+
+def _parse_market_chart(symbol: str, data: Dict) -> Optional[pd.DataFrame]:
+    prices = data.get("prices", [])
+    volumes = data.get("total_volumes", [])
+    market_caps = data.get("market_caps", [])
+    
+    if not prices:
+        return None
+    
+    records = []
+    for i, (timestamp, price) in enumerate(prices):
+        record = {
+            "date": datetime.fromtimestamp(timestamp / 1000).date(),
+            "price": price,
+            "volume_24h": volumes[i][1] if i < len(volumes) else None,
+            "market_cap": market_caps[i][1] if i < len(market_caps) else None,
+        }
+        records.append(record)
+    
+    df = pd.DataFrame(records)
+    df["symbol"] = symbol.upper()
+    
+    # 移除重複日期（保留最後一筆）
+    df = df.drop_duplicates(subset=["date"], keep="last")
+    df = df.sort_values("date").reset_index(drop=True)
+    
+    return df
+
+
+def _range_params(start: datetime, end: datetime) -> dict:
+    return {
+        "vs_currency": "usd",
+        "from": int(start.timestamp()),
+        "to": int(end.timestamp()),
+    }
+
+
+def _parse_points(data: Dict) -> Optional[pd.DataFrame]:
+    """
+    market_chart/range 原始資料點（不合併）
+
+    CoinGecko 依區間長度自動決定粒度：1 天內 5 分鐘、90 天內每小時、更長每日
+    """
+    prices = data.get("prices", [])
+    if not prices:
+        return None
+    
+    df = pd.DataFrame(prices, columns=["timestamp", "price"])
+    for key, col in (("total_volumes", "volume_24h"), ("market_caps", "market_cap")):
+        values = pd.DataFrame(data.get(key, []), columns=["timestamp", col])
+        df = df.merge(values, on="timestamp", how="left") if not values.empty else df.assign(**{col: None})
+    
+    df["timestamp"] = pd.to_datetime(df["timestamp"], unit="ms", utc=True)
+    return df.sort_values("timestamp").reset_index(drop=True)
+
+
+def _ohlc_params(days: int) -> dict:
+    return {
+        "vs_currency": "usd",
+        "days": min(OHLC_VALID_DAYS, key=lambda x: abs(x - days)),
+    }
+
+
+def _parse_ohlc(symbol: str, data: List) -> Optional[pd.DataFrame]:
+    if not data:
+        return None
+    
+    records = []
+    for item in data:
+        timestamp, open_p, high, low, close = item
+        records.append({
+            "date": datetime.fromtimestamp(timestamp / 1000).date(),
+            "open": open_p,
+            "high": high,
+            "low": low,
+            "close": close,
+        })
+    
+    df = pd.DataFrame(records)
+    df["symbol"] = symbol.upper()
+    
+    # 移除重複日期
+    df = df.drop_duplicates(subset=["date"], keep="last")
+    df = df.sort_values("date").reset_index(drop=True)
+    
+    return df
+
 
 class CoinGeckoClient:
     """CoinGecko API 客戶端"""
     
     def __init__(self):
-        self.session = requests.Session()
+        self.session = get_provider().mount(requests.Session())
         self.session.headers.update({
             "Accept": "application/json",
         })
-        self._last_request_time = 0
-        self._min_request_interval = 1.5  # 免費 API 限制：~30 次/分鐘
     
     def _rate_limit(self):
-        """速率限制"""
-        elapsed = time.time() - self._last_request_time
-        if elapsed < self._min_request_interval:
-            time.sleep(self._min_request_interval - elapsed)
-        self._last_request_time = time.time()
+        """速率限制（與非同步客戶端共用 token bucket）"""
+        rate_limiter.acquire()
     
     def _get(self, endpoint: str, params: dict = None) -> Optional[Dict]:
         """發送 GET 請求"""
-        self._rate_limit()
+        with span("coingecko_wait"):
+            self._rate_limit()
         
         try:
             url = f"{BASE_URL}/{endpoint}"
             logger.info(f"CoinGecko API 請求: {url}")
-            response = self.session.get(url, params=params, timeout=15)
-            response.raise_for_status()
+            with span("coingecko"), track_upstream("coingecko", _operation(endpoint)):
+                response = self.session.get(url, params=params, timeout=REQUEST_TIMEOUT)
+                response.raise_for_status()
             return response.json()
         except requests.exceptions.Timeout as e:
             logger.error(f"CoinGecko API 請求超時: {e}")
@@ -68,52 +304,26 @@ class CoinGeckoClient:
     
     def get_current_price(self, symbols: List[str]) -> Optional[Dict[str, Any]]:
         """
-        取得即時價格
+        取得即時價格（所有代號一次 simple/price 請求）
         
         Args:
             symbols: 代號列表 (如 ["BTC", "ETH"])
-            
+        
         Returns:
             {
                 "BTC": {"price": 67850, "change_24h": 2.35, ...},
                 "ETH": {"price": 3450, "change_24h": 1.82, ...}
             }
         """
-        # 轉換代號
-        coin_ids = []
-        symbol_map = {}
-        for symbol in symbols:
-            coin_id = self.get_coin_id(symbol)
-            if coin_id:
-                coin_ids.append(coin_id)
-                symbol_map[coin_id] = symbol.upper()
-        
+        coin_ids, symbol_map = _coin_ids(symbols)
         if not coin_ids:
             return None
         
-        params = {
-            "ids": ",".join(coin_ids),
-            "vs_currencies": "usd",
-            "include_24hr_change": "true",
-            "include_24hr_vol": "true",
-            "include_market_cap": "true",
-        }
-        
-        data = self._get("simple/price", params)
+        data = self._get("simple/price", _price_params(coin_ids))
         if not data:
             return None
         
-        result = {}
-        for coin_id, values in data.items():
-            symbol = symbol_map.get(coin_id, coin_id.upper())
-            result[symbol] = {
-                "price": values.get("usd"),
-                "change_24h": values.get("usd_24h_change"),
-                "volume_24h": values.get("usd_24h_vol"),
-                "market_cap": values.get("usd_market_cap"),
-            }
-        
-        return result
+        return _parse_price(data, symbol_map)
     
     def get_coin_info(self, symbol: str) -> Optional[Dict[str, Any]]:
         """
@@ -121,7 +331,7 @@ class CoinGeckoClient:
         
         Args:
             symbol: 代號 (如 BTC, ETH)
-            
+        
         Returns:
             包含價格、市值、歷史高點等資訊
         """
@@ -130,42 +340,8 @@ class CoinGeckoClient:
             logger.warning(f"不支援的加密貨幣: {symbol}")
             return None
         
-        params = {
-            "localization": "false",
-            "tickers": "false",
-            "community_data": "false",
-            "developer_data": "false",
-        }
-        
-        data = self._get(f"coins/{coin_id}", params)
-        if not data:
-            return None
-        
-        market_data = data.get("market_data", {})
-        
-        return {
-            "symbol": symbol.upper(),
-            "name": data.get("name"),
-            "current_price": market_data.get("current_price", {}).get("usd"),
-            "market_cap": market_data.get("market_cap", {}).get("usd"),
-            "market_cap_rank": market_data.get("market_cap_rank"),
-            "total_volume": market_data.get("total_volume", {}).get("usd"),
-            "high_24h": market_data.get("high_24h", {}).get("usd"),
-            "low_24h": market_data.get("low_24h", {}).get("usd"),
-            "price_change_24h": market_data.get("price_change_24h"),
-            "price_change_percentage_24h": market_data.get("price_change_percentage_24h"),
-            "price_change_percentage_7d": market_data.get("price_change_percentage_7d"),
-            "price_change_percentage_30d": market_data.get("price_change_percentage_30d"),
-            "price_change_percentage_1y": market_data.get("price_change_percentage_1y"),
-            "ath": market_data.get("ath", {}).get("usd"),
-            "ath_date": market_data.get("ath_date", {}).get("usd"),
-            "ath_change_percentage": market_data.get("ath_change_percentage", {}).get("usd"),
-            "atl": market_data.get("atl", {}).get("usd"),
-            "atl_date": market_data.get("atl_date", {}).get("usd"),
-            "circulating_supply": market_data.get("circulating_supply"),
-            "total_supply": market_data.get("total_supply"),
-            "last_updated": data.get("last_updated"),
-        }
+        data = self._get(f"coins/{coin_id}", COIN_INFO_PARAMS)
+        return _parse_coin_info(symbol, data) if data else None
     
     def get_market_chart(
         self,
@@ -178,7 +354,7 @@ class CoinGeckoClient:
         Args:
             symbol: 代號 (如 BTC, ETH)
             days: 天數 (最多 365 天，免費 API 限制)
-            
+        
         Returns:
             DataFrame with columns: date, price, volume, market_cap
         """
@@ -186,42 +362,37 @@ class CoinGeckoClient:
         if not coin_id:
             return None
         
-        params = {
-            "vs_currency": "usd",
-            "days": min(days, 365),  # 免費 API 限制
-            "interval": "daily",
-        }
+        data = self._get(f"coins/{coin_id}/market_chart", _market_chart_params(days))
+        return _parse_market_chart(symbol, data) if data else None
+    
+    def get_market_chart_range(
+        self,
+        symbol: str,
+        start: datetime,
+        end: datetime,
+    ) -> Optional[pd.DataFrame]:
+        """
+        取得區間內的原始價格點（免費 API 只能查最近 365 天）
         
-        data = self._get(f"coins/{coin_id}/market_chart", params)
-        if not data:
+        Args:
+            symbol: 代號
+            start / end: 區間（含時區的 datetime）
+            
+        Returns:
+            DataFrame with columns: timestamp (UTC), price, volume_24h, market_cap
+            區間內沒有資料時為空 DataFrame；請求失敗為 None
+        """
+        coin_id = self.get_coin_id(symbol)
+        if not coin_id:
             return None
         
-        # 解析資料
-        prices = data.get("prices", [])
-        volumes = data.get("total_volumes", [])
-        market_caps = data.get("market_caps", [])
-        
-        if not prices:
+        data = self._get(f"coins/{coin_id}/market_chart/range", _range_params(start, end))
+        if data is None:
             return None
-        
-        records = []
-        for i, (timestamp, price) in enumerate(prices):
-            record = {
-                "date": datetime.fromtimestamp(timestamp / 1000).date(),
-                "price": price,
-                "volume_24h": volumes[i][1] if i < len(volumes) else None,
-                "market_cap": market_caps[i][1] if i < len(market_caps) else None,
-            }
-            records.append(record)
-        
-        df = pd.DataFrame(records)
-        df["symbol"] = symbol.upper()
-        
-        # 移除重複日期（保留最後一筆）
-        df = df.drop_duplicates(subset=["date"], keep="last")
-        df = df.sort_values("date").reset_index(drop=True)
-        
-        return df
+        points = _parse_points(data)
+        if points is None:
+            return pd.DataFrame(columns=["timestamp", "price", "volume_24h", "market_cap"])
+        return points
     
     def get_ohlc(
         self,
@@ -234,7 +405,7 @@ class CoinGeckoClient:
         Args:
             symbol: 代號
             days: 天數 (1/7/14/30/90/180/365/max)
-            
+        
         Returns:
             DataFrame with columns: date, open, high, low, close
         """
@@ -242,43 +413,168 @@ class CoinGeckoClient:
         if not coin_id:
             return None
         
-        # CoinGecko OHLC 只支援特定天數
-        valid_days = [1, 7, 14, 30, 90, 180, 365]
-        days = min(valid_days, key=lambda x: abs(x - days))
+        data = self._get(f"coins/{coin_id}/ohlc", _ohlc_params(days))
+        return _parse_ohlc(symbol, data) if data else None
+    
+    def validate_symbol(self, symbol: str) -> bool:
+        """驗證代號是否支援"""
+        return self.get_coin_id(symbol) is not None
+
+
+@dataclass
+class _LoopPool:
+    """單一 event loop 的連線池與進行中的請求"""
+    client: httpx.AsyncClient
+    closer: AsyncGenerator[None, None]
+    inflight: Dict[Tuple, asyncio.Future] = field(default_factory=dict)
+
+
+async def _close_with_loop(client: httpx.AsyncClient) -> AsyncGenerator[None, None]:
+    """
+    連線池的關閉掛勾
+
+    先 await 一次停在 yield；loop 結束時 shutdown_asyncgens（asyncio.run 會呼叫）
+    在同一個 loop 上結束這個 generator，finally 裡關閉連線池
+    """
+    try:
+        yield
+    finally:
+        await client.aclose()
+
+
+async def _discard(pool: _LoopPool):
+    """loop 已關閉（沒有經過 shutdown_asyncgens）的連線池：結束關閉掛勾，socket 只能等回收"""
+    try:
+        await pool.closer.aclose()
+    except RuntimeError as e:
+        logger.warning(f"CoinGecko 連線池所屬的 event loop 已關閉，無法正常關閉: {e}")
+
+
+class AsyncCoinGeckoClient:
+    """
+    CoinGecko 非同步客戶端
+    
+    - 每個 event loop 各自一個 httpx.AsyncClient 連線池，loop 結束時在該 loop 上關閉
+      （關閉後的 loop 無法再關閉它的 socket，所以不能等到換 loop 才處理）
+    - 相同 endpoint + 參數的請求進行中時，後來的呼叫等同一個結果
+    """
+    
+    def __init__(self):
+        self._pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopPool]" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+    
+    async def _get_pool(self) -> _LoopPool:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            pool = self._pools.get(loop)
+            if pool is not None:
+                return pool
+            client = httpx.AsyncClient(
+                base_url=BASE_URL,
+                headers={"Accept": "application/json"},
+                timeout=REQUEST_TIMEOUT,
+                limits=httpx.Limits(max_connections=10, max_keepalive_connections=5),
+                transport=get_provider().async_transport(),
+            )
+            pool = self._pools[loop] = _LoopPool(client, _close_with_loop(client))
+            closed = [other for other in list(self._pools.keys()) if other.is_closed()]
+            abandoned = [self._pools.pop(other) for other in closed]
+        
+        await pool.closer.__anext__()
+        for stale in abandoned:
+            await _discard(stale)
+        return pool
+    
+    async def aclose(self):
+        """關閉目前 loop 的連線池（應用程式關閉時呼叫）"""
+        with self._lock:
+            pool = self._pools.pop(asyncio.get_running_loop(), None)
+        if pool is not None:
+            await pool.closer.aclose()
+    
+    async def _get(self, endpoint: str, params: dict = None) -> Optional[Any]:
+        """發送 GET 請求（合併進行中的相同請求）"""
+        pool = await self._get_pool()
+        key = (endpoint, tuple(sorted((params or {}).items())))
+        
+        pending = pool.inflight.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
         
-        params = {
-            "vs_currency": "usd",
-            "days": days,
-        }
+        future = asyncio.get_running_loop().create_future()
+        pool.inflight[key] = future
+        try:
+            result = await self._fetch(pool.client, endpoint, params)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            # 沒有其他等待者時避免 "exception was never retrieved"
+            future.exception()
+            raise
+        finally:
+            pool.inflight.pop(key, None)
+    
+    async def _fetch(self, client: httpx.AsyncClient, endpoint: str, params: Optional[dict]) -> Optional[Any]:
+        with span("coingecko_wait"):
+            await rate_limiter.acquire_async()
         
-        data = self._get(f"coins/{coin_id}/ohlc", params)
-        if not data:
+        try:
+            logger.info(f"CoinGecko API 請求: {BASE_URL}/{endpoint}")
+            with span("coingecko"), track_upstream("coingecko", _operation(endpoint)):
+                response = await client.get(f"/{endpoint}", params=params)
+                response.raise_for_status()
+            return response.json()
+        except httpx.TimeoutException as e:
+            logger.error(f"CoinGecko API 請求超時: {e}")
+            return None
+        except httpx.HTTPError as e:
+            logger.error(f"CoinGecko API 請求失敗: {e}")
+            return None
+    
+    async def get_current_price(self, symbols: List[str]) -> Optional[Dict[str, Any]]:
+        """取得即時價格（所有代號一次請求），格式同 CoinGeckoClient.get_current_price"""
+        coin_ids, symbol_map = _coin_ids(symbols)
+        if not coin_ids:
             return None
         
-        records = []
-        for item in data:
-            timestamp, open_p, high, low, close = item
-            records.append({
-                "date": datetime.fromtimestamp(timestamp / 1000).date(),
-                "open": open_p,
-                "high": high,
-                "low": low,
-                "close": close,
-            })
+        data = await self._get("simple/price", _price_params(coin_ids))
+        return _parse_price(data, symbol_map) if data else None
+    
+    async def get_price(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """取得單一代號即時價格"""
+        prices = await self.get_current_price([symbol])
+        return (prices or {}).get(symbol.upper())
+    
+    async def get_coin_info(self, symbol: str) -> Optional[Dict[str, Any]]:
+        coin_id = CRYPTO_MAP.get(symbol.upper())
+        if not coin_id:
+            logger.warning(f"不支援的加密貨幣: {symbol}")
+            return None
         
-        df = pd.DataFrame(records)
-        df["symbol"] = symbol.upper()
+        data = await self._get(f"coins/{coin_id}", COIN_INFO_PARAMS)
+        return _parse_coin_info(symbol, data) if data else None
+    
+    async def get_market_chart(self, symbol: str, days: int = 365) -> Optional[pd.DataFrame]:
+        coin_id = CRYPTO_MAP.get(symbol.upper())
+        if not coin_id:
+            return None
         
-        # 移除重複日期
-        df = df.drop_duplicates(subset=["date"], keep="last")
-        df = df.sort_values("date").reset_index(drop=True)
+        data = await self._get(f"coins/{coin_id}/market_chart", _market_chart_params(days))
+        return _parse_market_chart(symbol, data) if data else None
+    
+    async def get_ohlc(self, symbol: str, days: int = 365) -> Optional[pd.DataFrame]:
+        coin_id = CRYPTO_MAP.get(symbol.upper())
+        if not coin_id:
+            return None
         
-        return df
+        data = await self._get(f"coins/{coin_id}/ohlc", _ohlc_params(days))
+        return _parse_ohlc(symbol, data) if data else None
     
     def validate_symbol(self, symbol: str) -> bool:
-        """驗證代號是否支援"""
-        return self.get_coin_id(symbol) is not None
+        return symbol.upper() in CRYPTO_MAP
 
 
 # 建立全域客戶端實例
 coingecko = CoinGeckoClient()
+coingecko_async = AsyncCoinGeckoClient()
@@ -9,6 +9,8 @@ from typing import Optional, Dict, Any, List
 import logging
 import re
 
+from app.data_sources.provider import get_provider
+
 logger = logging.getLogger(__name__)
 
 
@@ -16,7 +18,7 @@ class FearGreedClient:
     """市場情緒指數客戶端"""
     
     def __init__(self):
-        self.session = requests.Session()
+        self.session = get_provider().mount(requests.Session())
         self.session.headers.update({
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
         })
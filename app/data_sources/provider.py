@@ -0,0 +1,82 @@
+"""
+外部資料來源的傳輸層
+====================
+YahooFinanceClient、CoinGeckoClient、FearGreedClient 只透過這一層取得原始資料，
+解析、快取、錯誤處理都留在各自的 client 裡：
+
+- ticker(symbol)：yfinance.Ticker 相容物件（history / info / dividends / get_dividends）
+- mount(session)：requests.Session 掛上傳輸 adapter（CoinGecko 同步、情緒指數、RSS）
+- async_transport()：httpx.AsyncClient 的 transport（CoinGecko 非同步、LINE 推播）
+
+DATA_PROVIDER=live（預設）直接連外；DATA_PROVIDER=replay 改用
+app.data_sources.replay，回放錄製或合成的資料，可設定延遲與錯誤率，
+讓整個 app（含排程、通知）可以離線壓測；LINE 推播等非 GET 請求只記錄不送出
+"""
+import logging
+import threading
+from typing import Optional
+
+import httpx
+import requests
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class DataProvider:
+    """資料來源介面"""
+    
+    name = ""
+    
+    def ticker(self, symbol: str):
+        """yfinance.Ticker 相容物件"""
+        raise NotImplementedError
+    
+    def mount(self, session: requests.Session) -> requests.Session:
+        """讓 session 的請求經過這個資料來源（live 不需要處理）"""
+        return session
+    
+    def async_transport(self) -> Optional[httpx.AsyncBaseTransport]:
+        """httpx.AsyncClient 用的 transport，None 表示 httpx 預設"""
+        return None
+
+
+class LiveProvider(DataProvider):
+    """直接連線 Yahoo / CoinGecko / CNN / Alternative.me"""
+    
+    name = "live"
+    
+    def ticker(self, symbol: str):
+        import yfinance as yf
+        return yf.Ticker(symbol)
+
+
+_provider: Optional[DataProvider] = None
+_provider_lock = threading.Lock()
+
+
+def get_provider() -> DataProvider:
+    """依 DATA_PROVIDER 設定建立（只建立一次）"""
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                _provider = _create_provider(settings.DATA_PROVIDER)
+    return _provider
+
+
+def _create_provider(name: str) -> DataProvider:
+    name = (name or "live").lower()
+    if name == "live":
+        return LiveProvider()
+    if name == "replay":
+        from app.data_sources.replay import ReplayProvider
+        provider = ReplayProvider.from_settings()
+        logger.warning(
+            f"⚠️ 使用 replay 資料來源（{provider.store.root}，"
+            f"延遲 {provider.latency_ms}±{provider.jitter_ms} ms，錯誤率 {provider.error_rate:.0%}），"
+            f"不會連線外部 API"
+        )
+        return provider
+    raise ValueError(f"未知的 DATA_PROVIDER: {name}（可用 live / replay）")
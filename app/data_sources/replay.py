@@ -0,0 +1,703 @@
+"""
+回放資料來源
+============
+DATA_PROVIDER=replay 時使用：不連外，回放 REPLAY_DATA_DIR 下錄製的回應，
+沒有錄製的代號 / 路徑改用固定 seed 合成的資料（同一代號每次都一樣）
+
+目錄結構：
+    yahoo/<SYMBOL>.csv.gz          日線（date, open, high, low, close, volume）
+    yahoo/<SYMBOL>.info.json       Ticker.info
+    yahoo/<SYMBOL>.dividends.csv   配息（date, amount）
+    http/<host>/<path>.json        HTTP GET 回應 body（不分 query 參數）
+
+非 GET 請求（LINE 推播等）不送出，記錄在 ReplayProvider.outbox 並回 200
+
+模擬上游狀況：
+    REPLAY_LATENCY_MS / REPLAY_LATENCY_JITTER_MS   每次呼叫的延遲
+    REPLAY_ERROR_RATE                              失敗比例（連線錯誤、503、429 輪流出現）
+    REPLAY_SEED                                    延遲與錯誤的亂數種子
+
+錄製（需要網路）：
+    python -m app.data_sources.replay record AAPL 2330.TW
+    python -m app.data_sources.replay record-url "https://api.alternative.me/fng/?limit=30"
+
+壓測：
+    DATA_PROVIDER=replay REPLAY_LATENCY_MS=200 REPLAY_ERROR_RATE=0.05 uvicorn app.main:app
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+import threading
+import time
+import zlib
+from collections import deque
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Deque, Dict, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+import httpx
+import numpy as np
+import pandas as pd
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+from app.config import settings
+from app.data_sources.provider import DataProvider
+
+logger = logging.getLogger(__name__)
+
+OHLCV_COLUMNS = ["date", "open", "high", "low", "close", "volume"]
+
+# 合成股票日線長度（約 10 年）與加密貨幣日線長度
+STOCK_ROWS = 2520
+CRYPTO_ROWS = 730
+
+CRYPTO_START_PRICES = {"bitcoin": 30000.0, "ethereum": 2000.0}
+
+# 注入錯誤的種類，依序輪流
+FAULTS = ("connect", "503", "429")
+
+# outbox 保留的非 GET 請求筆數
+OUTBOX_SIZE = 1000
+
+
+# ============================================================
+# 合成資料
+# ============================================================
+
+def last_business_day(today: Optional[date] = None) -> date:
+    """今天或之前最近的平日"""
+    d = today or date.today()
+    while d.weekday() >= 5:
+        d -= timedelta(days=1)
+    return d
+
+
+def symbol_seed(name: str) -> int:
+    return zlib.crc32(name.upper().encode())
+
+
+def synthetic_ohlcv(
+    rows: int = STOCK_ROWS,
+    seed: int = 42,
+    end: Optional[date] = None,
+    start_price: float = 100.0,
+    split: Optional[Tuple[int, float]] = (1500, 4.0),
+    business_days: bool = True,
+) -> pd.DataFrame:
+    """
+    產生可重現的日線資料（幾何布朗運動）
+
+    Args:
+        rows: K 棒數
+        seed: 亂數種子，相同參數必定產生相同資料
+        end: 最後一天（預設為今天；business_days 時為最近的平日）
+        split: (第幾根, 比率)，該根起價格除以比率、成交量乘上比率；None 表示不分割
+        business_days: True 只有平日（股票），False 每天都有（加密貨幣）
+    """
+    rng = np.random.default_rng(seed)
+    if business_days:
+        dates = pd.bdate_range(end=pd.Timestamp(last_business_day(end)), periods=rows)
+    else:
+        dates = pd.date_range(end=pd.Timestamp(end or date.today()), periods=rows)
+
+    # 年化報酬 8%、波動 25%
+    daily = rng.normal(0.08 / 252, 0.25 / np.sqrt(252), rows)
+    close = start_price * np.exp(np.cumsum(daily))
+
+    gap = rng.normal(0, 0.004, rows)
+    open_ = np.concatenate([[start_price], close[:-1]]) * (1 + gap)
+    spread = np.abs(rng.normal(0, 0.01, rows))
+    high = np.maximum(open_, close) * (1 + spread)
+    low = np.minimum(open_, close) * (1 - spread)
+    volume = rng.lognormal(15, 0.4, rows)
+
+    if split is not None:
+        at, ratio = split
+        factor = np.where(np.arange(rows) >= at, ratio, 1.0)
+        open_, high, low, close = open_ / factor, high / factor, low / factor, close / factor
+        volume = volume * factor
+
+    return pd.DataFrame({
+        "date": dates.date,
+        "open": np.round(open_, 4),
+        "high": np.round(high, 4),
+        "low": np.round(low, 4),
+        "close": np.round(close, 4),
+        "volume": volume.astype("int64"),
+    })
+
+
+def _sentiment_value(market: str, day: date) -> int:
+    return 10 + zlib.crc32(f"{market}:{day.isoformat()}".encode()) % 81
+
+
+def _sentiment_label(value: int) -> str:
+    if value <= 25:
+        return "Extreme Fear"
+    if value <= 45:
+        return "Fear"
+    if value <= 55:
+        return "Neutral"
+    if value <= 75:
+        return "Greed"
+    return "Extreme Greed"
+
+
+# ============================================================
+# 資料存放
+# ============================================================
+
+class ReplayStore:
+    """錄製資料的讀寫；沒有錄製的資料即時合成並留在記憶體"""
+    
+    def __init__(self, root: str):
+        self.root = root
+        self._frames: Dict[str, pd.DataFrame] = {}
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _safe(symbol: str) -> str:
+        return symbol.upper().replace("^", "_").replace("/", "_")
+    
+    def _yahoo_path(self, symbol: str, suffix: str) -> str:
+        return os.path.join(self.root, "yahoo", f"{self._safe(symbol)}{suffix}")
+    
+    def _http_path(self, host: str, path: str) -> str:
+        name = path.strip("/") or "index"
+        return os.path.join(self.root, "http", host, f"{name}.json")
+    
+    def _cached_frame(self, key: str, build) -> pd.DataFrame:
+        with self._lock:
+            df = self._frames.get(key)
+        if df is None:
+            df = build()
+            with self._lock:
+                df = self._frames.setdefault(key, df)
+        return df
+    
+    # ==================== Yahoo ====================
+    
+    def history(self, symbol: str) -> pd.DataFrame:
+        """完整日線（錄製優先，否則合成 10 年、無分割）"""
+        def build():
+            path = self._yahoo_path(symbol, ".csv.gz")
+            if os.path.exists(path):
+                df = pd.read_csv(path, compression="gzip")
+                df["date"] = pd.to_datetime(df["date"]).dt.date
+                return df
+            seed = symbol_seed(symbol)
+            # 匯率（TWD=X 等）給接近實際的水準，其餘 20 ~ 500
+            start_price = 30.0 if symbol.upper().endswith("=X") else 20.0 + seed % 480
+            return synthetic_ohlcv(seed=seed, start_price=start_price, split=None)
+    
+        return self._cached_frame(f"yahoo:{symbol.upper()}", build)
+    
+    def info(self, symbol: str) -> Dict[str, Any]:
+        path = self._yahoo_path(symbol, ".info.json")
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+    
+        df = self.history(symbol)
+        last, prev = df.iloc[-1], df.iloc[-2]
+        year = df.tail(252)
+        price = float(last["close"])
+        return {
+            "symbol": symbol.upper(),
+            "shortName": f"Replay {symbol.upper()}",
+            "longName": f"Replay {symbol.upper()} Inc.",
+            "currency": "TWD" if symbol.upper().endswith((".TW", ".TWO")) else "USD",
+            "currentPrice": price,
+            "regularMarketPrice": price,
+            "previousClose": float(prev["close"]),
+            "regularMarketPreviousClose": float(prev["close"]),
+            "open": float(last["open"]),
+            "dayHigh": float(last["high"]),
+            "dayLow": float(last["low"]),
+            "volume": int(last["volume"]),
+            "regularMarketVolume": int(last["volume"]),
+            "marketCap": int(price * 1e9),
+            "trailingPE": 20.0,
+            "dividendYield": 0.02,
+            "fiftyTwoWeekHigh": float(year["high"].max()),
+            "fiftyTwoWeekLow": float(year["low"].min()),
+            "sector": "Technology",
+            "industry": "Replay",
+        }
+    
+    def dividends(self, symbol: str) -> pd.DataFrame:
+        """配息（date, amount）；合成資料每季配 0.5%"""
+        path = self._yahoo_path(symbol, ".dividends.csv")
+        if os.path.exists(path):
+            df = pd.read_csv(path)
+            df["date"] = pd.to_datetime(df["date"]).dt.date
+            return df
+    
+        df = self.history(symbol)
+        picks = df.iloc[63::63]
+        return pd.DataFrame({
+            "date": picks["date"].to_numpy(),
+            "amount": np.round(picks["close"].to_numpy() * 0.005, 4),
+        })
+    
+    # ==================== HTTP ====================
+    
+    def crypto(self, coin_id: str) -> pd.DataFrame:
+        def build():
+            seed = symbol_seed(coin_id)
+            start = CRYPTO_START_PRICES.get(coin_id, 1.0 + seed % 100)
+            return synthetic_ohlcv(
+                rows=CRYPTO_ROWS, seed=seed, start_price=start, split=None, business_days=False,
+            )
+    
+        return self._cached_frame(f"crypto:{coin_id}", build)
+    
+    def http_body(self, host: str, path: str, params: Dict[str, str]) -> Optional[Any]:
+        """錄製的 JSON，沒有就合成；兩者都沒有返回 None（404）"""
+        recorded = self._http_path(host, path)
+        if os.path.exists(recorded):
+            with open(recorded, encoding="utf-8") as f:
+                return json.load(f)
+        return _synthetic_http(self, host, path, params)
+    
+    # ==================== 錄製 ====================
+    
+    def save_yahoo(self, symbol: str, history: pd.DataFrame, info: Dict, dividends: pd.DataFrame):
+        os.makedirs(os.path.join(self.root, "yahoo"), exist_ok=True)
+        history[OHLCV_COLUMNS].to_csv(self._yahoo_path(symbol, ".csv.gz"), index=False, compression="gzip")
+        with open(self._yahoo_path(symbol, ".info.json"), "w", encoding="utf-8") as f:
+            json.dump(info, f, ensure_ascii=False, default=str)
+        dividends[["date", "amount"]].to_csv(self._yahoo_path(symbol, ".dividends.csv"), index=False)
+    
+    def save_http(self, url: str, body: Any) -> str:
+        parts = urlsplit(url)
+        path = self._http_path(parts.hostname, parts.path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(body, f, ensure_ascii=False)
+        return path
+
+
+def _ms(day: date) -> int:
+    return int(datetime(day.year, day.month, day.day, tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def _chart(df: pd.DataFrame) -> Dict[str, list]:
+    stamps = [_ms(d) for d in df["date"]]
+    return {
+        "prices": [[t, float(c)] for t, c in zip(stamps, df["close"])],
+        "total_volumes": [[t, float(v * c)] for t, v, c in zip(stamps, df["volume"], df["close"])],
+        "market_caps": [[t, float(c * 1e7)] for t, c in zip(stamps, df["close"])],
+    }
+
+
+def _synthetic_http(store: ReplayStore, host: str, path: str, params: Dict[str, str]) -> Optional[Any]:
+    """CoinGecko / Alternative.me / CNN 的合成回應，格式與實際 API 相同"""
+    parts = [p for p in path.split("/") if p]
+
+    if host == "api.coingecko.com" and parts[:2] == ["api", "v3"]:
+        route = parts[2:]
+
+        if route == ["simple", "price"]:
+            result = {}
+            for coin_id in filter(None, params.get("ids", "").split(",")):
+                df = store.crypto(coin_id)
+                last, prev = df.iloc[-1], df.iloc[-2]
+                result[coin_id] = {
+                    "usd": float(last["close"]),
+                    "usd_24h_change": float((last["close"] / prev["close"] - 1) * 100),
+                    "usd_24h_vol": float(last["volume"] * last["close"]),
+                    "usd_market_cap": float(last["close"] * 1e7),
+                }
+            return result
+
+        if len(route) >= 2 and route[0] == "coins":
+            df = store.crypto(route[1])
+
+            if len(route) == 2:
+                last, prev = df.iloc[-1], df.iloc[-2]
+                price = float(last["close"])
+
+                def pct(days):
+                    return float((price / df["close"].iloc[-days - 1] - 1) * 100)
+
+                ath = df.loc[df["high"].idxmax()]
+                atl = df.loc[df["low"].idxmin()]
+                return {
+                    "id": route[1],
+                    "symbol": route[1][:3],
+                    "name": route[1].title(),
+                    "last_updated": datetime.now(timezone.utc).isoformat(),
+                    "market_data": {
+                        "current_price": {"usd": price},
+                        "market_cap": {"usd": price * 1e7},
+                        "market_cap_rank": 1 + symbol_seed(route[1]) % 100,
+                        "total_volume": {"usd": float(last["volume"] * price)},
+                        "high_24h": {"usd": float(last["high"])},
+                        "low_24h": {"usd": float(last["low"])},
+                        "price_change_24h": float(price - prev["close"]),
+                        "price_change_percentage_24h": pct(1),
+                        "price_change_percentage_7d": pct(7),
+                        "price_change_percentage_30d": pct(30),
+                        "price_change_percentage_1y": pct(365),
+                        "ath": {"usd": float(ath["high"])},
+                        "ath_date": {"usd": f"{ath['date']}T00:00:00.000Z"},
+                        "ath_change_percentage": {"usd": float((price / ath["high"] - 1) * 100)},
+                        "atl": {"usd": float(atl["low"])},
+                        "atl_date": {"usd": f"{atl['date']}T00:00:00.000Z"},
+                        "circulating_supply": 1e7,
+                        "total_supply": 2.1e7,
+                    },
+                }
+
+            if route[2:] == ["market_chart"]:
+                days = int(params.get("days", 30))
+                return _chart(df.tail(days + 1))
+
+            if route[2:] == ["market_chart", "range"]:
+                start = datetime.fromtimestamp(int(params["from"]), timezone.utc).date()
+                end = datetime.fromtimestamp(int(params["to"]), timezone.utc).date()
+                return _chart(df[(df["date"] >= start) & (df["date"] <= end)])
+
+            if route[2:] == ["ohlc"]:
+                days = int(params.get("days", 30))
+                return [
+                    [_ms(r.date), float(r.open), float(r.high), float(r.low), float(r.close)]
+                    for r in df.tail(days).itertuples()
+                ]
+
+        return None
+
+    if host == "api.alternative.me" and parts == ["fng"]:
+        limit = int(params.get("limit", 1))
+        today = date.today()
+        data = []
+        for i in range(limit):
+            day = today - timedelta(days=i)
+            value = _sentiment_value("crypto", day)
+            data.append({
+                "value": str(value),
+                "value_classification": _sentiment_label(value),
+                "timestamp": str(_ms(day) // 1000),
+            })
+        return {"name": "Fear and Greed Index", "data": data}
+
+    if host == "production.dataviz.cnn.io" and parts[:3] == ["index", "fearandgreed", "graphdata"]:
+        value = _sentiment_value("stock", date.today())
+        return {
+            "fear_and_greed": {
+                "score": float(value),
+                "rating": _sentiment_label(value).lower(),
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+            }
+        }
+
+    return None
+
+
+# ============================================================
+# yfinance.Ticker 相容物件
+# ============================================================
+
+def _to_date(value) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return pd.Timestamp(value).date()
+
+
+def _period_start(period: str, last: date) -> Optional[date]:
+    """yfinance period 對應的起始日（天數型別另外處理）"""
+    if period == "max":
+        return None
+    if period == "ytd":
+        return date(last.year, 1, 1)
+    if period.endswith("mo"):
+        return last - timedelta(days=int(period[:-2]) * 31)
+    if period.endswith("wk"):
+        return last - timedelta(weeks=int(period[:-2]))
+    if period.endswith("y"):
+        return last - timedelta(days=int(period[:-1]) * 365)
+    raise ValueError(f"不支援的 period: {period}")
+
+
+class ReplayTicker:
+    """只實作 app 用到的部分：history、info、dividends、get_dividends"""
+    
+    def __init__(self, provider: "ReplayProvider", symbol: str):
+        self._provider = provider
+        self.ticker = symbol.upper()
+    
+    def history(
+        self,
+        period: str = "1mo",
+        interval: str = "1d",
+        start=None,
+        end=None,
+        auto_adjust: bool = True,
+        **kwargs,
+    ) -> pd.DataFrame:
+        self._provider.simulate_sync(f"yahoo:{self.ticker}")
+        df = self._provider.store.history(self.ticker)
+    
+        if start is not None:
+            df = df[df["date"] >= _to_date(start)]
+            if end is not None:
+                df = df[df["date"] < _to_date(end)]  # yfinance 的 end 不含當天
+        elif period.endswith("d"):
+            df = df.tail(int(period[:-1]))
+        else:
+            since = _period_start(period, df["date"].iloc[-1])
+            if since is not None:
+                df = df[df["date"] > since]
+    
+        result = pd.DataFrame({
+            "Open": df["open"].to_numpy(dtype=float),
+            "High": df["high"].to_numpy(dtype=float),
+            "Low": df["low"].to_numpy(dtype=float),
+            "Close": df["close"].to_numpy(dtype=float),
+            "Volume": df["volume"].to_numpy(dtype="int64"),
+            "Dividends": 0.0,
+            "Stock Splits": 0.0,
+        }, index=pd.DatetimeIndex(pd.to_datetime(df["date"]), name="Date"))
+        if not auto_adjust:
+            result.insert(4, "Adj Close", result["Close"])
+        return result
+    
+    @property
+    def info(self) -> Dict[str, Any]:
+        self._provider.simulate_sync(f"yahoo:{self.ticker}")
+        return self._provider.store.info(self.ticker)
+    
+    @property
+    def dividends(self) -> pd.Series:
+        return self.get_dividends(period="max")
+    
+    def get_dividends(self, period: str = "max") -> pd.Series:
+        self._provider.simulate_sync(f"yahoo:{self.ticker}")
+        df = self._provider.store.dividends(self.ticker)
+        if not df.empty and period != "max":
+            since = _period_start(period, date.today())
+            df = df[df["date"] > since]
+        return pd.Series(
+            df["amount"].to_numpy(dtype=float),
+            index=pd.DatetimeIndex(pd.to_datetime(df["date"]), name="Date"),
+            name="Dividends",
+        )
+
+
+# ============================================================
+# HTTP 傳輸
+# ============================================================
+
+class ReplayAdapter(BaseAdapter):
+    """requests 的傳輸 adapter：回放 JSON，不建立連線"""
+    
+    def __init__(self, provider: "ReplayProvider"):
+        super().__init__()
+        self._provider = provider
+    
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        fault = self._provider.simulate_sync(request.url)
+        if fault == "connect":
+            raise requests.exceptions.ConnectionError("replay: injected connection error", request=request)
+    
+        if request.method != "GET":
+            status, body = self._provider.capture(request.method, request.url, request.body, fault)
+        else:
+            status, body = self._provider.respond(request.url, fault)
+        response = requests.Response()
+        response.status_code = status
+        response.reason = "OK" if status == 200 else "Replay"
+        response._content = body
+        response._content_consumed = True
+        response.headers = CaseInsensitiveDict({"Content-Type": "application/json"})
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+        return response
+    
+    def close(self):
+        pass
+
+
+class ReplayAsyncTransport(httpx.AsyncBaseTransport):
+    """httpx 的 transport：回放 JSON，延遲用 asyncio.sleep 不卡 event loop"""
+    
+    def __init__(self, provider: "ReplayProvider"):
+        self._provider = provider
+    
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        url = str(request.url)
+        fault = await self._provider.simulate_async(url)
+        if fault == "connect":
+            raise httpx.ConnectError("replay: injected connection error", request=request)
+    
+        if request.method != "GET":
+            status, body = self._provider.capture(request.method, url, await request.aread(), fault)
+        else:
+            status, body = self._provider.respond(url, fault)
+        return httpx.Response(
+            status, content=body, headers={"Content-Type": "application/json"}, request=request,
+        )
+
+
+# ============================================================
+# Provider
+# ============================================================
+
+class ReplayProvider(DataProvider):
+    """回放錄製 / 合成資料，並模擬延遲與錯誤"""
+    
+    name = "replay"
+    
+    def __init__(
+        self,
+        store: ReplayStore,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+        seed: int = 42,
+    ):
+        self.store = store
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._faults = 0
+        self._lock = threading.Lock()
+        # 攔下的非 GET 請求（LINE 推播等）：{time, method, url, body}
+        self.outbox: Deque[Dict[str, Any]] = deque(maxlen=OUTBOX_SIZE)
+    
+    @classmethod
+    def from_settings(cls) -> "ReplayProvider":
+        return cls(
+            ReplayStore(settings.REPLAY_DATA_DIR),
+            latency_ms=settings.REPLAY_LATENCY_MS,
+            jitter_ms=settings.REPLAY_LATENCY_JITTER_MS,
+            error_rate=settings.REPLAY_ERROR_RATE,
+            seed=settings.REPLAY_SEED,
+        )
+    
+    def _draw(self) -> Tuple[float, Optional[str]]:
+        """這次呼叫的延遲（秒）與要注入的錯誤"""
+        with self._lock:
+            delay = self.latency_ms + self._rng.uniform(-self.jitter_ms, self.jitter_ms)
+            fault = None
+            if self.error_rate > 0 and self._rng.random() < self.error_rate:
+                fault = FAULTS[self._faults % len(FAULTS)]
+                self._faults += 1
+        return max(0.0, delay) / 1000, fault
+    
+    def simulate_sync(self, target: str) -> Optional[str]:
+        """
+        同步呼叫的延遲與錯誤
+    
+        yfinance 呼叫（target 以 yahoo: 開頭）的任何錯誤都以 ConnectionError 拋出；
+        HTTP 呼叫返回錯誤種類，由 adapter 轉成對應的回應
+        """
+        delay, fault = self._draw()
+        if delay:
+            time.sleep(delay)
+        if fault and target.startswith("yahoo:"):
+            raise ConnectionError(f"replay: injected {fault} for {target}")
+        return fault
+    
+    async def simulate_async(self, target: str) -> Optional[str]:
+        delay, fault = self._draw()
+        if delay:
+            await asyncio.sleep(delay)
+        return fault
+    
+    def respond(self, url: str, fault: Optional[str] = None) -> Tuple[int, bytes]:
+        """(status, body)；fault 為 503 / 429 時直接回錯誤"""
+        if fault in ("503", "429"):
+            return int(fault), json.dumps({"error": f"replay: injected {fault}"}).encode()
+    
+        parts = urlsplit(url)
+        body = self.store.http_body(parts.hostname or "", parts.path, dict(parse_qsl(parts.query)))
+        if body is None:
+            return 404, json.dumps({"error": "replay: no recorded or synthetic data"}).encode()
+        return 200, json.dumps(body).encode()
+    
+    def capture(self, method: str, url: str, content, fault: Optional[str] = None) -> Tuple[int, bytes]:
+        """非 GET 請求只記錄在 outbox 不送出，回 200 空物件；fault 為 503 / 429 時回錯誤且不記錄"""
+        if fault in ("503", "429"):
+            return int(fault), json.dumps({"error": f"replay: injected {fault}"}).encode()
+    
+        if isinstance(content, str):
+            content = content.encode()
+        try:
+            body = json.loads(content) if content else None
+        except ValueError:
+            body = content.decode("utf-8", errors="replace")
+        self.outbox.append({"time": datetime.now(), "method": method, "url": url, "body": body})
+        logger.info(f"📭 replay: 攔下 {method} {url}（不送出）")
+        return 200, b"{}"
+    
+    def ticker(self, symbol: str) -> ReplayTicker:
+        return ReplayTicker(self, symbol)
+    
+    def mount(self, session: requests.Session) -> requests.Session:
+        adapter = ReplayAdapter(self)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+    
+    def async_transport(self) -> httpx.AsyncBaseTransport:
+        return ReplayAsyncTransport(self)
+
+
+# ============================================================
+# 錄製
+# ============================================================
+
+def record_symbol(store: ReplayStore, symbol: str, period: str = "10y"):
+    """從 Yahoo 錄製日線、info、配息"""
+    from app.data_sources.provider import LiveProvider
+
+    ticker = LiveProvider().ticker(symbol)
+    raw = ticker.history(period=period, auto_adjust=False).reset_index()
+    date_col = "Date" if "Date" in raw.columns else "Datetime"
+    history = pd.DataFrame({
+        "date": pd.to_datetime(raw[date_col]).dt.date,
+        "open": raw["Open"], "high": raw["High"], "low": raw["Low"], "close": raw["Close"],
+        "volume": raw["Volume"].fillna(0).astype("int64"),
+    })
+    dividends = ticker.dividends.reset_index()
+    dividends.columns = ["date", "amount"]
+    dividends["date"] = pd.to_datetime(dividends["date"]).dt.date
+    store.save_yahoo(symbol, history, ticker.info or {}, dividends)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="錄製 replay 資料（需要網路）")
+    sub = parser.add_subparsers(dest="command", required=True)
+    record = sub.add_parser("record", help="錄製 Yahoo 代號")
+    record.add_argument("symbols", nargs="+")
+    record.add_argument("--period", default="10y")
+    record_url = sub.add_parser("record-url", help="錄製 HTTP GET JSON")
+    record_url.add_argument("urls", nargs="+")
+    args = parser.parse_args()
+
+    store = ReplayStore(settings.REPLAY_DATA_DIR)
+    if args.command == "record":
+        for symbol in args.symbols:
+            record_symbol(store, symbol, args.period)
+            print(f"✅ {symbol}")
+    else:
+        for url in args.urls:
+            response = requests.get(url, timeout=30)
+            response.raise_for_status()
+            print(f"✅ {store.save_http(url, response.json())}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,14 +2,46 @@
 Yahoo Finance Ã¨Â³â€¡Ã¦â€“â„¢Ã¤Â¾â€ Ã¦ÂºÂ
 Ã¤Â½Â¿Ã§â€Â¨ yfinance Ã¥Â¥â€”Ã¤Â»Â¶Ã¦Å â€œÃ¥Ââ€“Ã§Â¾Å½Ã¨â€šÂ¡Ã¨Â³â€¡Ã¦â€“â„¢
 """
-import yfinance as yf
 import pandas as pd
-from datetime import datetime, timedelta
-from typing import Optional, Dict, Any, List
+import numpy as np
+from datetime import datetime, date, timedelta
+from typing import Optional, Dict, Any, List, Set
 import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from app.data_sources.provider import get_provider
+from app.utils.metrics import upstream
+from app.utils.perf import span
 
 logger = logging.getLogger(__name__)
 
+# track_missing() 期間，Yahoo 明確回報「沒有資料」的代號
+_missing_symbols: ContextVar[Optional[Set[str]]] = ContextVar("yahoo_missing_symbols", default=None)
+
+
+@contextmanager
+def track_missing():
+    """
+    記錄期間內 get_stock_history 收到空結果的代號
+
+    逾時、429、例外都只會回傳 None，不會出現在這裡；
+    SymbolResolver 靠它分辨「查無此代號」與「暫時抓不到」
+    """
+    found: Set[str] = set()
+    token = _missing_symbols.set(found)
+    try:
+        yield found
+    finally:
+        _missing_symbols.reset(token)
+
+
+def _record_missing(symbol: str):
+    found = _missing_symbols.get()
+    if found is not None:
+        found.add(symbol.upper())
+
+
 # Ã¥Â¸Â¸Ã§â€Â¨Ã¥ÂÂ°Ã¨â€šÂ¡Ã¤Â¸Â­Ã¦â€“â€¡Ã¥ÂÂÃ§Â¨Â±Ã¥Â°ÂÃ§â€¦Â§Ã¨Â¡Â¨
 TAIWAN_STOCK_NAMES = {
     # ===== 權值股 =====
@@ -209,6 +241,7 @@ class YahooFinanceClient:
     def __init__(self):
         pass
     
+    @upstream("yahoo")
     def get_stock_info(self, symbol: str) -> Optional[Dict[str, Any]]:
         """
         Ã¥Ââ€“Ã¥Â¾â€”Ã¨â€šÂ¡Ã§Â¥Â¨Ã¥Å¸ÂºÃ¦Å“Â¬Ã¨Â³â€¡Ã¨Â¨Å 
@@ -220,7 +253,7 @@ class YahooFinanceClient:
             Ã¨â€šÂ¡Ã§Â¥Â¨Ã¨Â³â€¡Ã¨Â¨Å Ã¥Â­â€”Ã¥â€¦Â¸Ã¯Â¼Å’Ã¥Å’â€¦Ã¥ÂÂ«Ã¥ÂÂÃ§Â¨Â±Ã£â‚¬ÂÃ¥Â¸â€šÃ¥â‚¬Â¼Ã§Â­â€°
         """
         try:
-            ticker = yf.Ticker(symbol)
+            ticker = get_provider().ticker(symbol)
             info = ticker.info or {}
             
             # Ã¥Ââ€“Ã¥Â¾â€”Ã¥ÂÂÃ§Â¨Â±Ã¯Â¼Å¡Ã¥â€žÂªÃ¥â€¦Ë†Ã¤Â½Â¿Ã§â€Â¨ longNameÃ¯Â¼Å’Ã§â€žÂ¶Ã¥Â¾Å’ shortName
@@ -272,6 +305,7 @@ class YahooFinanceClient:
                 }
             return None
     
+    @upstream("yahoo")
     def get_stock_history(
         self,
         symbol: str,
@@ -294,15 +328,17 @@ class YahooFinanceClient:
             - adj_close: Ã¥Ë†â€ Ã¥â€°Â²Ã¨ÂªÂ¿Ã¦â€¢Â´Ã¥Â¾Å’Ã¥Æ’Â¹Ã¦Â Â¼Ã¯Â¼Ë†Ã§â€Â¨Ã¦â€“Â¼Ã¥Å“â€“Ã¨Â¡Â¨Ã¯Â¼Å’Ã¤Â¸ÂÃ¥ÂÂ«Ã©â€¦ÂÃ¦ÂÂ¯Ã¯Â¼â€°
         """
         try:
-            ticker = yf.Ticker(symbol)
+            ticker = get_provider().ticker(symbol)
             
             # Ã¥Ââ€“Ã¥Â¾â€”Ã¥Å½Å¸Ã¥Â§â€¹Ã¥Æ’Â¹Ã¦Â Â¼
-            if start and end:
-                df_raw = ticker.history(start=start, end=end, auto_adjust=False)
-            else:
-                df_raw = ticker.history(period=period, auto_adjust=False)
+            with span("yahoo"):
+                if start and end:
+                    df_raw = ticker.history(start=start, end=end, auto_adjust=False)
+                else:
+                    df_raw = ticker.history(period=period, auto_adjust=False)
             
             if df_raw.empty:
+                _record_missing(symbol)
                 logger.warning(f"Ã§â€žÂ¡Ã¦Â­Â·Ã¥ÂÂ²Ã¨Â³â€¡Ã¦â€“â„¢: {symbol}")
                 return None
             
@@ -321,7 +357,8 @@ class YahooFinanceClient:
             df["volume"] = df_raw["Volume"].values if "Volume" in df_raw.columns else 0
             
             # Ã¥ÂÂµÃ¦Â¸Â¬Ã¤Â¸Â¦Ã¨ÂªÂ¿Ã¦â€¢Â´Ã¥Ë†â€ Ã¥â€°Â²Ã¯Â¼Ë†Ã¤Â¸ÂÃ¥ÂÂ«Ã©â€¦ÂÃ¦ÂÂ¯Ã¯Â¼â€°
-            df = self._detect_and_adjust_splits(df, symbol)
+            with span("splits"):
+                df = self._detect_and_adjust_splits(df, symbol)
             
             # Ã¥Å Â Ã¥â€¦Â¥Ã¨â€šÂ¡Ã§Â¥Â¨Ã¤Â»Â£Ã¨â„¢Å¸
             df["symbol"] = symbol.upper()
@@ -332,66 +369,94 @@ class YahooFinanceClient:
             logger.error(f"Ã¥Ââ€“Ã¥Â¾â€”Ã¦Â­Â·Ã¥ÂÂ²Ã¨Â³â€¡Ã¦â€“â„¢Ã¥Â¤Â±Ã¦â€¢â€” {symbol}: {e}")
             return None
     
+    @staticmethod
+    def detect_splits(df: pd.DataFrame) -> pd.DataFrame:
+        """
+        偵測價格資料中的股票分割（向量化）
+        
+        單日跌幅超過 40%，且前後收盤比接近 >= 2 的整數時視為分割
+        
+        Args:
+            df: 需有 date、close 欄位，且已依日期排序
+            
+        Returns:
+            DataFrame(date, ratio)，ratio 為分割比例（1 拆 ratio）
+        """
+        if len(df) < 2:
+            return pd.DataFrame(columns=["date", "ratio"])
+        
+        close = df["close"].astype(float).to_numpy()
+        prev, curr = close[:-1], close[1:]
+        
+        with np.errstate(divide="ignore", invalid="ignore"):
+            pct = curr / prev - 1
+            ratio = prev / curr
+        rounded = np.round(ratio)
+        
+        mask = (
+            (pct < -0.40)
+            & (curr > 0)
+            & (rounded >= 2)
+            & (np.abs(ratio - rounded) < 0.3)
+        )
+        idx = np.nonzero(mask)[0] + 1
+        
+        return pd.DataFrame({
+            "date": df["date"].to_numpy()[idx],
+            "ratio": rounded[mask].astype(int),
+        })
+    
+    @staticmethod
+    def apply_split_factors(df: pd.DataFrame, splits: pd.DataFrame) -> pd.Series:
+        """
+        依分割事件計算 adj_close（向量化）
+        
+        每一天的累積係數 = 該日之後所有分割比例的乘積
+        
+        Args:
+            df: 需有 date、close 欄位，且已依日期排序
+            splits: DataFrame(date, ratio)
+            
+        Returns:
+            與 df 同 index 的 adj_close Series
+        """
+        close = df["close"].astype(float).to_numpy()
+        
+        if splits is None or splits.empty or len(close) < 2:
+            return pd.Series(close, index=df.index)
+        
+        dates = pd.to_datetime(df["date"]).to_numpy()
+        split_idx = np.searchsorted(dates, pd.to_datetime(splits["date"]).to_numpy(), side="left")
+        ratios = splits["ratio"].astype(float).to_numpy()
+        
+        valid = (split_idx > 0) & (split_idx < len(close))
+        factors = np.ones(len(close))
+        np.multiply.at(factors, split_idx[valid] - 1, ratios[valid])
+        cumulative = np.cumprod(factors[::-1])[::-1]
+        
+        return pd.Series(close / cumulative, index=df.index)
+    
     def _detect_and_adjust_splits(self, df: pd.DataFrame, symbol: str) -> pd.DataFrame:
         """
-        Ã¥ÂÂµÃ¦Â¸Â¬Ã¥Æ’Â¹Ã¦Â Â¼Ã¦â€“Â·Ã¥Â´â€“Ã¤Â¸Â¦Ã¨ÂªÂ¿Ã¦â€¢Â´Ã¦Â­Â·Ã¥ÂÂ²Ã¥Æ’Â¹Ã¦Â Â¼Ã¯Â¼Ë†Ã¥ÂÂªÃ¨â„¢â€¢Ã§Ââ€ Ã¥Ë†â€ Ã¥â€°Â²Ã¯Â¼Å’Ã¤Â¸ÂÃ¥ÂÂ«Ã©â€¦ÂÃ¦ÂÂ¯Ã¯Â¼â€°
+        偵測股票分割並產生 adj_close
         
-        Ã§â€¢Â¶Ã¥ÂÂµÃ¦Â¸Â¬Ã¥Ë†Â°Ã¥Æ’Â¹Ã¦Â Â¼Ã§ÂªÂÃ§â€žÂ¶Ã¤Â¸â€¹Ã¨Â·Å’Ã¨Â¶â€¦Ã©ÂÅ½ 40%Ã¯Â¼Ë†Ã¥ÂÂ¯Ã¨Æ’Â½Ã¦ËœÂ¯Ã¥Ë†â€ Ã¥â€°Â²Ã¯Â¼â€°Ã¯Â¼Å’
-        Ã¦Å“Æ’Ã¨â€¡ÂªÃ¥â€¹â€¢Ã¨ÂªÂ¿Ã¦â€¢Â´Ã¥Ë†â€ Ã¥â€°Â²Ã¥â€°ÂÃ§Å¡â€žÃ¥Æ’Â¹Ã¦Â Â¼Ã¯Â¼Å’Ã¤Â½Â¿Ã¦â€¢Â´Ã¥â‚¬â€¹Ã¥ÂºÂÃ¥Ë†â€”Ã©â‚¬Â£Ã§ÂºÅ’Ã£â‚¬â€š
+        分割前的價格除以累積分割比例，避免分割造成報酬率計算錯誤
         """
+        df = df.copy()
         if len(df) < 2:
-            df['adj_close'] = df['close'].copy()
+            df["adj_close"] = df["close"].astype(float)
             return df
         
-        df = df.copy()
-        df = df.sort_values('date').reset_index(drop=True)
-        
-        # Ã¨Â¨Ë†Ã§Â®â€”Ã¦Â¯ÂÃ¦â€”Â¥Ã¦Â¼Â²Ã¨Â·Å’Ã¥Â¹â€¦
-        df['pct_change'] = df['close'].pct_change()
-        
-        # Ã¥ÂÂµÃ¦Â¸Â¬Ã¥Ë†â€ Ã¥â€°Â²Ã©Â»Å¾Ã¯Â¼Ë†Ã¥Æ’Â¹Ã¦Â Â¼Ã¤Â¸â€¹Ã¨Â·Å’Ã¨Â¶â€¦Ã©ÂÅ½ 40%Ã¯Â¼â€°
-        split_indices = []
-        for i in range(1, len(df)):
-            pct = df.loc[i, 'pct_change']
-            if pd.notna(pct) and pct < -0.40:
-                prev_close = float(df.loc[i-1, 'close'])
-                curr_close = float(df.loc[i, 'close'])
-                if curr_close > 0:
-                    ratio = prev_close / curr_close
-                    rounded_ratio = round(ratio)
-                    # Ã¥ÂÂªÃ¦Å“â€°Ã¦Â¯â€Ã§Å½â€¡Ã¦Å½Â¥Ã¨Â¿â€˜Ã¦â€¢Â´Ã¦â€¢Â¸Ã¦â„¢â€šÃ¦â€°ÂÃ¨ÂªÂÃ§â€šÂºÃ¦ËœÂ¯Ã¥Ë†â€ Ã¥â€°Â²Ã¯Â¼Ë†2, 3, 4, 5, 10 Ã§Â­â€°Ã¯Â¼â€°
-                    if rounded_ratio >= 2 and abs(ratio - rounded_ratio) < 0.3:
-                        split_indices.append({
-                            'index': i,
-                            'date': df.loc[i, 'date'],
-                            'ratio': rounded_ratio,
-                            'prev_close': prev_close,
-                            'curr_close': curr_close
-                        })
-                        logger.info(f"{symbol} Ã¥ÂÂµÃ¦Â¸Â¬Ã¥Ë†Â°Ã¥Ë†â€ Ã¥â€°Â²: {df.loc[i, 'date']}, Ã¦Â¯â€Ã§Å½â€¡ 1:{rounded_ratio}, Ã¥â€°ÂÃ¦â€Â¶ {prev_close:.2f} -> Ã§ÂÂ¾Ã¦â€Â¶ {curr_close:.2f}")
-        
-        # Ã¥Ë†ÂÃ¥Â§â€¹Ã¥Å’â€“Ã¨ÂªÂ¿Ã¦â€¢Â´Ã¥Â¾Å’Ã¥Æ’Â¹Ã¦Â Â¼
-        df['adj_close'] = df['close'].astype(float)
-        
-        # Ã¥Â¾Å¾Ã¦Å“â‚¬Ã¨Â¿â€˜Ã§Å¡â€žÃ¥Ë†â€ Ã¥â€°Â²Ã©â€“â€¹Ã¥Â§â€¹Ã¥Â¾â‚¬Ã¥â€°ÂÃ¨ÂªÂ¿Ã¦â€¢Â´Ã¯Â¼Ë†Ã¤Â½Â¿Ã§â€Â¨Ã§Â´Â¯Ã§Â©ÂÃ¥â€ºÂ Ã¥Â­ÂÃ¯Â¼â€°
-        if split_indices:
-            cumulative_factor = 1.0
-            
-            for split in reversed(split_indices):
-                idx = split['index']
-                ratio = split['ratio']
-                cumulative_factor *= ratio
-                
-                # Ã¨ÂªÂ¿Ã¦â€¢Â´Ã¥Ë†â€ Ã¥â€°Â²Ã©Â»Å¾Ã¤Â¹â€¹Ã¥â€°ÂÃ§Å¡â€žÃ¦â€°â‚¬Ã¦Å“â€°Ã¥Æ’Â¹Ã¦Â Â¼Ã¯Â¼Ë†Ã§â€Â¨Ã¥Å½Å¸Ã¥Â§â€¹ close Ã©â„¢Â¤Ã¤Â»Â¥Ã§Â´Â¯Ã§Â©ÂÃ¥â€ºÂ Ã¥Â­ÂÃ¯Â¼â€°
-                df.loc[:idx-1, 'adj_close'] = df.loc[:idx-1, 'close'].astype(float) / cumulative_factor
-            
-            logger.info(f"{symbol} Ã¥Â·Â²Ã¨ÂªÂ¿Ã¦â€¢Â´ {len(split_indices)} Ã¦Â¬Â¡Ã¥Ë†â€ Ã¥â€°Â²Ã¯Â¼Å’Ã§Â¸Â½Ã¨ÂªÂ¿Ã¦â€¢Â´Ã¥â€ºÂ Ã¥Â­Â: {cumulative_factor}")
-        
-        # Ã§Â§Â»Ã©â„¢Â¤Ã¨â€¡Â¨Ã¦â„¢â€šÃ¦Â¬â€žÃ¤Â½Â
-        df = df.drop(columns=['pct_change'], errors='ignore')
+        df = df.sort_values("date").reset_index(drop=True)
+        splits = self.detect_splits(df)
+        
+        for d, r in zip(splits["date"], splits["ratio"]):
+            logger.info(f"{symbol} 偵測到分割: {d}, 比率 1:{r}")
         
+        df["adj_close"] = self.apply_split_factors(df, splits)
         return df
     
+    @upstream("yahoo")
     def get_current_price(self, symbol: str) -> Optional[Dict[str, Any]]:
         """
         Ã¥Ââ€“Ã¥Â¾â€”Ã¨â€šÂ¡Ã§Â¥Â¨Ã¥ÂÂ³Ã¦â„¢â€šÃ¯Â¼Ë†Ã¥Â»Â¶Ã©ÂÂ²Ã¯Â¼â€°Ã¥Â Â±Ã¥Æ’Â¹
@@ -403,7 +468,7 @@ class YahooFinanceClient:
             Ã¥Å’â€¦Ã¥ÂÂ«Ã§â€¢Â¶Ã¥â€°ÂÃ¥Æ’Â¹Ã¦Â Â¼Ã¥â€™Å’Ã¦Â¼Â²Ã¨Â·Å’Ã¨Â³â€¡Ã¨Â¨Å Ã§Å¡â€žÃ¥Â­â€”Ã¥â€¦Â¸
         """
         try:
-            ticker = yf.Ticker(symbol)
+            ticker = get_provider().ticker(symbol)
             info = ticker.info
             
             if not info:
@@ -440,6 +505,7 @@ class YahooFinanceClient:
             logger.error(f"Ã¥Ââ€“Ã¥Â¾â€”Ã¥ÂÂ³Ã¦â„¢â€šÃ¥Â Â±Ã¥Æ’Â¹Ã¥Â¤Â±Ã¦â€¢â€” {symbol}: {e}")
             return None
     
+    @upstream("yahoo")
     def validate_symbol(self, symbol: str) -> bool:
         """
         å¿«é€Ÿé©—è­‰è‚¡ç¥¨ä»£è™Ÿæ˜¯å¦æœ‰æ•ˆ
@@ -453,17 +519,19 @@ class YahooFinanceClient:
             æ˜¯å¦ç‚ºæœ‰æ•ˆä»£è™Ÿ
         """
         try:
-            ticker = yf.Ticker(symbol)
+            ticker = get_provider().ticker(symbol)
             # åªæŠ“ 1 å¤©è³‡æ–™ï¼Œæ¯” info å¿«å¾ˆå¤š
             hist = ticker.history(period="1d")
             return not hist.empty
         except Exception:
             return False
     
+    @upstream("yahoo")
     def get_dividends(
         self,
         symbol: str,
         period: str = "10y",
+        since: Optional[date] = None,
     ) -> Optional[pd.DataFrame]:
         """
         Ã¥Ââ€“Ã¥Â¾â€”Ã¨â€šÂ¡Ã§Â¥Â¨Ã©â€¦ÂÃ¦ÂÂ¯Ã¦Â­Â·Ã¥ÂÂ²
@@ -474,14 +542,20 @@ class YahooFinanceClient:
             
         Returns:
             Ã¥Å’â€¦Ã¥ÂÂ«Ã©â€¦ÂÃ¦ÂÂ¯Ã¨Â¨ËœÃ©Å’â€žÃ§Å¡â€ž DataFrame
+            沒有配息時為空 DataFrame；查詢失敗為 None
         """
         try:
-            ticker = yf.Ticker(symbol)
-            dividends = ticker.dividends
+            ticker = get_provider().ticker(symbol)
+            if since is not None:
+                # 增量模式：只下載涵蓋 since 之後的區間
+                dividends = ticker.get_dividends(period=self._period_covering(since))
+            else:
+                dividends = ticker.dividends
             
             if dividends.empty:
                 logger.info(f"{symbol} Ã§â€žÂ¡Ã©â€¦ÂÃ¦ÂÂ¯Ã¨Â¨ËœÃ©Å’â€ž")
-                return None
+                # 沒有配息回傳空表，與查詢失敗（None）區分
+                return pd.DataFrame(columns=["date", "amount", "symbol"])
             
             # Ã¨Â½â€°Ã¦Ââ€ºÃ¦Ë†Â DataFrame
             df = dividends.reset_index()
@@ -490,7 +564,9 @@ class YahooFinanceClient:
             df["symbol"] = symbol.upper()
             
             # Ã¦Â Â¹Ã¦â€œÅ¡ period Ã©ÂÅ½Ã¦Â¿Â¾
-            if period != "max":
+            if since is not None:
+                df = df[df["date"] > since]
+            elif period != "max":
                 years = int(period.replace("y", ""))
                 cutoff_date = datetime.now().date() - timedelta(days=years * 365)
                 df = df[df["date"] >= cutoff_date]
@@ -501,6 +577,17 @@ class YahooFinanceClient:
             logger.error(f"Ã¥Ââ€“Ã¥Â¾â€”Ã©â€¦ÂÃ¦ÂÂ¯Ã¨Â³â€¡Ã¦â€“â„¢Ã¥Â¤Â±Ã¦â€¢â€” {symbol}: {e}")
             return None
     
+    @staticmethod
+    def _period_covering(since: date) -> str:
+        """取得能涵蓋 since 至今的最短 yfinance period"""
+        days = (date.today() - since).days + 7
+        for limit, period in ((30, "1mo"), (90, "3mo"), (180, "6mo"), (365, "1y"),
+                              (730, "2y"), (1825, "5y"), (3650, "10y")):
+            if days <= limit:
+                return period
+        return "max"
+    
+    @upstream("yahoo")
     def get_index_data(
         self,
         symbol: str,
@@ -517,7 +604,7 @@ class YahooFinanceClient:
             Ã¥Å’â€¦Ã¥ÂÂ« OHLCV Ã§Å¡â€ž DataFrame
         """
         try:
-            ticker = yf.Ticker(symbol)
+            ticker = get_provider().ticker(symbol)
             df = ticker.history(period=period, auto_adjust=False)
             
             if df.empty:
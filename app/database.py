@@ -15,6 +15,7 @@ from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import NullPool
 
 from app.config import settings
+from app.utils.perf import instrument_engine
 
 
 def get_async_url(url: str) -> str:
@@ -84,6 +85,10 @@ else:
         echo=settings.DEBUG,
     )
 
+# 每次 SQL 執行記入請求的 Server-Timing（db）
+instrument_engine(async_engine.sync_engine)
+instrument_engine(sync_engine)
+
 # ============================================================
 # 🆕 自動資料庫遷移
 # ============================================================
@@ -163,32 +168,34 @@ def run_auto_migrations():
         # ============================================================
         # 🚀 2026-01-16: 股票歷史資料快取表（效能優化）
         # ============================================================
+        # 新安裝直接建立精簡配置（見下方 compact_stock_prices）
         {
             "name": "create_stock_prices",
             "check_sql": "SELECT table_name FROM information_schema.tables WHERE table_name='stock_prices'",
             "migrate_sql": """
                 CREATE TABLE stock_prices (
-                    id SERIAL PRIMARY KEY,
-                    symbol VARCHAR(20) NOT NULL,
-                    date DATE NOT NULL,
-                    open NUMERIC(12, 4),
-                    high NUMERIC(12, 4),
-                    low NUMERIC(12, 4),
-                    close NUMERIC(12, 4),
+                    open DOUBLE PRECISION,
+                    high DOUBLE PRECISION,
+                    low DOUBLE PRECISION,
+                    close DOUBLE PRECISION,
+                    adj_close DOUBLE PRECISION,
                     volume BIGINT,
                     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(symbol, date)
+                    date DATE NOT NULL,
+                    symbol VARCHAR(20) NOT NULL,
+                    CONSTRAINT stock_prices_pkey PRIMARY KEY (symbol, date)
                 )
             """,
         },
+        # 舊配置（有 id 欄）才需要的單欄索引；精簡後主鍵已涵蓋，不再建立
         {
             "name": "create_stock_prices_symbol_index",
-            "check_sql": "SELECT indexname FROM pg_indexes WHERE indexname='idx_stock_prices_symbol'",
+            "check_sql": "SELECT 1 WHERE EXISTS (SELECT 1 FROM pg_indexes WHERE indexname='idx_stock_prices_symbol') OR NOT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name='stock_prices' AND column_name='id')",
             "migrate_sql": "CREATE INDEX idx_stock_prices_symbol ON stock_prices(symbol)",
         },
         {
             "name": "create_stock_prices_date_index",
-            "check_sql": "SELECT indexname FROM pg_indexes WHERE indexname='idx_stock_prices_date'",
+            "check_sql": "SELECT 1 WHERE EXISTS (SELECT 1 FROM pg_indexes WHERE indexname='idx_stock_prices_date') OR NOT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name='stock_prices' AND column_name='id')",
             "migrate_sql": "CREATE INDEX idx_stock_prices_date ON stock_prices(date)",
         },
 
@@ -216,7 +223,124 @@ def run_auto_migrations():
             "name": "add_broker_id_to_transactions",
             "check_sql": "SELECT column_name FROM information_schema.columns WHERE table_name='portfolio_transactions' AND column_name='broker_id'",
             "migrate_sql": "ALTER TABLE portfolio_transactions ADD COLUMN broker_id INTEGER REFERENCES brokers(id) ON DELETE SET NULL",
-        },    ]
+        },
+
+        # 分割調整後收盤價（寫入時計算，讀取不再重算）
+        {
+            "name": "add_adj_close_to_stock_prices",
+            "check_sql": "SELECT column_name FROM information_schema.columns WHERE table_name='stock_prices' AND column_name='adj_close'",
+            "migrate_sql": "ALTER TABLE stock_prices ADD COLUMN adj_close NUMERIC(12, 4)",
+        },
+
+        # 股票搜尋：pg_trgm 讓 ILIKE '%q%' 可以走 GIN 索引
+        {
+            "name": "create_pg_trgm_extension",
+            "check_sql": "SELECT extname FROM pg_extension WHERE extname='pg_trgm'",
+            "migrate_sql": "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        },
+        {
+            "name": "create_stock_info_symbol_trgm_index",
+            "check_sql": "SELECT indexname FROM pg_indexes WHERE indexname='idx_stock_info_symbol_trgm'",
+            "migrate_sql": "CREATE INDEX idx_stock_info_symbol_trgm ON stock_info USING gin (symbol gin_trgm_ops)",
+        },
+        {
+            "name": "create_stock_info_name_trgm_index",
+            "check_sql": "SELECT indexname FROM pg_indexes WHERE indexname='idx_stock_info_name_trgm'",
+            "migrate_sql": "CREATE INDEX idx_stock_info_name_trgm ON stock_info USING gin (name gin_trgm_ops)",
+        },
+        {
+            "name": "create_stock_info_name_zh_trgm_index",
+            "check_sql": "SELECT indexname FROM pg_indexes WHERE indexname='idx_stock_info_name_zh_trgm'",
+            "migrate_sql": "CREATE INDEX idx_stock_info_name_zh_trgm ON stock_info USING gin (name_zh gin_trgm_ops)",
+        },
+
+        # 持股帳本：記錄最後套用的交易，新增交易可增量更新
+        {
+            "name": "add_last_tx_date_to_portfolio_holdings",
+            "check_sql": "SELECT column_name FROM information_schema.columns WHERE table_name='portfolio_holdings' AND column_name='last_tx_date'",
+            "migrate_sql": "ALTER TABLE portfolio_holdings ADD COLUMN last_tx_date DATE",
+        },
+        {
+            "name": "add_last_tx_id_to_portfolio_holdings",
+            "check_sql": "SELECT column_name FROM information_schema.columns WHERE table_name='portfolio_holdings' AND column_name='last_tx_id'",
+            "migrate_sql": "ALTER TABLE portfolio_holdings ADD COLUMN last_tx_id INTEGER",
+        },
+
+        # 加密貨幣日K：逐時資料合併後的開高低
+        {
+            "name": "add_open_to_crypto_prices",
+            "check_sql": "SELECT column_name FROM information_schema.columns WHERE table_name='crypto_prices' AND column_name='open'",
+            "migrate_sql": "ALTER TABLE crypto_prices ADD COLUMN open NUMERIC(18, 8)",
+        },
+        {
+            "name": "add_high_to_crypto_prices",
+            "check_sql": "SELECT column_name FROM information_schema.columns WHERE table_name='crypto_prices' AND column_name='high'",
+            "migrate_sql": "ALTER TABLE crypto_prices ADD COLUMN high NUMERIC(18, 8)",
+        },
+        {
+            "name": "add_low_to_crypto_prices",
+            "check_sql": "SELECT column_name FROM information_schema.columns WHERE table_name='crypto_prices' AND column_name='low'",
+            "migrate_sql": "ALTER TABLE crypto_prices ADD COLUMN low NUMERIC(18, 8)",
+        },
+
+        # 訂閱源條件式請求（304 不重新解析）
+        {
+            "name": "add_etag_to_subscription_sources",
+            "check_sql": "SELECT column_name FROM information_schema.columns WHERE table_name='subscription_sources' AND column_name='etag'",
+            "migrate_sql": "ALTER TABLE subscription_sources ADD COLUMN etag VARCHAR(200)",
+        },
+        {
+            "name": "add_last_modified_to_subscription_sources",
+            "check_sql": "SELECT column_name FROM information_schema.columns WHERE table_name='subscription_sources' AND column_name='last_modified'",
+            "migrate_sql": "ALTER TABLE subscription_sources ADD COLUMN last_modified VARCHAR(100)",
+        },
+
+        # stock_prices 精簡：主鍵 (symbol, date)、價格 double precision
+        # 拿掉 id 與三個索引（symbol、date、unique(symbol, date)），只剩主鍵一個 btree
+        # 重建成新表而不是 ALTER：型別轉換本來就要重寫整張表，順便依排列順序寫入；
+        # 8 bytes 的欄位放前面，避免 date（4 bytes）後面的對齊空洞
+        # DO 區塊內先鎖表再檢查一次，多個 worker 同時啟動時只有一個會重建
+        {
+            "name": "compact_stock_prices",
+            "check_sql": "SELECT 1 WHERE NOT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name='stock_prices' AND column_name='id')",
+            "migrate_sql": f"""
+                DO $$
+                BEGIN
+                    LOCK TABLE stock_prices IN ACCESS EXCLUSIVE MODE;
+                    IF EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name='stock_prices' AND column_name='id') THEN
+                        CREATE TABLE stock_prices_compact (
+                            open DOUBLE PRECISION,
+                            high DOUBLE PRECISION,
+                            low DOUBLE PRECISION,
+                            close DOUBLE PRECISION,
+                            adj_close DOUBLE PRECISION,
+                            volume BIGINT,
+                            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                            date DATE NOT NULL,
+                            symbol VARCHAR(20) NOT NULL,
+                            CONSTRAINT stock_prices_compact_pkey PRIMARY KEY (symbol, date)
+                        );
+                        INSERT INTO stock_prices_compact (symbol, date, open, high, low, close, adj_close, volume, updated_at)
+                        SELECT symbol, date, open, high, low, close, adj_close, volume, updated_at
+                        FROM stock_prices
+                        ORDER BY {"date, symbol" if settings.STOCK_PRICES_BRIN else "symbol, date"};
+                        DROP TABLE stock_prices;
+                        ALTER TABLE stock_prices_compact RENAME TO stock_prices;
+                        ALTER TABLE stock_prices RENAME CONSTRAINT stock_prices_compact_pkey TO stock_prices_pkey;
+                    END IF;
+                END $$
+            """,
+        },
+    ]
+    
+    # 選用：date 的 BRIN 索引（幾十 KB），跨代號依日期範圍掃描時使用；
+    # 每日新增的 K 棒本來就依日期附加在表尾，BRIN 的區間會維持緊密
+    if settings.STOCK_PRICES_BRIN:
+        migrations.append({
+            "name": "create_stock_prices_date_brin",
+            "check_sql": "SELECT indexname FROM pg_indexes WHERE indexname='idx_stock_prices_date_brin'",
+            "migrate_sql": "CREATE INDEX idx_stock_prices_date_brin ON stock_prices USING brin (date)",
+        })
     
     try:
         with sync_engine.connect() as conn:
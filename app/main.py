@@ -10,17 +10,20 @@ FastAPI 主程式
 - 匯率每天 1 次
 """
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import RedirectResponse
+from fastapi.responses import RedirectResponse, PlainTextResponse
 import logging
 import os
+import secrets
 from datetime import datetime, timezone, timedelta
 
 from app.config import settings
 from app.database import init_db
 from app.logging_config import setup_logging
+from app.utils.metrics import render_metrics, instrument_scheduler
+from app.utils.perf import ServerTimingMiddleware
 
 # 初始化日誌系統（在其他 import 之前）
 setup_logging(
@@ -30,15 +33,15 @@ setup_logging(
 
 # 確保所有 models 被載入
 from app.models import (
-    User, Watchlist, StockPrice, CryptoPrice, 
+    User, Watchlist, StockPrice, StockSplit, CryptoPrice, 
     MarketSentiment, Notification,
     UserIndicatorSettings, UserAlertSettings, UserIndicatorParams,
-    IndexPrice, DividendHistory,
+    IndexPrice, DividendHistory, DividendSyncStatus,
     Comparison,
     StockPriceCache,
     PortfolioTransaction, PortfolioHolding, ExchangeRate,
     UserTag, watchlist_tags,
-    StockInfo,
+    StockInfo, SymbolResolution,
 )
 from app.models.user import LoginLog, TokenBlacklist, SystemConfig
 
@@ -66,6 +69,7 @@ logger = logging.getLogger(__name__)
 
 # 建立排程器
 scheduler = AsyncIOScheduler()
+instrument_scheduler(scheduler)
 
 # 台北時區
 TW_TZ = timezone(timedelta(hours=8))
@@ -204,6 +208,18 @@ async def lifespan(app: FastAPI):
     await init_db()
     logger.info("Database initialized")
 
+    # 📡 跨 worker 快取失效通知（PostgreSQL LISTEN/NOTIFY）
+    from app.utils.cache_bus import cache_bus
+    cache_bus.start()
+
+    # 📇 名稱索引（請求路徑查名稱不再呼叫 Yahoo）
+    from app.services.symbol_index import symbol_index
+    try:
+        with sync_db_session() as db:
+            symbol_index.load(db)
+    except Exception as e:
+        logger.error(f"❌ 名稱索引載入失敗: {e}")
+
     # ============================================================
     # 🆕 V1.02 極簡排程（大幅減少）
     # ============================================================
@@ -254,17 +270,23 @@ async def lifespan(app: FastAPI):
         name='清除過期快取',
     )
 
-    # 啟動排程器
-    scheduler.start()
-    logger.info("✅ 排程器已啟動（V1.05：每日預載 + 指標預計算 + 快取清除）")
+    # 啟動排程器（先暫停，取得 leader 鎖的行程才會 resume，多 worker 時每個 job 只跑一次）
+    from app.tasks.leader import scheduler_leader
+    scheduler.start(paused=True)
+    scheduler_leader.start(on_elected=scheduler.resume, on_demoted=scheduler.pause)
+    logger.info("✅ 排程器已啟動（V1.05：每日預載 + 指標預計算 + 快取清除），等待 leader 選舉")
 
     # 🆕 啟動時不做任何自動更新，完全依賴排程和用戶查詢
     logger.info("🆕 V1.02: 啟動時不自動更新，節省資源")
 
     yield
 
-    # 關閉時
+    # 關閉時（先釋放 leader 鎖，讓其他 worker 接手）
+    scheduler_leader.stop()
     scheduler.shutdown()
+    cache_bus.stop()
+    from app.data_sources.coingecko import coingecko_async
+    await coingecko_async.aclose()
     logger.info("Shutting down...")
 
 
@@ -294,6 +316,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 請求效能量測（Server-Timing 標頭 + /api/admin/perf 統計）
+app.add_middleware(ServerTimingMiddleware)
+
 # 靜態檔案
 static_path = os.path.join(os.path.dirname(__file__), "..", "static")
 if os.path.exists(static_path):
@@ -333,6 +358,17 @@ async def health_check():
     }
 
 
+@app.get("/metrics", tags=["系統"], response_class=PlainTextResponse)
+async def metrics(request: Request):
+    """Prometheus 指標（快取命中率、上游 API、排程 job）"""
+    if settings.METRICS_TOKEN:
+        # 固定時間比較；先轉 bytes，非 ASCII 的標頭不會讓 compare_digest 拋 TypeError
+        authorization = request.headers.get("authorization", "").encode()
+        if not secrets.compare_digest(authorization, f"Bearer {settings.METRICS_TOKEN}".encode()):
+            raise HTTPException(status_code=401, detail="Unauthorized")
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 @app.get("/api/version", tags=["系統"])
 async def get_version():
     """取得版本資訊"""
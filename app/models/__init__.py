@@ -2,6 +2,7 @@
 資料模型
 """
 from app.models.stock_price import StockPrice
+from app.models.stock_split import StockSplit
 from app.models.crypto_price import CryptoPrice
 from app.models.market_sentiment import MarketSentiment
 from app.models.user import User, LoginLog, TokenBlacklist, SystemConfig
@@ -13,7 +14,7 @@ from app.models.user_settings import (
 )
 from app.models.notification import Notification
 from app.models.index_price import IndexPrice, INDEX_SYMBOLS
-from app.models.dividend_history import DividendHistory
+from app.models.dividend_history import DividendHistory, DividendSyncStatus
 from app.models.comparison import Comparison
 from app.models.price_cache import StockPriceCache
 from app.models.portfolio import PortfolioTransaction, PortfolioHolding, ExchangeRate
@@ -23,9 +24,11 @@ from app.models.watchlist_tag import UserTag, watchlist_tags
 
 # 📊 P1: 股票資訊種子表
 from app.models.stock_info import StockInfo
+from app.models.symbol_resolution import SymbolResolution
 
 __all__ = [
     "StockPrice",
+    "StockSplit",
     "CryptoPrice", 
     "MarketSentiment",
     "User",
@@ -40,6 +43,7 @@ __all__ = [
     "IndexPrice",
     "INDEX_SYMBOLS",
     "DividendHistory",
+    "DividendSyncStatus",
     "Comparison",
     "StockPriceCache",
     "PortfolioTransaction",
@@ -49,6 +53,7 @@ __all__ = [
     "UserTag",
     "watchlist_tags",
     "StockInfo",
+    "SymbolResolution",
 ]
 
 # V1.05 分析快取
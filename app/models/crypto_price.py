@@ -14,7 +14,10 @@ class CryptoPrice(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     symbol = Column(String(10), nullable=False, index=True)  # BTC, ETH
     date = Column(Date, nullable=False, index=True)
-    price = Column(Numeric(18, 8))  # USD 價格
+    price = Column(Numeric(18, 8))  # USD 價格（當日最後一筆，即收盤）
+    open = Column(Numeric(18, 8))  # 當日第一筆（逐時資料合併而來，舊資料為空）
+    high = Column(Numeric(18, 8))
+    low = Column(Numeric(18, 8))
     volume_24h = Column(Numeric(18, 2))  # 24 小時成交量
     market_cap = Column(Numeric(18, 2))  # 市值
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
@@ -32,6 +35,9 @@ class CryptoPrice(Base):
             "symbol": self.symbol,
             "date": self.date.isoformat() if self.date else None,
             "price": float(self.price) if self.price else None,
+            "open": float(self.open) if self.open else None,
+            "high": float(self.high) if self.high else None,
+            "low": float(self.low) if self.low else None,
             "volume_24h": float(self.volume_24h) if self.volume_24h else None,
             "market_cap": float(self.market_cap) if self.market_cap else None,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None,
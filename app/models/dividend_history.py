@@ -1,6 +1,9 @@
 """
 股票配息歷史資料模型
 用於計算含息年化報酬率
+
+DividendSyncStatus 記錄每檔股票最後一次向 Yahoo 查詢配息的時間，
+讓 DividendService 可以一天只查一次、且只抓最新除息日之後的資料
 """
 from sqlalchemy import Column, Integer, String, Date, Numeric, DateTime, Index
 from sqlalchemy.sql import func
@@ -33,3 +36,16 @@ class DividendHistory(Base):
             "amount": float(self.amount) if self.amount else None,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None,
         }
+
+
+class DividendSyncStatus(Base):
+    """配息同步狀態（每個 symbol 一筆）"""
+    
+    __tablename__ = "dividend_sync_status"
+    
+    symbol = Column(String(20), primary_key=True)
+    last_checked_at = Column(DateTime, nullable=False)  # 最後向 Yahoo 查詢的時間
+    latest_ex_date = Column(Date, nullable=True)  # 已入庫的最新除息日
+    
+    def __repr__(self):
+        return f"<DividendSyncStatus(symbol={self.symbol}, latest_ex_date={self.latest_ex_date})>"
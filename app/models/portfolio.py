@@ -125,6 +125,10 @@ class PortfolioHolding(Base):
     total_invested = Column(Numeric(14, 2), default=0)     # 總投入金額
     realized_profit = Column(Numeric(14, 2), default=0)    # 已實現損益
     
+    # 帳本位置：最後一筆已套用的交易（新交易排在其後即可增量更新）
+    last_tx_date = Column(Date)
+    last_tx_id = Column(Integer)
+    
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
     
     __table_args__ = (
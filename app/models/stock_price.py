@@ -1,7 +1,11 @@
 """
 股票價格歷史資料模型
+
+主鍵直接用 (symbol, date)：查詢全部是「某代號的一段日期」，
+不需要另外的 id、單欄索引與 unique 索引。價格存 double precision，
+讀取時直接是 float，不用逐筆把 Decimal 轉成 float
 """
-from sqlalchemy import Column, Integer, String, Date, Numeric, BigInteger, DateTime, Index
+from sqlalchemy import Column, String, Date, Float, BigInteger, DateTime
 from sqlalchemy.sql import func
 from app.database import Base
 
@@ -11,32 +15,31 @@ class StockPrice(Base):
     
     __tablename__ = "stock_prices"
     
-    id = Column(Integer, primary_key=True, autoincrement=True)
-    symbol = Column(String(10), nullable=False, index=True)
-    date = Column(Date, nullable=False, index=True)
-    open = Column(Numeric(12, 4))
-    high = Column(Numeric(12, 4))
-    low = Column(Numeric(12, 4))
-    close = Column(Numeric(12, 4))
+    symbol = Column(String(20), primary_key=True)
+    date = Column(Date, primary_key=True)
+    open = Column(Float)
+    high = Column(Float)
+    low = Column(Float)
+    close = Column(Float)
+    adj_close = Column(Float)  # 分割調整後收盤價（寫入時計算）
     volume = Column(BigInteger)
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
     
-    __table_args__ = (
-        Index('idx_stock_symbol_date', 'symbol', 'date', unique=True),
-    )
+    # SQLite：資料直接依主鍵存放，不再另建一份 (symbol, date) 索引
+    __table_args__ = {"sqlite_with_rowid": False}
     
     def __repr__(self):
         return f"<StockPrice(symbol={self.symbol}, date={self.date}, close={self.close})>"
     
     def to_dict(self):
         return {
-            "id": self.id,
             "symbol": self.symbol,
             "date": self.date.isoformat() if self.date else None,
             "open": float(self.open) if self.open else None,
             "high": float(self.high) if self.high else None,
             "low": float(self.low) if self.low else None,
             "close": float(self.close) if self.close else None,
+            "adj_close": float(self.adj_close) if self.adj_close else None,
             "volume": self.volume,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None,
         }
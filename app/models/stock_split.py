@@ -0,0 +1,33 @@
+"""
+股票分割事件資料模型
+由 stock_prices 偵測後寫入，用於產生 adj_close
+"""
+from sqlalchemy import Column, Integer, String, Date, Numeric, DateTime, Index
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class StockSplit(Base):
+    """股票分割事件"""
+    
+    __tablename__ = "stock_splits"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    symbol = Column(String(20), nullable=False, index=True)
+    date = Column(Date, nullable=False)  # 分割生效日（第一個分割後交易日）
+    ratio = Column(Numeric(10, 4), nullable=False)  # 1 拆 ratio
+    created_at = Column(DateTime, server_default=func.now())
+    
+    __table_args__ = (
+        Index('idx_split_symbol_date', 'symbol', 'date', unique=True),
+    )
+    
+    def __repr__(self):
+        return f"<StockSplit(symbol={self.symbol}, date={self.date}, ratio={self.ratio})>"
+    
+    def to_dict(self):
+        return {
+            "symbol": self.symbol,
+            "date": self.date.isoformat() if self.date else None,
+            "ratio": float(self.ratio) if self.ratio else None,
+        }
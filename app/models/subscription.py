@@ -23,6 +23,8 @@ class SubscriptionSource(Base):
     description = Column(Text)
     enabled = Column(Boolean, default=True)
     last_fetched_at = Column(DateTime)                  # 最後抓取時間
+    etag = Column(String(200))                          # 上次回應的 ETag（條件式請求用）
+    last_modified = Column(String(100))                 # 上次回應的 Last-Modified
     created_at = Column(DateTime, default=datetime.now)
     
     # 關聯
@@ -0,0 +1,20 @@
+"""
+代號解析結果資料模型
+記錄使用者輸入的代號實際對應的交易所代號（例如 6488.TW -> 6488.TWO），
+resolved_symbol 為空代表查無此代號（負向快取）
+"""
+from sqlalchemy import Column, String, DateTime
+from app.database import Base
+
+
+class SymbolResolution(Base):
+    """代號解析結果"""
+    
+    __tablename__ = "symbol_resolutions"
+    
+    input_symbol = Column(String(20), primary_key=True)  # 標準化後的輸入代號
+    resolved_symbol = Column(String(20), nullable=True)  # 實際代號；None = 無效
+    checked_at = Column(DateTime, nullable=False)
+    
+    def __repr__(self):
+        return f"<SymbolResolution({self.input_symbol} -> {self.resolved_symbol})>"
@@ -16,6 +16,7 @@ from app.services.exchange_rate_service import update_exchange_rate_sync
 from app.config import settings
 
 from app.dependencies import get_admin_user
+from app.utils.perf import perf_stats, WINDOW_SIZE
 
 logger = logging.getLogger(__name__)
 
@@ -657,3 +658,34 @@ async def admin_update_price_cache(
     except Exception as e:
         logger.error(f"價格快取更新失敗: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/perf", summary="API 效能統計")
+async def get_perf_stats(
+    endpoint: Optional[str] = Query(None, description="只看單一端點，例如 GET /api/stock/{symbol}"),
+    admin: User = Depends(get_admin_user),
+):
+    """
+    各端點最近請求的耗時百分位數（ms）
+
+    spans 為各階段（db、yahoo、coingecko、indicators…）的耗時，
+    同一請求內多次呼叫會累加
+    """
+    return {
+        "success": True,
+        "window_size": WINDOW_SIZE,
+        "data": perf_stats.summary(endpoint),
+    }
+
+
+@router.delete("/perf", summary="清除 API 效能統計")
+async def reset_perf_stats(
+    admin: User = Depends(get_admin_user),
+):
+    """清除累計的效能統計（例如部署調整後重新觀察）"""
+    perf_stats.clear()
+    logger.info(f"管理員 {admin.display_name} 清除效能統計")
+    return {
+        "success": True,
+        "message": "效能統計已清除",
+    }
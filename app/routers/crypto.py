@@ -3,17 +3,26 @@
 
 🆕 2026-01-17 更新：
 - 加入查詢結果快取功能，查詢過的加密貨幣會儲存到本地資料庫
+
+歷史K線改由 crypto_prices 本地資料提供（增量同步），
+幣種資訊在記憶體快取 CRYPTO_DATA_CACHE_MINUTES
 """
 from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.responses import FileResponse
+import asyncio
 import pandas as pd
 import logging
 
+from app.config import settings
 from app.schemas.schemas import MarketSentimentResponse
+from app.services.market_service import MemoryCache
 
 router = APIRouter(tags=["加密貨幣"])
 logger = logging.getLogger(__name__)
 
+# CoinGecko 幣種資訊（名稱、ATH、市值）
+_coin_info_cache = MemoryCache("coin_info")
+
 # 加密貨幣對應的 Yahoo Finance 代號
 CRYPTO_YAHOO_MAP = {
     "BTC": "BTC-USD",
@@ -23,6 +32,36 @@ CRYPTO_YAHOO_MAP = {
 }
 
 
+def _load_crypto_history(symbol: str, refresh: bool):
+    """本地歷史（只補抓缺少的日期），在 thread pool 執行"""
+    from app.database import SyncSessionLocal
+    from app.services.crypto_service import CryptoService
+    
+    db = SyncSessionLocal()
+    try:
+        service = CryptoService(db)
+        try:
+            service.sync_history(symbol, force=refresh)
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"同步 {symbol} 歷史失敗，使用既有資料: {e}")
+        return service.get_price_history(symbol)
+    finally:
+        db.close()
+
+
+async def _get_coin_info(symbol: str):
+    from app.data_sources.coingecko import coingecko_async
+    
+    cache_key = f"coin_info:{symbol}"
+    info = _coin_info_cache.get(cache_key, max_age_seconds=settings.CRYPTO_DATA_CACHE_MINUTES * 60)
+    if info is None:
+        info = await coingecko_async.get_coin_info(symbol)
+        if info:
+            _coin_info_cache.set(cache_key, info)
+    return info
+
+
 @router.get("/api/crypto/{symbol}", summary="查詢加密貨幣")
 async def get_crypto_analysis(
     symbol: str,
@@ -34,7 +73,7 @@ async def get_crypto_analysis(
     - **symbol**: 加密貨幣代號 (BTC, ETH)
     - **refresh**: 是否強制更新資料
     """
-    from app.data_sources.coingecko import coingecko
+    from app.data_sources.coingecko import coingecko_async
     from app.data_sources.yahoo_finance import yahoo_finance
     from app.services.indicator_service import indicator_service
     
@@ -43,7 +82,7 @@ async def get_crypto_analysis(
     
     # 驗證代號
     yahoo_symbol = CRYPTO_YAHOO_MAP.get(symbol)
-    if not yahoo_symbol and not coingecko.validate_symbol(symbol):
+    if not yahoo_symbol and not coingecko_async.validate_symbol(symbol):
         logger.warning(f"不支援的加密貨幣: {symbol}")
         raise HTTPException(
             status_code=400,
@@ -54,14 +93,13 @@ async def get_crypto_analysis(
     info = None
     data_source = None
     
-    # 優先嘗試 CoinGecko
+    # 優先使用本地歷史（CoinGecko 增量同步）
     try:
-        logger.info(f"嘗試從 CoinGecko 取得 {symbol} 資料...")
-        df = coingecko.get_ohlc(symbol, days=365)
+        df = await asyncio.get_running_loop().run_in_executor(None, _load_crypto_history, symbol, refresh)
         if df is not None and not df.empty:
-            info = coingecko.get_coin_info(symbol)
+            info = await _get_coin_info(symbol)
             data_source = "CoinGecko"
-            logger.info(f"成功從 CoinGecko 取得 {len(df)} 筆資料")
+            logger.info(f"使用本地 {symbol} 歷史 {len(df)} 筆")
     except Exception as e:
         logger.warning(f"CoinGecko API 失敗: {e}")
     
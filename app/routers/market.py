@@ -55,6 +55,7 @@ async def get_indices(
 async def get_index_history(
     symbol: str,
     days: int = Query(default=365, ge=1, le=3650),
+    points: Optional[int] = Query(default=None, ge=3, le=3650),
     db: Session = Depends(get_db),
 ):
     """
@@ -63,6 +64,7 @@ async def get_index_history(
     Args:
         symbol: 指數代號 (^GSPC, ^DJI, ^IXIC)
         days: 天數 (預設 365，最多 3650)
+        points: 圖表點數，依收盤價 LTTB 降採樣 (省略則回傳每一天)
     """
     # 驗證 symbol
     if symbol not in INDEX_SYMBOLS:
@@ -73,7 +75,7 @@ async def get_index_history(
     
     try:
         market_service = MarketService(db)
-        history = market_service.get_index_history(symbol, days)
+        history = market_service.get_index_history(symbol, days, points)
         
         return {
             "success": True,
@@ -275,7 +277,11 @@ async def get_scheduler_status(
     """
     [管理員] 取得排程狀態
     """
+    from app.tasks.leader import scheduler_leader
     return {
         "success": True,
-        "data": scheduler_service.get_status(),
+        "data": {
+            **scheduler_service.get_status(),
+            "leader": scheduler_leader.get_status(),
+        },
     }
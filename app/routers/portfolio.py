@@ -6,20 +6,19 @@ from datetime import date, datetime
 from typing import Optional, List
 from pydantic import BaseModel, Field
 import logging
-import json
-import csv
-import io
 
 from fastapi import APIRouter, Depends, HTTPException, Request, Query
 from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, exists
 
 from app.database import get_async_session
 from app.services.portfolio_service import PortfolioService
+from app.services.portfolio_history_service import PortfolioHistoryService
 from app.services.exchange_rate_service import get_exchange_rate, set_exchange_rate
 from app.models.user import User
 from app.models.portfolio import PortfolioTransaction
+from app.utils.export_stream import MEDIA_TYPES, encode_rows, stream_rows
 
 # 🔧 使用統一認證模組
 from app.dependencies import get_current_user
@@ -89,6 +88,27 @@ class TransactionImportRequest(BaseModel):
 # 匯出匯入 API
 # ============================================================
 
+EXPORT_FIELDS = [
+    "symbol", "name", "market", "transaction_type", "quantity",
+    "price", "fee", "tax", "transaction_date", "note",
+]
+
+
+def _transaction_export_row(t: PortfolioTransaction) -> dict:
+    return {
+        "symbol": t.symbol,
+        "name": t.name or "",
+        "market": t.market,
+        "transaction_type": t.transaction_type,
+        "quantity": t.quantity,
+        "price": float(t.price),
+        "fee": float(t.fee) if t.fee else 0,
+        "tax": float(t.tax) if t.tax else 0,
+        "transaction_date": t.transaction_date.isoformat() if t.transaction_date else "",
+        "note": t.note or "",
+    }
+
+
 @router.get("/export", summary="匯出交易記錄")
 async def export_transactions(
     format: str = "json",
@@ -97,76 +117,49 @@ async def export_transactions(
     db: AsyncSession = Depends(get_async_session),
 ):
     """
-    匯出用戶的交易記錄
+    匯出用戶的交易記錄（串流輸出）
     
-    - format: json 或 csv
+    - format: json、csv 或 ndjson
     - market: 選擇性篩選市場 (tw/us)
     """
     logger.info(f"API: 匯出交易記錄 - user_id={user.id}, format={format}, market={market}")
 
     try:
-        service = PortfolioService(db)
-        transactions = await service.get_transactions(
-            user_id=user.id,
-            market=market,
-            limit=9999,
-            offset=0,
-        )
+        conditions = [PortfolioTransaction.user_id == user.id]
+        if market:
+            conditions.append(PortfolioTransaction.market == market)
 
-        if not transactions:
+        # 先確認有資料，開始串流後就無法再回 404
+        has_rows = await db.scalar(
+            select(exists().where(*conditions))
+        )
+        if not has_rows:
             raise HTTPException(status_code=404, detail="交易記錄為空")
 
-        # 準備匯出資料
-        export_data = []
-        for t in transactions:
-            export_data.append({
-                "symbol": t.symbol,
-                "name": t.name or "",
-                "market": t.market,
-                "transaction_type": t.transaction_type,
-                "quantity": t.quantity,
-                "price": float(t.price),
-                "fee": float(t.fee) if t.fee else 0,
-                "tax": float(t.tax) if t.tax else 0,
-                "transaction_date": t.transaction_date.isoformat() if t.transaction_date else "",
-                "note": t.note or "",
-            })
+        stmt = (
+            select(PortfolioTransaction)
+            .where(*conditions)
+            .order_by(PortfolioTransaction.transaction_date.desc(), PortfolioTransaction.id.desc())
+        )
 
+        fmt = format.lower() if format.lower() in MEDIA_TYPES else "json"
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         market_suffix = f"_{market}" if market else ""
 
-        if format.lower() == "csv":
-            # CSV 格式
-            output = io.StringIO()
-            fieldnames = ["symbol", "name", "market", "transaction_type", "quantity", 
-                         "price", "fee", "tax", "transaction_date", "note"]
-            writer = csv.DictWriter(output, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(export_data)
-            
-            return StreamingResponse(
-                iter([output.getvalue()]),
-                media_type="text/csv",
-                headers={
-                    "Content-Disposition": f"attachment; filename=portfolio{market_suffix}_{timestamp}.csv"
-                }
-            )
-        else:
-            # JSON 格式
-            json_str = json.dumps({
-                "export_time": datetime.now().isoformat(),
-                "market": market,
-                "total": len(export_data),
-                "items": export_data
-            }, ensure_ascii=False, indent=2)
-            
-            return StreamingResponse(
-                iter([json_str]),
-                media_type="application/json",
-                headers={
-                    "Content-Disposition": f"attachment; filename=portfolio{market_suffix}_{timestamp}.json"
-                }
-            )
+        chunks = encode_rows(
+            fmt,
+            stream_rows(stmt, _transaction_export_row),
+            fieldnames=EXPORT_FIELDS,
+            header={"export_time": datetime.now().isoformat(), "market": market},
+        )
+
+        return StreamingResponse(
+            chunks,
+            media_type=MEDIA_TYPES[fmt],
+            headers={
+                "Content-Disposition": f"attachment; filename=portfolio{market_suffix}_{timestamp}.{fmt}"
+            }
+        )
 
     except HTTPException:
         raise
@@ -184,45 +177,19 @@ async def import_transactions(
     """
     匯入交易記錄
     
-    - 逐筆新增交易記錄
+    - 全部驗證後一次寫入，每檔股票只重算一次持股
     - 返回成功/失敗的統計
     """
     logger.info(f"API: 匯入交易記錄 - user_id={user.id}, items={len(data.items)}")
 
     try:
         service = PortfolioService(db)
-        added = []
-        errors = []
-
-        for item in data.items:
-            try:
-                # 解析日期
-                trans_date = datetime.strptime(item.transaction_date, "%Y-%m-%d").date()
-                
-                transaction = await service.create_transaction(
-                    user_id=user.id,
-                    symbol=item.symbol.upper().strip(),
-                    name=item.name,
-                    market=item.market,
-                    transaction_type=item.transaction_type,
-                    quantity=item.quantity,
-                    price=item.price,
-                    fee=item.fee or 0,
-                    tax=item.tax or 0,
-                    transaction_date=trans_date,
-                    note=item.note,
-                )
-                added.append({
-                    "id": transaction.id,
-                    "symbol": transaction.symbol,
-                    "transaction_type": transaction.transaction_type,
-                })
-            except Exception as e:
-                errors.append({
-                    "symbol": item.symbol,
-                    "date": item.transaction_date,
-                    "error": str(e)
-                })
+        result = await service.import_transactions(
+            user_id=user.id,
+            items=[item.dict() for item in data.items],
+        )
+        added = result["added"]
+        errors = result["errors"]
 
         return {
             "success": True,
@@ -513,6 +480,83 @@ async def get_holdings(
         raise HTTPException(status_code=500, detail="取得持股失敗")
 
 
+@router.get("/history", summary="取得投資組合歷史淨值")
+async def get_portfolio_history(
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_session),
+):
+    """
+    取得每日市值、成本與報酬率（TWD）
+    
+    - market_value / cost_basis：每日市值與成本
+    - twr：累積時間加權報酬率（%）
+    - mwr：資金加權報酬率（年化 %）
+    """
+    try:
+        history = await PortfolioHistoryService(db).get_history(user.id)
+        
+        if history is None:
+            raise HTTPException(status_code=404, detail="尚無交易紀錄")
+        
+        return {
+            "success": True,
+            "data": history,
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"取得歷史淨值失敗: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="取得歷史淨值失敗")
+
+
+@router.get("/holdings/verify", summary="檢查持股帳本一致性")
+async def verify_holdings(
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_session),
+):
+    """
+    比對持股彙總與交易紀錄完整重算的結果（唯讀）
+    
+    - 持股平常以增量方式更新，此 API 用於驗證
+    - 修復請用 POST /holdings/verify/repair
+    """
+    try:
+        service = PortfolioService(db)
+        result = await service.verify_holdings(user.id)
+        
+        return {
+            "success": True,
+            "data": result,
+        }
+        
+    except Exception as e:
+        logger.error(f"持股帳本檢查失敗: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="持股帳本檢查失敗")
+
+
+@router.post("/holdings/verify/repair", summary="修復持股帳本")
+async def repair_holdings(
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_session),
+):
+    """
+    檢查持股帳本，並以完整重算結果覆寫不一致的持股
+    """
+    try:
+        service = PortfolioService(db)
+        result = await service.verify_holdings(user.id, repair=True)
+        
+        return {
+            "success": True,
+            "data": result,
+        }
+        
+    except Exception as e:
+        logger.error(f"持股帳本修復失敗: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="持股帳本修復失敗")
+
+
 @router.get("/summary", summary="取得投資摘要")
 async def get_summary(
     user: User = Depends(get_current_user),
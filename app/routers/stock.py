@@ -14,11 +14,24 @@ from fastapi.responses import FileResponse
 import logging
 import pandas as pd
 from datetime import datetime, date, timedelta
+from typing import Optional
+
+from app.services.market_service import MemoryCache
+from app.services.symbol_index import symbol_index
+from app.services.symbol_resolver import symbol_resolver
+from app.utils.downsample import lttb_indices
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/stock", tags=["股票"])
 
+# 圖表最多送出的 K 棒數
+CHART_BARS = 1500
+
+# 降採樣後的圖表資料，key 為 "代號:點數"，值帶資料版本，K 棒有變動就重算
+_chart_cache = MemoryCache("chart")
+CHART_CACHE_SECONDS = 3600
+
 
 def normalize_tw_symbol(symbol: str) -> str:
     """標準化台股代號"""
@@ -54,23 +67,21 @@ def _get_stock_df(symbol: str, years: int = 10, force_refresh: bool = False):
         db = SyncSessionLocal()
         try:
             history_service = StockHistoryService(db)
-            df, data_source = history_service.get_stock_history(symbol, years=years, force_refresh=force_refresh)
             
-            if (df is None or df.empty) and symbol.endswith('.TW'):
-                two_symbol = symbol.replace('.TW', '.TWO')
-                df, data_source = history_service.get_stock_history(two_symbol, years=years, force_refresh=force_refresh)
-                if df is not None and not df.empty:
-                    symbol = two_symbol
+            def fetch(s):
+                nonlocal data_source
+                result, data_source = history_service.get_stock_history(s, years=years, force_refresh=force_refresh)
+                return result
+            
+            # .TW / .TWO 與無效代號由解析快取決定，只抓一次
+            df, symbol = symbol_resolver.fetch(symbol, fetch)
         finally:
             db.close()
     except Exception as e:
         logger.warning(f"快取服務異常: {e}")
-        df = yahoo_finance.get_stock_history(symbol, period=f"{years}y")
-        if (df is None or df.empty) and symbol.endswith('.TW'):
-            two_symbol = symbol.replace('.TW', '.TWO')
-            df = yahoo_finance.get_stock_history(two_symbol, period=f"{years}y")
-            if df is not None and not df.empty:
-                symbol = two_symbol
+        df, symbol = symbol_resolver.fetch(
+            symbol, lambda s: yahoo_finance.get_stock_history(s, period=f"{years}y")
+        )
         data_source = "yahoo"
     
     return df, symbol, data_source
@@ -106,55 +117,70 @@ def _get_stock_df_smart(symbol: str, years: int = 10, force_refresh: bool = Fals
         try:
             history_service = StockHistoryService(db)
             
-            # 🆕 非開盤時間，嘗試只讀取永久資料（不強制更新）
-            if not market_open and not force_refresh:
-                df, data_source = history_service.get_stock_history(
-                    symbol, years=years, force_refresh=False
+            def fetch(s):
+                nonlocal data_source
+                result, data_source = history_service.get_stock_history(
+                    s, years=years, force_refresh=force_refresh
                 )
-                
-                if df is not None and not df.empty:
-                    logger.info(f"⚡ 非開盤時間，使用永久資料: {symbol} ({len(df)} 筆)")
-                    return df, symbol, data_source, False
-                
-                # 嘗試上櫃
-                if symbol.endswith('.TW'):
-                    two_symbol = symbol.replace('.TW', '.TWO')
-                    df, data_source = history_service.get_stock_history(
-                        two_symbol, years=years, force_refresh=False
-                    )
-                    if df is not None and not df.empty:
-                        logger.info(f"⚡ 非開盤時間，使用永久資料: {two_symbol} ({len(df)} 筆)")
-                        return df, two_symbol, data_source, False
+                return result
             
-            # 開盤時間或無資料，正常流程
-            df, data_source = history_service.get_stock_history(
-                symbol, years=years, force_refresh=force_refresh
-            )
+            df, symbol = symbol_resolver.fetch(symbol, fetch)
             
-            if (df is None or df.empty) and symbol.endswith('.TW'):
-                two_symbol = symbol.replace('.TW', '.TWO')
-                df, data_source = history_service.get_stock_history(
-                    two_symbol, years=years, force_refresh=force_refresh
-                )
-                if df is not None and not df.empty:
-                    symbol = two_symbol
-                    
+            # 🆕 非開盤時間不會強制更新，永久資料直接可用
+            if df is not None and not market_open and not force_refresh:
+                logger.info(f"⚡ 非開盤時間，使用永久資料: {symbol} ({len(df)} 筆)")
+        
         finally:
             db.close()
             
     except Exception as e:
         logger.warning(f"快取服務異常: {e}")
-        df = yahoo_finance.get_stock_history(symbol, period=f"{years}y")
-        if (df is None or df.empty) and symbol.endswith('.TW'):
-            two_symbol = symbol.replace('.TW', '.TWO')
-            df = yahoo_finance.get_stock_history(two_symbol, period=f"{years}y")
-            if df is not None and not df.empty:
-                symbol = two_symbol
+        df, symbol = symbol_resolver.fetch(
+            symbol, lambda s: yahoo_finance.get_stock_history(s, period=f"{years}y")
+        )
         data_source = "yahoo"
     
     return df, symbol, data_source, needs_update
 
 
+def _build_chart_data(df_chart: pd.DataFrame) -> dict:
+    """圖表資料（日期、價格、均線、成交量）"""
+    return {
+        "dates": [str(d) for d in df_chart['date'].tolist()],
+        "prices": [float(p) if pd.notna(p) else None for p in df_chart['close'].tolist()],
+        "ma20": [float(v) if pd.notna(v) else None for v in df_chart['ma20'].tolist()] if 'ma20' in df_chart.columns else [],
+        "ma50": [float(v) if pd.notna(v) else None for v in df_chart['ma50'].tolist()] if 'ma50' in df_chart.columns else [],
+        "ma200": [float(v) if pd.notna(v) else None for v in df_chart['ma200'].tolist()] if 'ma200' in df_chart.columns else [],
+        "ma250": [float(v) if pd.notna(v) else None for v in df_chart['ma250'].tolist()] if 'ma250' in df_chart.columns else [],
+        "volume": [int(v) if pd.notna(v) else 0 for v in df_chart['volume'].tolist()] if 'volume' in df_chart.columns else [],
+    }
+
+
+def _get_chart_data(symbol: str, df: pd.DataFrame, points: Optional[int] = None) -> Optional[dict]:
+    """
+    最近 CHART_BARS 根的圖表資料
+    
+    points: 依收盤價做 LTTB 降採樣到這個點數，均線、成交量取同一組日期；
+    結果依解析度快取，最新一根 K 棒變動（新的一天或盤中價格）時重算
+    """
+    df_chart = df.tail(CHART_BARS)
+    if len(df_chart) == 0:
+        return None
+    if not points or points >= len(df_chart):
+        return _build_chart_data(df_chart)
+    
+    latest = df_chart.iloc[-1]
+    version = (len(df), str(latest['date']), float(latest['close']))
+    key = f"{symbol}:{points}"
+    cached = _chart_cache.get(key, CHART_CACHE_SECONDS)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    
+    chart_data = _build_chart_data(df_chart.iloc[lttb_indices(df_chart['close'].to_numpy(), points)])
+    _chart_cache.set(key, (version, chart_data))
+    return chart_data
+
+
 # ============================================================
 # 🔴 重要：靜態路由必須放在動態路由之前！
 # ============================================================
@@ -221,13 +247,7 @@ async def compare_stocks(
             df["normalized"] = (df[price_col] / start_price) * 100
             df = df.dropna(subset=["normalized"])
             
-            if symbol.startswith("^"):
-                from app.models.index_price import INDEX_SYMBOLS
-                info = INDEX_SYMBOLS.get(symbol, {})
-                name = info.get("name_zh", symbol)
-            else:
-                info = yahoo_finance.get_stock_info(symbol)
-                name = info.get("name", symbol) if info else symbol
+            name = symbol_index.get_name(symbol)
             
             history = []
             for _, row in df.iterrows():
@@ -258,8 +278,6 @@ async def get_stock_returns(symbol: str):
     
     返回格式符合前端 returns.js 期望
     """
-    from app.data_sources.yahoo_finance import yahoo_finance
-    
     symbol = normalize_tw_symbol(symbol)
     logger.info(f"計算年化報酬率: {symbol}")
     
@@ -286,8 +304,24 @@ async def get_stock_returns(symbol: str):
         logger.info(f"{symbol} 資料筆數: {total_records}, 當前價格: {current_price}")
         
         # 取得股票名稱
-        info = yahoo_finance.get_stock_info(symbol)
-        stock_name = info.get("name", symbol) if info else symbol
+        stock_name = symbol_index.get_name(symbol)
+        
+        # 含息價格序列（配息資料從 dividend_history 讀取，一天最多同步一次）
+        div_prices = None
+        try:
+            from app.services.dividend_service import DividendService, apply_dividend_adjustment
+            from app.database import SyncSessionLocal
+            
+            db = SyncSessionLocal()
+            try:
+                dividends = DividendService(db).get_dividends(symbol)
+            finally:
+                db.close()
+            
+            if not dividends.empty:
+                div_prices = apply_dividend_adjustment(df, dividends, price_col)
+        except Exception as e:
+            logger.warning(f"{symbol} 含息報酬計算失敗: {e}")
         
         # 計算各期間報酬
         periods = []
@@ -326,6 +360,16 @@ async def get_stock_returns(symbol: str):
                     else:
                         cagr = 0
                     
+                    # 含息報酬
+                    total_return_div = None
+                    cagr_div = None
+                    if div_prices is not None:
+                        div_start = float(div_prices.iloc[start_idx])
+                        if div_start > 0:
+                            total_return_div = float(div_prices.iloc[-1]) / div_start - 1
+                            if actual_years > 0:
+                                cagr_div = (pow(1 + total_return_div, 1 / actual_years) - 1) * 100
+                    
                     periods.append({
                         "label": config["label"],
                         "years": config["years"],
@@ -336,6 +380,8 @@ async def get_stock_returns(symbol: str):
                         "end_date": current_date,
                         "total_return": round(total_return * 100, 2),
                         "cagr": round(cagr, 2),
+                        "total_return_with_dividends": round(total_return_div * 100, 2) if total_return_div is not None else None,
+                        "cagr_with_dividends": round(cagr_div, 2) if cagr_div is not None else None,
                     })
         
         return {
@@ -395,13 +441,13 @@ async def clear_cache(symbol: str):
 async def get_stock_analysis(
     symbol: str,
     refresh: bool = Query(False, description="是否強制更新資料"),
+    points: Optional[int] = Query(None, ge=3, le=CHART_BARS, description="圖表點數（LTTB 降採樣），省略時回傳完整 K 棒"),
 ):
     """
     查詢單一股票的技術分析報告
     
     🆕 V1.05 快取優化：優先使用指標快取
     """
-    from app.data_sources.yahoo_finance import yahoo_finance
     from app.services.indicator_service import indicator_service
     from app.services.analysis_cache_service import AnalysisCacheService
     from app.database import SyncSessionLocal
@@ -454,11 +500,6 @@ async def get_stock_analysis(
         latest = df.iloc[-1]
         current_price = float(latest.get('close_raw', latest['close']))
         
-        # 🆕 非開盤時間，不呼叫 get_stock_info（避免 API 呼叫）
-        info = None
-        if market_open or refresh:
-            info = yahoo_finance.get_stock_info(symbol)
-        
         close_col = 'close_raw' if 'close_raw' in df.columns else 'close'
         high_52w = float(df[close_col].tail(252).max()) if len(df) >= 252 else float(df[close_col].max())
         low_52w = float(df[close_col].tail(252).min()) if len(df) >= 252 else float(df[close_col].min())
@@ -513,15 +554,8 @@ async def get_stock_analysis(
         else: sell_score += 1
         rating = "bullish" if buy_score > sell_score else "bearish" if sell_score > buy_score else "neutral"
         
-        # 🆕 取得名稱（優先從 info，其次從快取或對照表）
-        stock_name = ""
-        if info:
-            stock_name = info.get("name", "")
-        
-        if not stock_name:
-            from app.services.price_cache_service import TAIWAN_STOCK_NAMES
-            stock_code = symbol.replace(".TW", "").replace(".TWO", "")
-            stock_name = TAIWAN_STOCK_NAMES.get(stock_code, symbol)
+        # 取得名稱（記憶體索引，不呼叫 API）
+        stock_name = symbol_index.get_name(symbol)
         
         # 更新價格快取（只在開盤時間或強制更新時）
         if market_open or refresh:
@@ -545,21 +579,9 @@ async def get_stock_analysis(
             except Exception as e:
                 logger.warning(f"價格快取更新失敗: {e}")
         
-        # 圖表資料 - 確保有足夠資料
-        df_chart = df.tail(1500)
-        
-        # 確保 chart_data 有效
-        chart_data = None
-        if len(df_chart) > 0:
-            chart_data = {
-                "dates": [str(d) for d in df_chart['date'].tolist()],
-                "prices": [float(p) if pd.notna(p) else None for p in df_chart['close'].tolist()],
-                "ma20": [float(v) if pd.notna(v) else None for v in df_chart['ma20'].tolist()] if 'ma20' in df_chart.columns else [],
-                "ma50": [float(v) if pd.notna(v) else None for v in df_chart['ma50'].tolist()] if 'ma50' in df_chart.columns else [],
-                "ma200": [float(v) if pd.notna(v) else None for v in df_chart['ma200'].tolist()] if 'ma200' in df_chart.columns else [],
-                "ma250": [float(v) if pd.notna(v) else None for v in df_chart['ma250'].tolist()] if 'ma250' in df_chart.columns else [],
-                "volume": [int(v) if pd.notna(v) else 0 for v in df_chart['volume'].tolist()] if 'volume' in df_chart.columns else [],
-            }
+        # 圖表資料（points 指定時降採樣）
+        chart_data = _get_chart_data(symbol, df, points)
+        if chart_data:
             logger.info(f"chart_data 準備完成: {len(chart_data['dates'])} 筆")
         
         return {
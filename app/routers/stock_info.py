@@ -16,6 +16,8 @@ import logging
 from app.database import get_db, get_async_session
 from app.models.stock_info import StockInfo, DEFAULT_STOCK_INFO
 from app.dependencies import get_admin_user
+from app.services.symbol_index import symbol_index
+from app.services.stock_search_index import stock_search_index
 
 logger = logging.getLogger(__name__)
 
@@ -63,7 +65,31 @@ async def search_stocks(
     搜尋股票資訊
     - 支援代號、名稱、中文名稱模糊搜尋
     - 可篩選市場
+    - 使用記憶體 n-gram 索引；索引無法建立時退回 DB 查詢
     """
+    try:
+        if not stock_search_index.loaded:
+            await stock_search_index.load(db)
+        data = stock_search_index.search(q, market=market, limit=limit)
+    except Exception as e:
+        logger.warning(f"搜尋索引不可用，改查 DB: {e}")
+        data = await _search_stocks_db(q, market, limit, db)
+    
+    return {
+        "success": True,
+        "query": q,
+        "data": data,
+        "total": len(data),
+    }
+
+
+async def _search_stocks_db(
+    q: str,
+    market: Optional[str],
+    limit: int,
+    db: AsyncSession,
+) -> List[dict]:
+    """DB 模糊搜尋（PostgreSQL 由 pg_trgm GIN 索引支援）"""
     q_upper = q.upper()
     q_like = f"%{q}%"
     
@@ -87,14 +113,7 @@ async def search_stocks(
     ).limit(limit)
     
     result = await db.execute(stmt)
-    stocks = result.scalars().all()
-    
-    return {
-        "success": True,
-        "query": q,
-        "data": [s.to_dict() for s in stocks],
-        "total": len(stocks),
-    }
+    return [s.to_dict() for s in result.scalars().all()]
 
 
 @router.get("/popular", summary="熱門股票")
@@ -216,6 +235,7 @@ async def init_stock_info(
     """初始化預設股票資訊"""
     added = 0
     skipped = 0
+    new_stocks = []
     
     for stock_data in DEFAULT_STOCK_INFO:
         # 檢查是否已存在
@@ -227,9 +247,14 @@ async def init_stock_info(
         
         stock = StockInfo(**stock_data)
         db.add(stock)
+        new_stocks.append(stock)
         added += 1
     
     await db.commit()
+    # 寫入成功才更新名稱索引
+    for stock in new_stocks:
+        symbol_index.set_from_stock_info(stock)
+    stock_search_index.invalidate()
     
     logger.info(f"管理員 {admin.display_name} 初始化股票資訊: 新增 {added}, 跳過 {skipped}")
     
@@ -269,6 +294,8 @@ async def add_stock_info(
     db.add(stock)
     await db.commit()
     await db.refresh(stock)
+    symbol_index.set_from_stock_info(stock)
+    stock_search_index.invalidate()
     
     logger.info(f"管理員 {admin.display_name} 新增股票: {symbol}")
     
@@ -301,6 +328,8 @@ async def update_stock_info(
     
     await db.commit()
     await db.refresh(stock)
+    symbol_index.set_from_stock_info(stock)
+    stock_search_index.invalidate()
     
     logger.info(f"管理員 {admin.display_name} 更新股票: {symbol}")
     
@@ -327,6 +356,7 @@ async def delete_stock_info(
     
     await db.delete(stock)
     await db.commit()
+    stock_search_index.invalidate()
     
     logger.info(f"管理員 {admin.display_name} 刪除股票: {symbol}")
     
@@ -345,6 +375,7 @@ async def batch_add_stocks(
     """批次新增股票資訊"""
     added = []
     errors = []
+    new_stocks = []
     
     for stock_data in stocks:
         symbol = stock_data.symbol.upper()
@@ -368,11 +399,16 @@ async def batch_add_stocks(
                 is_popular=stock_data.is_popular,
             )
             db.add(stock)
+            new_stocks.append(stock)
             added.append(symbol)
         except Exception as e:
             errors.append({"symbol": symbol, "error": str(e)})
     
     await db.commit()
+    # 寫入成功才更新名稱索引
+    for stock in new_stocks:
+        symbol_index.set_from_stock_info(stock)
+    stock_search_index.invalidate()
     
     logger.info(f"管理員 {admin.display_name} 批次新增股票: 成功 {len(added)}, 失敗 {len(errors)}")
     
@@ -13,13 +13,10 @@
 from fastapi import APIRouter, Depends, HTTPException, Request, UploadFile, File
 from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, exists
 from typing import List, Optional
 from pydantic import BaseModel
 import logging
-import json
-import csv
-import io
 from datetime import datetime
 
 from app.database import get_async_session
@@ -37,6 +34,7 @@ from app.models.user import User
 from app.models.watchlist import Watchlist
 from app.models.price_cache import StockPriceCache
 from app.models.watchlist_tag import UserTag, watchlist_tags  # ⭐ 新增
+from app.utils.export_stream import MEDIA_TYPES, encode_rows, stream_rows
 
 # 🔧 使用統一認證模組
 from app.dependencies import get_current_user, get_admin_user
@@ -123,6 +121,20 @@ async def get_popular_watchlist(
 # 匯出匯入 API
 # ============================================================
 
+EXPORT_FIELDS = ["symbol", "asset_type", "note", "target_price", "target_direction", "added_at"]
+
+
+def _watchlist_export_row(item: Watchlist) -> dict:
+    return {
+        "symbol": item.symbol,
+        "asset_type": item.asset_type,
+        "note": item.note or "",
+        "target_price": float(item.target_price) if item.target_price else None,
+        "target_direction": getattr(item, 'target_direction', 'above') or "above",
+        "added_at": item.added_at.isoformat() if item.added_at else None,
+    }
+
+
 @router.get("/export", summary="匯出追蹤清單")
 async def export_watchlist(
     format: str = "json",
@@ -130,69 +142,43 @@ async def export_watchlist(
     db: AsyncSession = Depends(get_async_session),
 ):
     """
-    匯出用戶的追蹤清單
+    匯出用戶的追蹤清單（串流輸出）
     
-    - format: json 或 csv
+    - format: json、csv 或 ndjson
     - 包含 symbol, asset_type, note, target_price, target_direction
     """
     logger.info(f"API: 匯出追蹤清單 - user_id={user.id}, format={format}")
 
     try:
-        # 取得用戶的追蹤清單
+        has_rows = await db.scalar(
+            select(exists().where(Watchlist.user_id == user.id))
+        )
+        if not has_rows:
+            raise HTTPException(status_code=404, detail="追蹤清單為空")
+
         stmt = (
             select(Watchlist)
             .where(Watchlist.user_id == user.id)
             .order_by(Watchlist.added_at.desc())
         )
-        result = await db.execute(stmt)
-        items = list(result.scalars().all())
-
-        if not items:
-            raise HTTPException(status_code=404, detail="追蹤清單為空")
-
-        # 準備匯出資料
-        export_data = []
-        for item in items:
-            export_data.append({
-                "symbol": item.symbol,
-                "asset_type": item.asset_type,
-                "note": item.note or "",
-                "target_price": float(item.target_price) if item.target_price else None,
-                "target_direction": getattr(item, 'target_direction', 'above') or "above",  # 🆕
-                "added_at": item.added_at.isoformat() if item.added_at else None,
-            })
 
+        fmt = format.lower() if format.lower() in MEDIA_TYPES else "json"
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
 
-        if format.lower() == "csv":
-            # CSV 格式
-            output = io.StringIO()
-            writer = csv.DictWriter(output, fieldnames=["symbol", "asset_type", "note", "target_price", "target_direction", "added_at"])  # 🆕
-            writer.writeheader()
-            writer.writerows(export_data)
-            
-            return StreamingResponse(
-                iter([output.getvalue()]),
-                media_type="text/csv",
-                headers={
-                    "Content-Disposition": f"attachment; filename=watchlist_{timestamp}.csv"
-                }
-            )
-        else:
-            # JSON 格式
-            json_str = json.dumps({
-                "export_time": datetime.now().isoformat(),
-                "total": len(export_data),
-                "items": export_data
-            }, ensure_ascii=False, indent=2)
-            
-            return StreamingResponse(
-                iter([json_str]),
-                media_type="application/json",
-                headers={
-                    "Content-Disposition": f"attachment; filename=watchlist_{timestamp}.json"
-                }
-            )
+        chunks = encode_rows(
+            fmt,
+            stream_rows(stmt, _watchlist_export_row),
+            fieldnames=EXPORT_FIELDS,
+            header={"export_time": datetime.now().isoformat()},
+        )
+
+        return StreamingResponse(
+            chunks,
+            media_type=MEDIA_TYPES[fmt],
+            headers={
+                "Content-Disposition": f"attachment; filename=watchlist_{timestamp}.{fmt}"
+            }
+        )
 
     except HTTPException:
         raise
@@ -14,10 +14,15 @@ from sqlalchemy.orm import Session
 from sqlalchemy import select
 
 from app.models.analysis_cache import StockDetailCache, IndicatorCache, ChartCache
-from app.services.price_cache_service import is_market_open_for_symbol
+from app.services.price_cache_service import calendar_for_symbol
+from app.utils.metrics import CACHE_REQUESTS
 
 logger = logging.getLogger(__name__)
 
+# 盤中有效時間；盤後寫入的快取由交易所行事曆決定（到下次開盤）
+DETAIL_TTL = timedelta(minutes=5)
+INDICATOR_TTL = timedelta(minutes=10)
+
 
 class AnalysisCacheService:
     """分析快取服務"""
@@ -30,25 +35,25 @@ class AnalysisCacheService:
     def get_stock_detail_cache(self, symbol: str) -> Optional[Dict]:
         """
         取得股票詳情快取
-        - 交易時段：5 分鐘有效
-        - 非交易時段：1 小時有效
+        - 交易時段：5 分鐘有效（最晚到收盤）
+        - 盤後寫入：有效到下次開盤
         """
         cache = self.db.query(StockDetailCache).filter(
             StockDetailCache.symbol == symbol
         ).first()
         
         if not cache:
+            CACHE_REQUESTS.inc(cache="stock_detail", result="miss")
             return None
         
         # 檢查有效期
-        max_age = 5 if is_market_open_for_symbol(symbol) else 60  # 分鐘
-        age = (datetime.now() - cache.updated_at).total_seconds() / 60
-        
-        if age > max_age:
-            logger.debug(f"📦 股票詳情快取過期: {symbol} ({age:.1f} 分鐘)")
+        if not calendar_for_symbol(symbol).is_fresh(cache.updated_at, DETAIL_TTL):
+            logger.debug(f"📦 股票詳情快取過期: {symbol} ({cache.updated_at})")
+            CACHE_REQUESTS.inc(cache="stock_detail", result="expired")
             return None
         
         logger.debug(f"📦 股票詳情快取命中: {symbol}")
+        CACHE_REQUESTS.inc(cache="stock_detail", result="hit")
         return cache.to_dict()
     
     def save_stock_detail_cache(self, symbol: str, data: Dict) -> None:
@@ -99,25 +104,25 @@ class AnalysisCacheService:
     def get_indicator_cache(self, symbol: str) -> Optional[Dict]:
         """
         取得技術指標快取
-        - 交易時段：10 分鐘有效
-        - 非交易時段：24 小時有效（使用收盤資料）
+        - 交易時段：10 分鐘有效（最晚到收盤）
+        - 盤後寫入：有效到下次開盤（使用收盤資料）
         """
         cache = self.db.query(IndicatorCache).filter(
             IndicatorCache.symbol == symbol
         ).first()
         
         if not cache:
+            CACHE_REQUESTS.inc(cache="indicator", result="miss")
             return None
         
         # 檢查有效期
-        max_age = 10 if is_market_open_for_symbol(symbol) else 1440  # 分鐘
-        age = (datetime.now() - cache.updated_at).total_seconds() / 60
-        
-        if age > max_age:
-            logger.debug(f"📦 指標快取過期: {symbol} ({age:.1f} 分鐘)")
+        if not calendar_for_symbol(symbol).is_fresh(cache.updated_at, INDICATOR_TTL):
+            logger.debug(f"📦 指標快取過期: {symbol} ({cache.updated_at})")
+            CACHE_REQUESTS.inc(cache="indicator", result="expired")
             return None
         
         logger.debug(f"📦 指標快取命中: {symbol}")
+        CACHE_REQUESTS.inc(cache="indicator", result="hit")
         return cache.to_dict()
     
     def save_indicator_cache(self, symbol: str, data: Dict) -> None:
@@ -256,15 +261,10 @@ class AnalysisCacheService:
         """清除過期的快取"""
         now = datetime.now()
         
-        # 清除超過 24 小時的股票詳情
-        detail_deleted = self.db.query(StockDetailCache).filter(
-            StockDetailCache.updated_at < now - timedelta(hours=24)
-        ).delete()
-        
-        # 清除超過 48 小時的指標快取
-        indicator_deleted = self.db.query(IndicatorCache).filter(
-            IndicatorCache.updated_at < now - timedelta(hours=48)
-        ).delete()
+        # 股票詳情超過 24 小時、指標超過 48 小時，且已過了行事曆上的有效期
+        # （週末、連假期間盤後的快取保留到下次開盤）
+        detail_deleted = self._delete_expired(StockDetailCache, now - timedelta(hours=24), DETAIL_TTL)
+        indicator_deleted = self._delete_expired(IndicatorCache, now - timedelta(hours=48), INDICATOR_TTL)
         
         # 清除超過 2 小時的圖表快取
         chart_deleted = self.db.query(ChartCache).filter(
@@ -278,3 +278,16 @@ class AnalysisCacheService:
             "indicator_deleted": indicator_deleted,
             "chart_deleted": chart_deleted,
         }
+    
+    def _delete_expired(self, model, older_than: datetime, intraday_ttl: timedelta) -> int:
+        """刪除 older_than 之前寫入、且依行事曆已過期的快取"""
+        rows = self.db.execute(
+            select(model.symbol, model.updated_at).where(model.updated_at < older_than)
+        ).all()
+        expired = [
+            symbol for symbol, updated_at in rows
+            if not calendar_for_symbol(symbol).is_fresh(updated_at, intraday_ttl)
+        ]
+        if not expired:
+            return 0
+        return self.db.query(model).filter(model.symbol.in_(expired)).delete(synchronize_session=False)
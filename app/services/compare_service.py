@@ -20,6 +20,9 @@ import pandas as pd
 from app.models.comparison import Comparison
 from app.data_sources.yahoo_finance import yahoo_finance
 from app.data_sources.coingecko import coingecko, CRYPTO_MAP
+from app.services.dividend_service import DividendService, apply_dividend_adjustment
+from app.services.symbol_index import symbol_index
+from app.services.symbol_resolver import symbol_resolver
 
 logger = logging.getLogger(__name__)
 
@@ -159,38 +162,22 @@ class CompareService:
             else:
                 # 股票/指數/ETF 用 Yahoo Finance
                 period = "10y" if days >= 3650 else ("5y" if days >= 1825 else "1y")
-                df = yahoo_finance.get_stock_history(symbol, period=period)
-                
-                # 如果 .TW 找不到，嘗試 .TWO (上櫃股票)
-                if (df is None or df.empty) and symbol.endswith('.TW'):
-                    two_symbol = symbol.replace('.TW', '.TWO')
-                    logger.info(f"{symbol} 找不到，嘗試上櫃股票: {two_symbol}")
-                    df = yahoo_finance.get_stock_history(two_symbol, period=period)
-                    if df is not None and not df.empty:
-                        symbol = two_symbol
-                        logger.info(f"成功找到上櫃股票: {two_symbol}")
-                
-                info = yahoo_finance.get_stock_info(symbol)
+                # .TW 找不到時改查 .TWO (上櫃股票)，結果由解析快取記住
+                df, symbol = symbol_resolver.fetch(
+                    symbol, lambda s: yahoo_finance.get_stock_history(s, period=period)
+                )
                 
                 # 取得現價（用原始收盤價）
                 current_price = None
                 if df is not None and not df.empty:
                     current_price = float(df['close'].iloc[-1])
                 
-                if info:
-                    info_dict = {
-                        "name": info.get("name", symbol),
-                        "type": asset_type,
-                        "current_price": current_price or info.get("current_price"),
-                        "symbol": symbol,  # 可能已經改成 .TWO
-                    }
-                else:
-                    info_dict = {
-                        "name": symbol, 
-                        "type": asset_type, 
-                        "current_price": current_price,
-                        "symbol": symbol,
-                    }
+                info_dict = {
+                    "name": symbol_index.get_name(symbol),
+                    "type": asset_type,
+                    "current_price": current_price,
+                    "symbol": symbol,  # 可能已經改成 .TWO
+                }
                 
                 return df, info_dict
             
@@ -203,12 +190,16 @@ class CompareService:
         symbol: str,
         df: pd.DataFrame,
         years: int,
+        dividends: Optional[pd.DataFrame] = None,
     ) -> Optional[float]:
         """
         計算含配息調整的 CAGR
         
         使用 adj_close（分割調整）+ 配息還原
         這和股票查詢頁面的計算方式一致
+        
+        Args:
+            dividends: DataFrame(date, amount)，None 表示不做配息還原
         """
         if df is None or df.empty:
             return None
@@ -244,49 +235,15 @@ class CompareService:
             if start_price <= 0:
                 return None
             
-            # 取得配息資料並調整
-            try:
-                dividends_df = yahoo_finance.get_dividends(symbol, period=f"{years + 1}y")
-                
-                if dividends_df is not None and not dividends_df.empty:
-                    # 建立含配息調整的價格序列
-                    df_adj = df.copy()
-                    df_adj['adj_with_div'] = df_adj[price_col].astype(float)
-                    
-                    date_to_idx = {row['date']: idx for idx, row in df_adj.iterrows()}
-                    
-                    # 篩選在計算範圍內的配息
-                    min_date = df_adj['date'].min()
-                    max_date = df_adj['date'].max()
-                    
-                    dividends = {}
-                    for _, row in dividends_df.iterrows():
-                        div_date = row['date']
-                        if isinstance(div_date, str):
-                            div_date = datetime.strptime(div_date, '%Y-%m-%d').date()
-                        elif hasattr(div_date, 'date'):
-                            div_date = div_date.date()
-                        if min_date < div_date <= max_date:
-                            dividends[div_date] = float(row['amount'])
-                    
-                    # 從最新到最舊處理配息（配息還原調整）
-                    for div_date, div_amount in sorted(dividends.items(), reverse=True):
-                        if div_date in date_to_idx:
-                            ex_idx = date_to_idx[div_date]
-                            if ex_idx > 0:
-                                prev_price = df_adj.loc[ex_idx - 1, 'adj_with_div']
-                                if prev_price > div_amount and div_amount > 0:
-                                    adjustment_factor = prev_price / (prev_price - div_amount)
-                                    df_adj.loc[:ex_idx-1, 'adj_with_div'] = df_adj.loc[:ex_idx-1, 'adj_with_div'] / adjustment_factor
-                    
-                    # 使用調整後的價格計算
-                    start_price = float(df_adj[df_adj['date'] <= target_date].iloc[-1]['adj_with_div'])
-                    current_price = float(df_adj.iloc[-1]['adj_with_div'])
-                    
-                    logger.debug(f"{symbol} 配息調整: 找到 {len(dividends)} 筆配息")
-                    
-            except Exception as e:
-                logger.warning(f"{symbol} 配息調整失敗，使用基本計算: {e}")
+            # 配息還原（配息資料由 compare_cagr 每個標的只查一次）
+            if dividends is not None and not dividends.empty:
+                try:
+                    adj_with_div = apply_dividend_adjustment(df, dividends, price_col)
+                    start_price = float(adj_with_div[df['date'] <= target_date].iloc[-1])
+                    current_price = float(adj_with_div.iloc[-1])
+                    logger.debug(f"{symbol} 配息調整: 共 {len(dividends)} 筆配息")
+                except Exception as e:
+                    logger.warning(f"{symbol} 配息調整失敗，使用基本計算: {e}")
             
             # 實際年數（更精確）
             actual_days = (current_date - start_date).days
@@ -308,6 +265,22 @@ class CompareService:
             logger.error(f"計算 {symbol} CAGR 失敗: {e}")
             return None
     
+    def _load_dividends(self, symbol: str) -> Optional[pd.DataFrame]:
+        """從配息資料表取得配息（必要時增量同步），加密貨幣與指數不查"""
+        if symbol.startswith("^") or self._get_asset_type(symbol) == "crypto":
+            return None
+        
+        from app.database import SyncSessionLocal
+        
+        db = SyncSessionLocal()
+        try:
+            return DividendService(db).get_dividends(symbol)
+        except Exception as e:
+            logger.warning(f"{symbol} 取得配息失敗: {e}")
+            return None
+        finally:
+            db.close()
+    
     def _calculate_custom_cagr(
         self,
         df: pd.DataFrame,
@@ -420,12 +393,13 @@ class CompareService:
                 continue
             
             # 計算各週期 CAGR（使用含配息的計算）
+            dividends = self._load_dividends(actual_symbol)
             cagr_results = {}
             for period in periods:
                 period_years = {"1y": 1, "3y": 3, "5y": 5, "10y": 10}.get(period)
                 if period_years:
                     cagr_results[period] = self._calculate_cagr_with_dividends(
-                        actual_symbol, df, period_years
+                        actual_symbol, df, period_years, dividends
                     )
             
             # 自訂區間
@@ -447,12 +421,13 @@ class CompareService:
         if benchmark:
             benchmark_df, benchmark_info = await self._fetch_price_data(benchmark, max_days)
             if benchmark_df is not None:
+                benchmark_dividends = self._load_dividends(benchmark)
                 benchmark_cagr = {}
                 for period in periods:
                     period_years = {"1y": 1, "3y": 3, "5y": 5, "10y": 10}.get(period)
                     if period_years:
                         benchmark_cagr[period] = self._calculate_cagr_with_dividends(
-                            benchmark, benchmark_df, period_years
+                            benchmark, benchmark_df, period_years, benchmark_dividends
                         )
                 
                 benchmark_data = {
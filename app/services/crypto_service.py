@@ -3,8 +3,8 @@
 整合 CoinGecko 資料、快取和技術指標計算
 """
 import pandas as pd
-from datetime import datetime, date, timedelta
-from typing import Optional, Dict, Any, List
+from datetime import datetime, date, timedelta, timezone
+from typing import Optional, Dict, Any, List, Tuple
 from sqlalchemy.orm import Session
 from sqlalchemy import select, and_
 import logging
@@ -18,6 +18,18 @@ from app.config import settings
 
 logger = logging.getLogger(__name__)
 
+# 本地保留的歷史天數（CoinGecko 免費 API 只能查最近 365 天）
+MAX_HISTORY_DAYS = 365
+
+# 相距不超過這麼多天的缺口合併成一次請求
+GAP_MERGE_DAYS = 30
+
+# 每次同步最多補幾個缺口區間（其餘下次再補）
+MAX_GAP_REQUESTS = 5
+
+# CoinGecko 確認沒有資料的缺口日期寫入空價格的佔位列，超過這麼多天才再查一次
+GAP_RETRY_DAYS = 7
+
 
 class CryptoService:
     """加密貨幣服務"""
@@ -25,61 +37,199 @@ class CryptoService:
     def __init__(self, db: Session):
         self.db = db
     
-    def _is_cache_valid(self, symbol: str) -> bool:
-        """檢查快取是否有效"""
-        today = date.today()
+    def _stored_dates(self, symbol: str, since: date) -> Dict[date, Optional[datetime]]:
+        """
+        已存的日期與更新時間（不載入價格以外的欄位）
         
-        stmt = (
-            select(CryptoPrice)
-            .where(CryptoPrice.symbol == symbol.upper())
-            .order_by(CryptoPrice.date.desc())
-            .limit(1)
-        )
-        result = self.db.execute(stmt).scalar_one_or_none()
+        佔位列（price 為空）在 GAP_RETRY_DAYS 內視為已存；過期的不列入，下次同步當作缺口重查
+        """
+        rows = self.db.execute(
+            select(CryptoPrice.date, CryptoPrice.updated_at, CryptoPrice.price).where(
+                and_(
+                    CryptoPrice.symbol == symbol,
+                    CryptoPrice.date >= since,
+                )
+            )
+        ).all()
+        retry_before = datetime.now() - timedelta(days=GAP_RETRY_DAYS)
+        return {
+            r.date: r.updated_at
+            for r in rows
+            if r.price is not None or (r.updated_at is not None and r.updated_at >= retry_before)
+        }
+    
+    def _missing_ranges(
+        self,
+        stored: Dict[date, Optional[datetime]],
+        today: date,
+    ) -> Tuple[List[Tuple[date, date]], Optional[Tuple[date, date]]]:
+        """
+        找出需要向 CoinGecko 抓的日期區間
+        
+        - 中間缺口：相距不到 GAP_MERGE_DAYS 的缺口合併成一次請求
+        - 尾端：最新日期（可能是未收完的當日K）到今天
+        
+        Returns:
+            (中間缺口區間, 尾端區間或 None)
+        """
+        since = today - timedelta(days=MAX_HISTORY_DAYS)
         
-        if not result:
-            return False
+        if not stored:
+            return [], (since, today)
         
-        # 加密貨幣市場 24/7，檢查更新時間
-        if result.updated_at:
-            cache_minutes = settings.CRYPTO_DATA_CACHE_MINUTES
-            cache_deadline = datetime.now() - timedelta(minutes=cache_minutes)
-            if result.updated_at > cache_deadline:
-                return True
+        latest = max(stored)
+        ranges: List[Tuple[date, date]] = []
         
-        return False
+        gaps = pd.date_range(min(stored), latest, freq="D").date
+        gaps = [d for d in gaps if d not in stored]
+        for d in gaps:
+            if ranges and (d - ranges[-1][1]).days <= GAP_MERGE_DAYS:
+                ranges[-1] = (ranges[-1][0], d)
+            else:
+                ranges.append((d, d))
+        ranges = ranges[:MAX_GAP_REQUESTS]
+        
+        # 尾端：過了當日或當日K超過快取時間才更新
+        updated_at = stored[latest]
+        deadline = datetime.now() - timedelta(minutes=settings.CRYPTO_DATA_CACHE_MINUTES)
+        tail = None
+        if latest < today or updated_at is None or updated_at < deadline:
+            tail = (latest, today)
+        
+        return ranges, tail
     
-    def _save_prices_to_db(self, df: pd.DataFrame) -> int:
-        """儲存價格資料到資料庫"""
-        if df is None or df.empty:
+    @staticmethod
+    def _roll_daily(points: pd.DataFrame) -> pd.DataFrame:
+        """原始價格點合併成日K（UTC 日期，開高低收取當日價格點）"""
+        points = points.dropna(subset=["price"])
+        grouped = points.groupby(points["timestamp"].dt.date)
+        
+        daily = grouped["price"].agg(open="first", high="max", low="min", price="last")
+        daily["volume_24h"] = grouped["volume_24h"].last()
+        daily["market_cap"] = grouped["market_cap"].last()
+        daily.index.name = "date"
+        
+        return daily.reset_index()
+    
+    def _upsert_daily_bars(self, symbol: str, bars: pd.DataFrame) -> int:
+        """寫入日K：一次查出既有列，更新或新增後一次 commit"""
+        if bars is None or bars.empty:
             return 0
         
-        count = 0
-        for _, row in df.iterrows():
-            stmt = select(CryptoPrice).where(
-                and_(
-                    CryptoPrice.symbol == row["symbol"],
-                    CryptoPrice.date == row["date"],
+        existing = {
+            row.date: row
+            for row in self.db.execute(
+                select(CryptoPrice).where(
+                    and_(
+                        CryptoPrice.symbol == symbol,
+                        CryptoPrice.date.in_(list(bars["date"])),
+                    )
                 )
-            )
-            existing = self.db.execute(stmt).scalar_one_or_none()
-            
-            if existing:
-                existing.price = row.get("price") or row.get("close")
-                existing.volume_24h = row.get("volume_24h")
-                existing.market_cap = row.get("market_cap")
+            ).scalars().all()
+        }
+        
+        now = datetime.now()
+        new_rows = []
+        for bar in bars.itertuples(index=False):
+            values = {
+                "price": bar.price,
+                "open": bar.open,
+                "high": bar.high,
+                "low": bar.low,
+                "volume_24h": None if pd.isna(bar.volume_24h) else bar.volume_24h,
+                "market_cap": None if pd.isna(bar.market_cap) else bar.market_cap,
+            }
+            row = existing.get(bar.date)
+            if row is not None:
+                for key, value in values.items():
+                    setattr(row, key, value)
+                row.updated_at = now
             else:
-                price = CryptoPrice(
-                    symbol=row["symbol"],
-                    date=row["date"],
-                    price=row.get("price") or row.get("close"),
-                    volume_24h=row.get("volume_24h"),
-                    market_cap=row.get("market_cap"),
-                )
-                self.db.add(price)
-                count += 1
+                new_rows.append(CryptoPrice(symbol=symbol, date=bar.date, updated_at=now, **values))
         
+        if new_rows:
+            self.db.add_all(new_rows)
         self.db.commit()
+        return len(bars)
+    
+    def _mark_no_data(self, symbol: str, dates: List[date]) -> None:
+        """CoinGecko 確認沒有資料的日期寫入佔位列（只有 updated_at），GAP_RETRY_DAYS 內不再重抓"""
+        if not dates:
+            return
+        
+        now = datetime.now()
+        existing = {
+            row.date: row
+            for row in self.db.execute(
+                select(CryptoPrice).where(
+                    and_(
+                        CryptoPrice.symbol == symbol,
+                        CryptoPrice.date.in_(dates),
+                    )
+                )
+            ).scalars().all()
+        }
+        for d in dates:
+            row = existing.get(d)
+            if row is None:
+                self.db.add(CryptoPrice(symbol=symbol, date=d, updated_at=now))
+            elif row.price is None:
+                row.updated_at = now
+        self.db.commit()
+        logger.info(f"🪙 {symbol} {len(dates)} 個日期 CoinGecko 沒有資料，{GAP_RETRY_DAYS} 天後再查")
+    
+    def sync_history(self, symbol: str, force: bool = False) -> int:
+        """
+        增量同步歷史價格
+        
+        只抓最新日期之後與中間缺口的資料，已完整的日期不再重抓；
+        缺口查過但 CoinGecko 沒有資料的日期記成佔位列，GAP_RETRY_DAYS 後才重查
+        
+        Args:
+            symbol: 代號
+            force: 忽略當日K的快取時間，一定更新尾端
+            
+        Returns:
+            寫入（新增或更新）的日K數
+        """
+        symbol = symbol.upper()
+        today = datetime.now(timezone.utc).date()
+        
+        stored = self._stored_dates(symbol, today - timedelta(days=MAX_HISTORY_DAYS))
+        if force and stored:
+            stored[max(stored)] = None
+        
+        gaps, tail = self._missing_ranges(stored, today)
+        ranges = gaps + ([tail] if tail else [])
+        if not ranges:
+            return 0
+        
+        count = 0
+        now = datetime.now(timezone.utc)
+        for start, end in ranges:
+            range_start = datetime.combine(start, datetime.min.time(), tzinfo=timezone.utc)
+            range_end = min(now, datetime.combine(end + timedelta(days=1), datetime.min.time(), tzinfo=timezone.utc))
+            
+            points = coingecko.get_market_chart_range(symbol, range_start, range_end)
+            if points is None:
+                # 請求失敗，不記錄，下次同步再試
+                logger.warning(f"{symbol} {start} ~ {end} 沒有取得資料")
+                continue
+            
+            bars = self._roll_daily(points) if not points.empty else points
+            if not bars.empty:
+                bars = bars[(bars["date"] >= start) & (bars["date"] <= end)]
+                count += self._upsert_daily_bars(symbol, bars)
+            
+            if (start, end) in gaps:
+                covered = set(bars["date"]) if not bars.empty else set()
+                self._mark_no_data(symbol, [
+                    d for d in pd.date_range(start, end, freq="D").date
+                    if d not in stored and d not in covered
+                ])
+        
+        if count:
+            logger.info(f"🪙 {symbol} 同步 {len(ranges)} 個區間，寫入 {count} 根日K")
         return count
     
     def _load_prices_from_db(
@@ -91,74 +241,83 @@ class CryptoService:
         start_date = date.today() - timedelta(days=days)
         
         stmt = (
-            select(CryptoPrice)
+            select(
+                CryptoPrice.symbol,
+                CryptoPrice.date,
+                CryptoPrice.price,
+                CryptoPrice.open,
+                CryptoPrice.high,
+                CryptoPrice.low,
+                CryptoPrice.volume_24h,
+                CryptoPrice.market_cap,
+            )
             .where(
                 and_(
                     CryptoPrice.symbol == symbol.upper(),
                     CryptoPrice.date >= start_date,
+                    CryptoPrice.price.isnot(None),
                 )
             )
             .order_by(CryptoPrice.date)
         )
-        results = self.db.execute(stmt).scalars().all()
+        rows = self.db.execute(stmt).all()
         
-        if not results:
+        if not rows:
             return None
         
-        data = []
-        for r in results:
-            data.append({
-                "symbol": r.symbol,
-                "date": r.date,
-                "close": float(r.price) if r.price else None,
-                "price": float(r.price) if r.price else None,
-                "volume": float(r.volume_24h) if r.volume_24h else 0,
-                "volume_24h": float(r.volume_24h) if r.volume_24h else None,
-                "market_cap": float(r.market_cap) if r.market_cap else None,
-                # 加密貨幣沒有 OHLC，用 close 填充
-                "open": float(r.price) if r.price else None,
-                "high": float(r.price) if r.price else None,
-                "low": float(r.price) if r.price else None,
-            })
-        
-        return pd.DataFrame(data)
-    
-    def fetch_and_cache_crypto(self, symbol: str, days: int = 365) -> bool:
-        """抓取加密貨幣資料並快取"""
-        df = coingecko.get_market_chart(symbol, days=days)
-        if df is None:
-            return False
+        df = pd.DataFrame(rows, columns=["symbol", "date", "price", "open", "high", "low", "volume_24h", "market_cap"])
+        for col in ["price", "open", "high", "low", "volume_24h", "market_cap"]:
+            df[col] = pd.to_numeric(df[col], errors="coerce")
         
-        # 轉換欄位名稱以符合資料庫
         df["close"] = df["price"]
+        # 舊資料沒有開高低，用收盤價填充
+        for col in ["open", "high", "low"]:
+            df[col] = df[col].fillna(df["close"])
+        df["volume"] = df["volume_24h"].fillna(0)
         
-        self._save_prices_to_db(df)
-        return True
+        return df
+    
+    def get_price_history(
+        self,
+        symbol: str,
+        days: int = 365,
+    ) -> Optional[pd.DataFrame]:
+        """
+        取得加密貨幣價格歷史（從資料庫，不含指標）
+        
+        Args:
+            symbol: 代號
+            days: 天數
+            
+        Returns:
+            價格 DataFrame
+        """
+        return self._load_prices_from_db(symbol, days)
+    
+    def fetch_and_cache_crypto(self, symbol: str, days: int = 365) -> bool:
+        """抓取加密貨幣資料並快取（增量）"""
+        self.sync_history(symbol)
+        return self._load_prices_from_db(symbol, days=days) is not None
     
     def get_crypto_data(
         self,
         symbol: str,
         force_refresh: bool = False,
     ) -> Optional[pd.DataFrame]:
-        """取得加密貨幣資料（優先使用快取）"""
+        """取得加密貨幣資料（本地歷史為主，只補抓缺少的日期）"""
         symbol = symbol.upper()
         
         if not coingecko.validate_symbol(symbol):
             logger.warning(f"不支援的加密貨幣: {symbol}")
             return None
         
-        # 檢查快取
-        if not force_refresh and self._is_cache_valid(symbol):
-            logger.info(f"使用快取資料: {symbol}")
-            df = self._load_prices_from_db(symbol)
-        else:
-            logger.info(f"從 CoinGecko 抓取: {symbol}")
-            if not self.fetch_and_cache_crypto(symbol):
-                df = self._load_prices_from_db(symbol)
-                if df is None:
-                    return None
-            else:
-                df = self._load_prices_from_db(symbol)
+        try:
+            self.sync_history(symbol, force=force_refresh)
+        except Exception as e:
+            self.db.rollback()
+            logger.warning(f"同步 {symbol} 歷史失敗，使用既有資料: {e}")
+        
+        df = self._load_prices_from_db(symbol)
         
         if df is None or df.empty:
             return None
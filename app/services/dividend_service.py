@@ -0,0 +1,199 @@
+"""
+配息資料服務
+============
+將 Yahoo 配息資料持久化到 dividend_history，供含息報酬率計算共用
+
+- 每個 symbol 一天最多向 Yahoo 查詢一次（成功才記錄在 dividend_sync_status，失敗下次再試）
+- 有資料後只抓最新除息日之後的配息（增量）
+- 配息還原以向量化方式計算，不再逐筆配息修改整段 DataFrame
+"""
+import pandas as pd
+import numpy as np
+from datetime import datetime, date, timedelta
+from typing import Optional
+from sqlalchemy.orm import Session
+from sqlalchemy import select, and_
+import logging
+
+from app.models.dividend_history import DividendHistory, DividendSyncStatus
+from app.data_sources.yahoo_finance import yahoo_finance
+
+logger = logging.getLogger(__name__)
+
+# 同一檔股票兩次向 Yahoo 查詢配息的最短間隔
+REFRESH_INTERVAL = timedelta(hours=24)
+
+# 首次同步抓取的年數
+INITIAL_PERIOD = "10y"
+
+
+class DividendService:
+    """配息資料服務（DB 優先，Yahoo 增量補齊）"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def refresh(self, symbol: str, force: bool = False) -> int:
+        """
+        同步配息資料
+
+        Args:
+            symbol: 股票代號（例如 AAPL、0050.TW）
+            force: 忽略一天一次的限制
+
+        Returns:
+            新增筆數
+        """
+        symbol = symbol.upper()
+
+        # 指數沒有配息
+        if symbol.startswith("^"):
+            return 0
+
+        try:
+            status = self.db.get(DividendSyncStatus, symbol)
+            now = datetime.now()
+
+            if (
+                not force
+                and status is not None
+                and now - status.last_checked_at < REFRESH_INTERVAL
+            ):
+                return 0
+
+            since = status.latest_ex_date if status is not None else None
+            if since is not None:
+                df = yahoo_finance.get_dividends(symbol, since=since)
+            else:
+                df = yahoo_finance.get_dividends(symbol, period=INITIAL_PERIOD)
+
+            if df is None:
+                # 查詢失敗不記錄檢查時間，下次呼叫再試
+                logger.warning(f"⚠️ {symbol} 配息查詢失敗，稍後重試")
+                return 0
+
+            count = self._save(symbol, df)
+
+            if status is None:
+                status = DividendSyncStatus(symbol=symbol, last_checked_at=now)
+                self.db.add(status)
+            status.last_checked_at = now
+            if not df.empty:
+                latest = max(df["date"])
+                if status.latest_ex_date is None or latest > status.latest_ex_date:
+                    status.latest_ex_date = latest
+
+            self.db.commit()
+
+            if count:
+                logger.info(f"💰 {symbol} 配息新增 {count} 筆")
+            return count
+
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"❌ 同步 {symbol} 配息失敗: {e}")
+            return 0
+
+    def _save(self, symbol: str, df: Optional[pd.DataFrame]) -> int:
+        """寫入尚未存在的配息（一次查出既有日期，不逐筆查詢）"""
+        if df is None or df.empty:
+            return 0
+
+        existing = set(
+            self.db.execute(
+                select(DividendHistory.date).where(DividendHistory.symbol == symbol)
+            ).scalars().all()
+        )
+
+        new_rows = [
+            DividendHistory(symbol=symbol, date=d, amount=float(a))
+            for d, a in zip(df["date"], df["amount"])
+            if d not in existing and a > 0
+        ]
+        if new_rows:
+            self.db.add_all(new_rows)
+        return len(new_rows)
+
+    def get_dividends(
+        self,
+        symbol: str,
+        start_date: Optional[date] = None,
+        refresh: bool = True,
+    ) -> pd.DataFrame:
+        """
+        取得配息歷史
+
+        Args:
+            symbol: 股票代號
+            start_date: 起始日期（含），None 表示全部
+            refresh: 是否先做增量同步
+
+        Returns:
+            DataFrame(date, amount)，依日期排序；無資料時為空 DataFrame
+        """
+        symbol = symbol.upper()
+
+        if refresh:
+            self.refresh(symbol)
+
+        conditions = [DividendHistory.symbol == symbol]
+        if start_date is not None:
+            conditions.append(DividendHistory.date >= start_date)
+
+        rows = self.db.execute(
+            select(DividendHistory.date, DividendHistory.amount)
+            .where(and_(*conditions))
+            .order_by(DividendHistory.date)
+        ).all()
+
+        return pd.DataFrame(
+            [(r.date, float(r.amount)) for r in rows],
+            columns=["date", "amount"],
+        )
+
+
+def apply_dividend_adjustment(
+    df: pd.DataFrame,
+    dividends: Optional[pd.DataFrame],
+    price_col: str = "adj_close",
+) -> pd.Series:
+    """
+    計算配息還原後的價格序列（向量化）
+
+    每筆配息在除息日前一天乘上 (1 - 配息 / 前一日收盤)，
+    再由後往前累乘，得到每一天的還原係數。
+    除息日不在交易日上時，對齊到之後第一個交易日。
+
+    Args:
+        df: 價格資料，需有 date 欄位且已依日期排序
+        dividends: DataFrame(date, amount)
+        price_col: 要還原的價格欄位
+
+    Returns:
+        與 df 同 index 的還原價格 Series
+    """
+    prices = df[price_col].astype(float).to_numpy()
+
+    if dividends is None or dividends.empty or len(prices) < 2:
+        return pd.Series(prices, index=df.index)
+
+    dates = pd.to_datetime(df["date"]).to_numpy()
+    div_dates = pd.to_datetime(dividends["date"]).to_numpy()
+    amounts = dividends["amount"].astype(float).to_numpy()
+
+    # 除息日對應到的 index；0 表示在資料開始前，len 表示在資料結束後
+    ex_idx = np.searchsorted(dates, div_dates, side="left")
+    valid = (ex_idx > 0) & (ex_idx < len(prices)) & (amounts > 0)
+    ex_idx, amounts = ex_idx[valid], amounts[valid]
+
+    prev_close = prices[ex_idx - 1]
+    ok = prev_close > amounts
+    ex_idx, amounts, prev_close = ex_idx[ok], amounts[ok], prev_close[ok]
+
+    factors = np.ones(len(prices))
+    np.multiply.at(factors, ex_idx - 1, 1.0 - amounts / prev_close)
+
+    # 由後往前累乘：第 j 天的係數 = j 之後（含）所有配息因子的乘積
+    multiplier = np.cumprod(factors[::-1])[::-1]
+
+    return pd.Series(prices * multiplier, index=df.index)
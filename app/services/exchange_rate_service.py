@@ -6,11 +6,11 @@ import logging
 from datetime import datetime
 from typing import Optional
 
-import yfinance as yf
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+from app.data_sources.provider import get_provider
 from app.models.portfolio import ExchangeRate
 
 logger = logging.getLogger(__name__)
@@ -25,7 +25,7 @@ def fetch_usd_twd_rate() -> Optional[float]:
     返回 None 表示抓取失敗
     """
     try:
-        ticker = yf.Ticker("TWD=X")
+        ticker = get_provider().ticker("TWD=X")
         data = ticker.history(period="1d")
         
         if data.empty:
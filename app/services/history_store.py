@@ -0,0 +1,208 @@
+"""
+欄式歷史資料儲存（Arrow IPC，memory-mapped）
+============================================
+HISTORY_STORE=arrow 時，StockHistoryService 的日線讀取改走這裡，不再從
+stock_prices 逐列取出 Decimal 再組 DataFrame。stock_prices 仍是正式資料
+（其他服務直接查詢），這裡是寫入時同步更新的欄式副本。
+
+- 每個代號一個檔案：<HISTORY_STORE_DIR>/<market>/<SYMBOL>.arrow
+  欄位 date(date32), open, high, low, close, adj_close(float64), volume(int64)
+- 讀取：memory_map + Arrow IPC，數值欄直接對應檔案頁面，不建立逐列物件；
+  轉好的 DataFrame 依檔案 mtime 快取（LRU），之後的讀取只剩切片
+- 寫入：新 K 棒與舊資料合併（同日期以新資料為準）後寫到暫存檔再 os.replace，
+  正在讀舊檔的 worker 不受影響；分割事件改變時才由資料庫整份重建
+
+Arrow IPC 而非 Parquet：Parquet 需要解壓縮、無法 memory-map 直接使用
+"""
+import logging
+import os
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ["date", "open", "high", "low", "close", "volume", "adj_close"]
+PRICE_COLUMNS = ["open", "high", "low", "close", "adj_close"]
+
+# 每個 worker 快取的代號數（一檔 10 年約 0.2 MB）
+FRAME_CACHE_SIZE = 256
+
+
+class ArrowHistoryStore:
+    """每個代號一個 Arrow IPC 檔"""
+    
+    def __init__(self, root: str, cache_size: int = FRAME_CACHE_SIZE):
+        import pyarrow  # noqa: F401  沒安裝時在建立時就報錯，而不是第一次讀取
+    
+        self.root = root
+        self.cache_size = cache_size
+        # path -> (mtime_ns, DataFrame（含 symbol 欄）, date 的 datetime64 陣列)
+        self._frames: "OrderedDict[str, Tuple[int, pd.DataFrame, np.ndarray]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def path(self, symbol: str) -> str:
+        from app.services.price_cache_service import get_symbol_market
+    
+        symbol = symbol.upper()
+        safe = symbol.replace("^", "_").replace("/", "_")
+        return os.path.join(self.root, get_symbol_market(symbol), f"{safe}.arrow")
+    
+    # ==================== 讀取 ====================
+    
+    def _frame(self, symbol: str) -> Optional[Tuple[int, pd.DataFrame, np.ndarray]]:
+        path = self.path(symbol)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+    
+        with self._lock:
+            cached = self._frames.get(path)
+            if cached is not None and cached[0] == mtime:
+                self._frames.move_to_end(path)
+                return cached
+    
+        df = self._read(path)
+        df["symbol"] = symbol.upper()
+        entry = (mtime, df, pd.to_datetime(df["date"]).to_numpy())
+        with self._lock:
+            self._frames[path] = entry
+            self._frames.move_to_end(path)
+            while len(self._frames) > self.cache_size:
+                self._frames.popitem(last=False)
+        return entry
+    
+    @staticmethod
+    def _read(path: str) -> pd.DataFrame:
+        import pyarrow as pa
+    
+        with pa.memory_map(path, "r") as source:
+            table = pa.ipc.open_file(source).read_all()
+        df = table.to_pandas(date_as_object=True)
+        df["volume"] = df["volume"].astype("int64")
+        return df
+    
+    def info(self, symbol: str) -> Optional[Tuple[date, int, datetime]]:
+        """(最新日期, 筆數, 最後寫入時間)；沒有檔案時為 None"""
+        entry = self._frame(symbol)
+        if entry is None or entry[1].empty:
+            return None
+        mtime, df, _ = entry
+        return df["date"].iloc[-1], len(df), datetime.fromtimestamp(mtime / 1e9)
+    
+    def load(self, symbol: str, start: Optional[date] = None) -> Optional[pd.DataFrame]:
+        """start 之後的日線，格式與 StockHistoryService._load_from_db 相同"""
+        entry = self._frame(symbol)
+        if entry is None or entry[1].empty:
+            return None
+        _, df, dates = entry
+    
+        i = int(np.searchsorted(dates, np.datetime64(start))) if start else 0
+        if i >= len(df):
+            return None
+        # pandas Copy-on-Write：切片不複製資料，呼叫端修改時才各自複製，快取不受影響
+        return df.iloc[i:].reset_index(drop=True)
+    
+    # ==================== 寫入 ====================
+    
+    def write(self, symbol: str, df: pd.DataFrame, written_at: Optional[datetime] = None) -> int:
+        """
+        整份覆寫
+    
+        written_at: 資料實際抓取的時間（由 DB 匯出時沿用最新一列的 updated_at），
+        檔案 mtime 會設成這個時間，info() 判斷盤中 / 盤後寫入才不會被匯出時間騙過
+        """
+        frame = self._normalize(df)
+        path = self.path(symbol)
+        self._write(path, frame)
+        if written_at is not None:
+            ts = written_at.timestamp()
+            os.utime(path, (ts, ts))
+        return len(frame)
+    
+    def append(self, symbol: str, df: pd.DataFrame) -> int:
+        """
+        合併新的 K 棒（同日期覆蓋舊資料）
+    
+        Returns:
+            合併後筆數
+        """
+        new = self._normalize(df)
+        entry = self._frame(symbol)
+        if entry is not None:
+            old = entry[1][COLUMNS]
+            new = pd.concat([old[~old["date"].isin(set(new["date"]))], new], ignore_index=True)
+            new = new.sort_values("date", kind="stable").reset_index(drop=True)
+        self._write(self.path(symbol), new)
+        return len(new)
+    
+    def delete(self, symbol: Optional[str] = None) -> int:
+        """刪除單一代號或全部檔案"""
+        if symbol:
+            paths = [self.path(symbol)]
+        else:
+            paths = [
+                os.path.join(d, f)
+                for d, _, files in os.walk(self.root)
+                for f in files if f.endswith(".arrow")
+            ]
+        removed = 0
+        for path in paths:
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            for path in paths:
+                self._frames.pop(path, None)
+        return removed
+    
+    @staticmethod
+    def _normalize(df: pd.DataFrame) -> pd.DataFrame:
+        frame = df[COLUMNS].copy()
+        frame["date"] = pd.to_datetime(frame["date"]).dt.date
+        for col in PRICE_COLUMNS:
+            frame[col] = frame[col].astype("float64")
+        frame["volume"] = frame["volume"].fillna(0).astype("int64")
+        return frame.sort_values("date", kind="stable").reset_index(drop=True)
+    
+    @staticmethod
+    def _write(path: str, frame: pd.DataFrame):
+        import pyarrow as pa
+    
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with pa.OSFile(tmp, "wb") as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+
+_store: Optional[ArrowHistoryStore] = None
+_store_lock = threading.Lock()
+
+
+def get_history_store() -> Optional[ArrowHistoryStore]:
+    """HISTORY_STORE=arrow 時的欄式儲存；db（預設）時為 None"""
+    global _store
+    if (settings.HISTORY_STORE or "db").lower() != "arrow":
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ArrowHistoryStore(settings.HISTORY_STORE_DIR)
+                logger.info(f"🗄️ 歷史資料使用 Arrow 欄式儲存: {settings.HISTORY_STORE_DIR}")
+    return _store
@@ -92,6 +92,9 @@ class IndexService:
             
             self.db.commit()
             
+            from app.services.market_service import invalidate_index_history
+            invalidate_index_history()
+            
             logger.info(f"✅ {symbol} 更新完成: {count} 筆")
             return {
                 "success": True,
@@ -9,6 +9,7 @@ from dataclasses import dataclass
 from enum import Enum
 
 from app.config import settings
+from app.utils.perf import span
 
 
 class TrendDirection(Enum):
@@ -555,13 +556,14 @@ class IndicatorService:
     
     def calculate_all_indicators(self, df: pd.DataFrame) -> pd.DataFrame:
         """計算所有技術指標"""
-        df = self.add_ma_indicators(df)
-        df = self.add_rsi_indicator(df)
-        df = self.add_macd_indicator(df)
-        df = self.add_kd_indicator(df)
-        df = self.add_bollinger_indicator(df)
-        df = self.add_obv_indicator(df)
-        df = self.add_volume_indicator(df)
+        with span("indicators"):
+            df = self.add_ma_indicators(df)
+            df = self.add_rsi_indicator(df)
+            df = self.add_macd_indicator(df)
+            df = self.add_kd_indicator(df)
+            df = self.add_bollinger_indicator(df)
+            df = self.add_obv_indicator(df)
+            df = self.add_volume_indicator(df)
         return df
     
     def get_all_signals(self, df: pd.DataFrame) -> List[Signal]:
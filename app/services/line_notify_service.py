@@ -8,6 +8,7 @@ from typing import List, Optional, Dict, Any
 from datetime import datetime
 
 from app.config import settings
+from app.data_sources.provider import get_provider
 
 logger = logging.getLogger(__name__)
 
@@ -33,6 +34,10 @@ class LineNotifyService:
             "Authorization": f"Bearer {self.channel_access_token}",
         }
     
+    def _client(self) -> httpx.AsyncClient:
+        """LINE API 連線（DATA_PROVIDER=replay 時推播只記錄不送出）"""
+        return httpx.AsyncClient(transport=get_provider().async_transport())
+    
     async def push_text_message(
         self, 
         user_id: str, 
@@ -67,7 +72,7 @@ class LineNotifyService:
         }
         
         try:
-            async with httpx.AsyncClient() as client:
+            async with self._client() as client:
                 response = await client.post(
                     self.PUSH_URL,
                     headers=self._get_headers(),
@@ -119,7 +124,7 @@ class LineNotifyService:
         }
         
         try:
-            async with httpx.AsyncClient() as client:
+            async with self._client() as client:
                 response = await client.post(
                     self.PUSH_URL,
                     headers=self._get_headers(),
@@ -176,7 +181,7 @@ class LineNotifyService:
         }
         
         try:
-            async with httpx.AsyncClient() as client:
+            async with self._client() as client:
                 response = await client.post(
                     self.MULTICAST_URL,
                     headers=self._get_headers(),
@@ -219,7 +224,7 @@ class LineNotifyService:
         }
         
         try:
-            async with httpx.AsyncClient() as client:
+            async with self._client() as client:
                 response = await client.post(
                     self.BROADCAST_URL,
                     headers=self._get_headers(),
@@ -21,6 +21,9 @@ from app.models.dividend_history import DividendHistory
 from app.models.stock_price import StockPrice
 from app.data_sources.yahoo_finance import yahoo_finance
 from app.data_sources.fear_greed import fear_greed
+from app.utils.cache_bus import cache_bus
+from app.utils.downsample import lttb_indices
+from app.utils.metrics import CACHE_REQUESTS, CACHE_ENTRIES
 
 logger = logging.getLogger(__name__)
 
@@ -30,21 +33,30 @@ logger = logging.getLogger(__name__)
 # ============================================================
 
 class MemoryCache:
-    """簡單的內存快取，線程安全"""
+    """
+    簡單的內存快取，線程安全
     
-    def __init__(self):
+    資料寫入後用 invalidate()：透過 cache_bus 同時清除其他 worker 的同名快取
+    """
+    
+    def __init__(self, name: str = "memory"):
+        self.name = name
         self._cache: Dict[str, Any] = {}
         self._timestamps: Dict[str, datetime] = {}
         self._lock = threading.Lock()
+        CACHE_ENTRIES.track(lambda: len(self._cache), cache=name)
+        cache_bus.subscribe(name, self.clear)
     
     def get(self, key: str, max_age_seconds: int = 60) -> Optional[Any]:
         """取得快取值，過期返回 None"""
         with self._lock:
             if key not in self._cache:
+                CACHE_REQUESTS.inc(cache=self.name, result="miss")
                 return None
             
             timestamp = self._timestamps.get(key)
             if timestamp is None:
+                CACHE_REQUESTS.inc(cache=self.name, result="miss")
                 return None
             
             age = (datetime.now() - timestamp).total_seconds()
@@ -52,8 +64,10 @@ class MemoryCache:
                 # 過期，清除
                 del self._cache[key]
                 del self._timestamps[key]
+                CACHE_REQUESTS.inc(cache=self.name, result="expired")
                 return None
             
+            CACHE_REQUESTS.inc(cache=self.name, result="hit")
             return self._cache[key]
     
     def set(self, key: str, value: Any) -> None:
@@ -62,8 +76,12 @@ class MemoryCache:
             self._cache[key] = value
             self._timestamps[key] = datetime.now()
     
+    def invalidate(self, key: str = None) -> None:
+        """資料已變更：清除本行程與其他 worker 的快取"""
+        cache_bus.publish(self.name, key)
+    
     def clear(self, key: str = None) -> None:
-        """清除快取"""
+        """清除快取（只有本行程）"""
         with self._lock:
             if key:
                 self._cache.pop(key, None)
@@ -74,11 +92,19 @@ class MemoryCache:
 
 
 # 全域快取實例
-_memory_cache = MemoryCache()
+_memory_cache = MemoryCache("market")
+# 指數歷史（依 代號 / 天數 / 點數 分開快取，寫入新資料時整個清除）
+_index_history_cache = MemoryCache("index_history")
 
 # 快取有效期（秒）
 SENTIMENT_CACHE_SECONDS = 60  # 情緒指數 60 秒
 INDICES_CACHE_SECONDS = 60    # 指數 60 秒
+INDEX_HISTORY_CACHE_SECONDS = 300  # 指數歷史 5 分鐘
+
+
+def invalidate_index_history():
+    """指數價格寫入後清除歷史快取（所有天數、解析度）"""
+    _index_history_cache.invalidate()
 
 
 class MarketService:
@@ -148,8 +174,18 @@ class MarketService:
         self,
         symbol: str,
         days: int = 365,
+        points: Optional[int] = None,
     ) -> List[Dict[str, Any]]:
-        """取得指數歷史資料"""
+        """
+        取得指數歷史資料（快取 5 分鐘）
+        
+        points: 依收盤價 LTTB 降採樣到這個點數（圖表用），None 為每一天
+        """
+        cache_key = f"{symbol}:{days}:{points or 0}"
+        cached = _index_history_cache.get(cache_key, INDEX_HISTORY_CACHE_SECONDS)
+        if cached is not None:
+            return cached
+        
         start_date = date.today() - timedelta(days=days)
         
         stmt = (
@@ -164,7 +200,13 @@ class MarketService:
         )
         results = self.db.execute(stmt).scalars().all()
         
-        return [r.to_dict() for r in results]
+        if points and points < len(results):
+            closes = [float(r.close) if r.close is not None else float("nan") for r in results]
+            results = [results[i] for i in lttb_indices(closes, points)]
+        
+        history = [r.to_dict() for r in results]
+        _index_history_cache.set(cache_key, history)
+        return history
     
     def save_index_data(self, df: pd.DataFrame, symbol: str) -> int:
         """儲存指數資料到資料庫"""
@@ -223,7 +265,8 @@ class MarketService:
                 count += 1
         
         self.db.commit()
-        _memory_cache.clear("indices")
+        _memory_cache.invalidate("indices")
+        invalidate_index_history()
         return count
     
     def fetch_and_save_all_indices(self, period: str = "10y") -> Dict[str, int]:
@@ -386,7 +429,7 @@ class MarketService:
             self.db.add(sentiment)
         
         self.db.commit()
-        _memory_cache.clear("sentiment")
+        _memory_cache.invalidate("sentiment")
         return True
     
     def fetch_and_save_crypto_history(self, days: int = 365) -> int:
@@ -420,7 +463,7 @@ class MarketService:
                 logger.error(f"儲存情緒資料失敗: {e}")
         
         self.db.commit()
-        _memory_cache.clear("sentiment")
+        _memory_cache.invalidate("sentiment")
         logger.info(f"幣圈情緒歷史新增 {count} 筆")
         return count
     
@@ -0,0 +1,270 @@
+"""
+投資組合歷史淨值服務
+====================
+由交易紀錄重建每日持股，搭配 stock_prices 收盤價與匯率，
+一次向量化計算每日市值、成本與報酬率（TWR / MWR）
+
+- 持股：每筆交易的股數變化 pivot 成 (日期 × 股票) 後累加，是階梯函數
+- 成本：每檔股票只在交易日重算平均成本（交易筆數級），再向後填滿
+- 價格：stock_prices 收盤價；沒有快取的股票用成交價補
+- 匯率：stock_prices 有 TWD=X 歷史就用，否則用目前匯率
+- 結果依使用者快取，交易異動時清除
+"""
+import logging
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Optional, Dict, Any, List
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.portfolio import PortfolioTransaction
+from app.models.stock_price import StockPrice
+from app.services.market_service import MemoryCache
+from app.services.portfolio_service import PortfolioService
+
+logger = logging.getLogger(__name__)
+
+# 每位使用者的計算結果（交易異動時 invalidate）
+_history_cache = MemoryCache("portfolio_history")
+HISTORY_CACHE_SECONDS = 3600
+
+FX_SYMBOL = "TWD=X"
+
+
+def invalidate_portfolio_history(user_id: int):
+    """交易異動後清除該使用者的歷史淨值快取"""
+    _history_cache.invalidate(f"portfolio_history:{user_id}")
+
+
+def _price_symbols(symbol: str, market: str) -> List[str]:
+    """持股代號在 stock_prices 可能的代號（台股可能沒寫後綴）"""
+    if market == "tw" and "." not in symbol:
+        return [f"{symbol}.TW", f"{symbol}.TWO"]
+    return [symbol]
+
+
+def _xirr(amounts: np.ndarray, days: np.ndarray) -> Optional[float]:
+    """
+    資金加權報酬率（年化 IRR），二分法求解
+
+    Args:
+        amounts: 現金流（投入為負、取回與期末市值為正）
+        days: 距第一筆現金流的天數
+    """
+    if len(amounts) < 2 or not (amounts < 0).any() or not (amounts > 0).any():
+        return None
+
+    years = days / 365.0
+
+    def npv(rate: float) -> float:
+        return float(np.sum(amounts / np.power(1.0 + rate, years)))
+
+    low, high = -0.9999, 10.0
+    f_low, f_high = npv(low), npv(high)
+    if f_low * f_high > 0:
+        return None
+
+    for _ in range(200):
+        mid = (low + high) / 2
+        f_mid = npv(mid)
+        if abs(f_mid) < 1e-6:
+            break
+        if f_low * f_mid < 0:
+            high, f_high = mid, f_mid
+        else:
+            low, f_low = mid, f_mid
+
+    return (low + high) / 2
+
+
+class PortfolioHistoryService:
+    """投資組合歷史淨值"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self._fx_from_history = False
+
+    async def get_history(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """
+        取得每日市值、成本與報酬率序列（TWD）
+
+        Returns:
+            {"dates", "market_value", "cost_basis", "net_flow", "twr", "mwr", ...}；
+            沒有交易時返回 None
+        """
+        cache_key = f"portfolio_history:{user_id}"
+        cached = _history_cache.get(cache_key, max_age_seconds=HISTORY_CACHE_SECONDS)
+        if cached is not None:
+            return cached
+
+        result = await self._compute(user_id)
+        if result is not None:
+            _history_cache.set(cache_key, result)
+        return result
+
+    async def _compute(self, user_id: int) -> Optional[Dict[str, Any]]:
+        stmt = select(PortfolioTransaction).where(
+            PortfolioTransaction.user_id == user_id
+        ).order_by(
+            PortfolioTransaction.transaction_date.asc(),
+            PortfolioTransaction.id.asc(),
+        )
+        transactions = list((await self.db.execute(stmt)).scalars().all())
+
+        if not transactions:
+            return None
+
+        tx = pd.DataFrame([{
+            "id": t.id,
+            "key": f"{t.market}:{t.symbol}",
+            "symbol": t.symbol,
+            "market": t.market,
+            "date": pd.Timestamp(t.transaction_date),
+            "price": float(t.price),
+            # 外部現金流（原幣）：買入投入、賣出取回
+            "flow": (
+                t.quantity * float(t.price) + float(t.fee or 0)
+                if t.transaction_type == "buy"
+                else -(t.quantity * float(t.price) - float(t.fee or 0) - float(t.tax or 0))
+            ),
+        } for t in transactions])
+
+        start = tx["date"].min()
+        # 交易日以外也要納入有交易的日期（例如週末補登）
+        calendar = pd.bdate_range(start, pd.Timestamp(date.today())).union(
+            pd.DatetimeIndex(tx["date"].unique())
+        )
+
+        keys = tx[["key", "symbol", "market"]].drop_duplicates("key").set_index("key")
+
+        # 每日持股與成本：每檔只在交易日套用帳本規則（_apply_transaction，
+        # 無持股的賣出忽略、超賣歸零），再向後填滿
+        ledger_points = []
+        ignored = set()
+        for key, group in _group_transactions(transactions).items():
+            shares, cost, realized = 0, Decimal("0"), Decimal("0")
+            for t in group:
+                if t.transaction_type != "buy" and shares <= 0:
+                    ignored.add(t.id)
+                shares, cost, realized = PortfolioService._apply_transaction(shares, cost, realized, t)
+                ledger_points.append((pd.Timestamp(t.transaction_date), key, shares, float(cost)))
+        ledger = (
+            pd.DataFrame(ledger_points, columns=["date", "key", "shares", "cost"])
+            .groupby(["date", "key"]).last()
+        )
+        qty = ledger["shares"].unstack().reindex(calendar).ffill().fillna(0)
+        cost = ledger["cost"].unstack().reindex(calendar).ffill().fillna(0)
+        # 帳本忽略的賣出也沒有現金流
+        tx.loc[tx["id"].isin(ignored), "flow"] = 0.0
+
+        # 收盤價：stock_prices 優先，沒有的用成交價補
+        closes = await self._load_closes(keys, start)
+        tx_prices = tx.pivot_table(index="date", columns="key", values="price", aggfunc="last")
+        prices = (
+            closes.reindex(calendar)
+            .combine_first(tx_prices.reindex(calendar))
+            .reindex(columns=qty.columns)
+            .astype(float)
+            .ffill()
+        )
+
+        # 匯率：美股乘上 USD/TWD
+        fx = await self._load_fx(calendar, start)
+        is_us = (keys.loc[qty.columns, "market"] == "us").to_numpy()
+        fx_matrix = np.where(is_us, fx.to_numpy()[:, None], 1.0)
+
+        market_value = (qty.to_numpy() * np.nan_to_num(prices.to_numpy()) * fx_matrix).sum(axis=1)
+        cost_basis = (cost.to_numpy() * fx_matrix).sum(axis=1)
+
+        flow_by_day = (
+            tx.assign(
+                flow_twd=tx["flow"] * np.where(
+                    tx["market"] == "us",
+                    fx.reindex(tx["date"]).ffill().bfill().to_numpy(),
+                    1.0,
+                )
+            )
+            .groupby("date")["flow_twd"].sum()
+            .reindex(calendar, fill_value=0.0)
+            .to_numpy()
+        )
+
+        # TWR：每日報酬 = (今日市值 - 當日淨投入) / 昨日市值 - 1
+        prev_value = np.concatenate([[0.0], market_value[:-1]])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            daily_return = np.where(prev_value > 0, (market_value - flow_by_day) / prev_value - 1, 0.0)
+        daily_return = np.nan_to_num(daily_return)
+        twr = np.cumprod(1 + daily_return) - 1
+
+        # MWR：投入為負、取回為正，期末市值視為取回
+        offsets = (calendar - calendar[0]).days.to_numpy()
+        amounts = -flow_by_day.copy()
+        amounts[-1] += market_value[-1]
+        nonzero = amounts != 0
+        mwr = _xirr(amounts[nonzero], offsets[nonzero].astype(float))
+
+        return {
+            "dates": [d.strftime("%Y-%m-%d") for d in calendar],
+            "market_value": np.round(market_value, 2).tolist(),
+            "cost_basis": np.round(cost_basis, 2).tolist(),
+            "net_flow": np.round(flow_by_day, 2).tolist(),
+            "twr": np.round(twr * 100, 4).tolist(),
+            "mwr": round(mwr * 100, 2) if mwr is not None else None,
+            "currency": "TWD",
+            "fx_source": "history" if self._fx_from_history else "current",
+        }
+
+    async def _load_closes(self, keys: pd.DataFrame, start: pd.Timestamp) -> pd.DataFrame:
+        """一次查出所有持股的收盤價，欄位為持股 key"""
+        lookup: Dict[str, str] = {}
+        for key, row in keys.iterrows():
+            for candidate in _price_symbols(row["symbol"], row["market"]):
+                lookup.setdefault(candidate, key)
+
+        stmt = select(StockPrice.symbol, StockPrice.date, StockPrice.close).where(
+            StockPrice.symbol.in_(list(lookup.keys())),
+            StockPrice.date >= start.date(),
+        )
+        rows = (await self.db.execute(stmt)).all()
+
+        if not rows:
+            return pd.DataFrame(columns=keys.index)
+
+        df = pd.DataFrame(rows, columns=["symbol", "date", "close"])
+        df["key"] = df["symbol"].map(lookup)
+        df["date"] = pd.to_datetime(df["date"])
+        df["close"] = df["close"].astype(float)
+
+        # 同一持股有 .TW / .TWO 兩份時取任一（實際只會有一份）
+        return df.pivot_table(index="date", columns="key", values="close", aggfunc="last")
+
+    async def _load_fx(self, calendar: pd.DatetimeIndex, start: pd.Timestamp) -> pd.Series:
+        """USD/TWD 每日匯率"""
+        stmt = select(StockPrice.date, StockPrice.close).where(
+            StockPrice.symbol == FX_SYMBOL,
+            StockPrice.date >= (start - timedelta(days=10)).date(),
+        ).order_by(StockPrice.date)
+        rows = (await self.db.execute(stmt)).all()
+
+        current = await PortfolioService(self.db)._get_exchange_rate()
+        self._fx_from_history = bool(rows)
+
+        if not rows:
+            return pd.Series(current, index=calendar)
+
+        fx = pd.Series(
+            [float(r.close) for r in rows],
+            index=pd.to_datetime([r.date for r in rows]),
+        )
+        return fx.reindex(fx.index.union(calendar)).ffill().reindex(calendar).fillna(current)
+
+
+def _group_transactions(transactions: List[PortfolioTransaction]) -> Dict[str, List[PortfolioTransaction]]:
+    """依持股 key 分組（保持原本排序）"""
+    groups: Dict[str, List[PortfolioTransaction]] = {}
+    for t in transactions:
+        groups.setdefault(f"{t.market}:{t.symbol}", []).append(t)
+    return groups
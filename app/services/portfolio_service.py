@@ -3,20 +3,79 @@
 處理交易紀錄的 CRUD 和持股計算
 """
 from datetime import date, datetime
-from decimal import Decimal
-import yfinance as yf
-from typing import List, Optional, Dict, Any
+from decimal import Decimal, ROUND_HALF_UP
+from typing import List, Optional, Dict, Any, Set, Tuple
+import asyncio
 import logging
+import threading
 
-from sqlalchemy import select, update, delete, func, and_
+from sqlalchemy import select, update, delete, insert, func, and_
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.data_sources.provider import get_provider
 from app.models.portfolio import PortfolioTransaction, PortfolioHolding, ExchangeRate
 from app.models.price_cache import StockPriceCache
 from app.services.exchange_rate_service import DEFAULT_USD_TWD_RATE
 
 logger = logging.getLogger(__name__)
 
+# 背景價格更新：排隊中的 symbols（避免同一檔被重複排入）
+_pending_price_symbols: Set[str] = set()
+_pending_lock = threading.Lock()
+
+
+def _refresh_missing_prices(symbols: List[str]):
+    """背景執行：從 Yahoo 取得價格寫入價格快取"""
+    from app.services.cache_helper import cache_stock_price
+    
+    try:
+        for symbol in symbols:
+            try:
+                info = get_provider().ticker(symbol).info
+                price = info.get('regularMarketPrice') or info.get('currentPrice')
+                if not price:
+                    continue
+                prev_close = info.get('regularMarketPreviousClose') or info.get('previousClose')
+                change = price - prev_close if prev_close else None
+                cache_stock_price(
+                    symbol=symbol,
+                    name=info.get('shortName') or info.get('longName') or "",
+                    price=float(price),
+                    prev_close=prev_close,
+                    change=change,
+                    change_pct=(change / prev_close * 100) if prev_close and change else None,
+                    volume=info.get('regularMarketVolume') or info.get('volume'),
+                )
+            except Exception as e:
+                logger.debug(f"背景價格更新失敗 {symbol}: {e}")
+    finally:
+        with _pending_lock:
+            _pending_price_symbols.difference_update(symbols)
+
+
+def _queue_price_refresh(symbols: List[str]):
+    """把缺少價格的 symbols 排入背景更新（不等待結果）"""
+    with _pending_lock:
+        new_symbols = [s for s in symbols if s not in _pending_price_symbols]
+        _pending_price_symbols.update(new_symbols)
+    
+    if not new_symbols:
+        return
+    
+    logger.info(f"⏳ 持股缺少價格，背景更新: {new_symbols}")
+    try:
+        asyncio.get_running_loop().run_in_executor(None, _refresh_missing_prices, new_symbols)
+    except RuntimeError:
+        # 沒有 event loop（同步呼叫），直接在背景執行緒跑
+        threading.Thread(target=_refresh_missing_prices, args=(new_symbols,), daemon=True).start()
+
+# 持股金額的精度（與 portfolio_holdings 的 Numeric(14, 2) 相同）
+LEDGER_CENT = Decimal("0.01")
+
+
+def _to_cent(value: Decimal) -> Decimal:
+    return value.quantize(LEDGER_CENT, rounding=ROUND_HALF_UP)
+
 
 class PortfolioService:
     """投資組合服務"""
@@ -46,14 +105,7 @@ class PortfolioService:
         """新增交易紀錄"""
         
         # 驗證
-        if transaction_type not in ("buy", "sell"):
-            raise ValueError("transaction_type 必須是 'buy' 或 'sell'")
-        if market not in ("tw", "us"):
-            raise ValueError("market 必須是 'tw' 或 'us'")
-        if quantity <= 0:
-            raise ValueError("quantity 必須大於 0")
-        if price <= 0:
-            raise ValueError("price 必須大於 0")
+        self._validate_transaction(market, transaction_type, quantity, price)
         
         # 標準化 symbol
         symbol = symbol.upper().strip()
@@ -80,11 +132,119 @@ class PortfolioService:
         
         logger.info(f"新增交易: user={user_id}, {transaction_type} {quantity} {symbol} @ {price}")
         
-        # 更新持股彙總
-        await self._update_holding(user_id, symbol, market, name)
+        # 更新持股彙總：排在最後的交易直接增量套用，補登舊交易才完整重算
+        if not await self._apply_to_holding(transaction):
+            await self._update_holding(user_id, symbol, market, name)
+        self._invalidate_history(user_id)
         
         return transaction
     
+    @staticmethod
+    def _invalidate_history(user_id: int):
+        """交易異動後清除歷史淨值快取"""
+        from app.services.portfolio_history_service import invalidate_portfolio_history
+        invalidate_portfolio_history(user_id)
+    
+    @staticmethod
+    def _validate_transaction(market: str, transaction_type: str, quantity: int, price: float):
+        """驗證交易欄位，不合法時拋出 ValueError"""
+        if transaction_type not in ("buy", "sell"):
+            raise ValueError("transaction_type 必須是 'buy' 或 'sell'")
+        if market not in ("tw", "us"):
+            raise ValueError("market 必須是 'tw' 或 'us'")
+        if quantity <= 0:
+            raise ValueError("quantity 必須大於 0")
+        if price <= 0:
+            raise ValueError("price 必須大於 0")
+    
+    async def import_transactions(
+        self,
+        user_id: int,
+        items: List[Dict[str, Any]],
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        批次匯入交易紀錄
+        
+        先驗證全部項目，再以一個多列 INSERT 寫入；
+        每檔受影響的股票只重算一次持股，整批在同一個交易內 commit
+        
+        Args:
+            items: 欄位同 create_transaction，transaction_date 可為 date 或 YYYY-MM-DD 字串
+            
+        Returns:
+            {"added": [...], "errors": [...]}
+        """
+        rows = []
+        errors = []
+        touched: Dict[tuple, Optional[str]] = {}
+        
+        for item in items:
+            try:
+                symbol = str(item["symbol"]).upper().strip()
+                market = item.get("market", "tw")
+                transaction_type = item.get("transaction_type", "buy")
+                quantity = int(item["quantity"])
+                price = float(item["price"])
+                self._validate_transaction(market, transaction_type, quantity, price)
+                
+                trans_date = item["transaction_date"]
+                if isinstance(trans_date, str):
+                    trans_date = datetime.strptime(trans_date, "%Y-%m-%d").date()
+                
+                fee = item.get("fee") or 0
+                tax = item.get("tax") or 0
+                
+                rows.append({
+                    "user_id": user_id,
+                    "symbol": symbol,
+                    "name": item.get("name"),
+                    "market": market,
+                    "transaction_type": transaction_type,
+                    "quantity": quantity,
+                    "price": Decimal(str(price)),
+                    "fee": Decimal(str(fee)),
+                    "tax": Decimal(str(tax)),
+                    "transaction_date": trans_date,
+                    "note": item.get("note"),
+                    "broker_id": item.get("broker_id"),
+                })
+                key = (symbol, market)
+                touched[key] = item.get("name") or touched.get(key)
+            except Exception as e:
+                errors.append({
+                    "symbol": item.get("symbol"),
+                    "date": str(item.get("transaction_date")),
+                    "error": str(e),
+                })
+        
+        if not rows:
+            return {"added": [], "errors": errors}
+        
+        try:
+            stmt = insert(PortfolioTransaction).returning(
+                PortfolioTransaction.id,
+                PortfolioTransaction.symbol,
+                PortfolioTransaction.transaction_type,
+                sort_by_parameter_order=True,
+            )
+            result = await self.db.execute(stmt, rows)
+            added = [
+                {"id": r.id, "symbol": r.symbol, "transaction_type": r.transaction_type}
+                for r in result.all()
+            ]
+            
+            for (symbol, market), name in touched.items():
+                await self._update_holding(user_id, symbol, market, name, commit=False)
+            
+            await self.db.commit()
+        except Exception:
+            await self.db.rollback()
+            raise
+        
+        self._invalidate_history(user_id)
+        logger.info(f"批次匯入交易: user={user_id}, 新增 {len(added)} 筆, 影響 {len(touched)} 檔")
+        return {"added": added, "errors": errors}
+    
     async def get_transaction(self, transaction_id: int, user_id: int) -> Optional[PortfolioTransaction]:
         """取得單筆交易"""
         stmt = select(PortfolioTransaction).where(
@@ -158,6 +318,7 @@ class PortfolioService:
         if old_symbol != transaction.symbol or old_market != transaction.market:
             await self._update_holding(user_id, old_symbol, old_market)
         
+        self._invalidate_history(user_id)
         logger.info(f"更新交易: id={transaction_id}")
         return transaction
     
@@ -176,6 +337,7 @@ class PortfolioService:
         # 更新持股彙總
         await self._update_holding(user_id, symbol, market)
         
+        self._invalidate_history(user_id)
         logger.info(f"刪除交易: id={transaction_id}")
         return True
     
@@ -183,60 +345,75 @@ class PortfolioService:
     # 持股彙總
     # ============================================================
     
-    async def _update_holding(
+    @staticmethod
+    def _apply_transaction(
+        total_shares: int,
+        total_cost: Decimal,
+        realized_profit: Decimal,
+        tx: PortfolioTransaction,
+    ) -> Tuple[int, Decimal, Decimal]:
+        """
+        把一筆交易套用到持股狀態（平均成本法），返回新的 (股數, 成本, 已實現損益)
+        
+        每筆交易後成本與已實現損益都四捨五入到分，和寫入 DB 的值完全相同：
+        增量更新從 DB 讀回的狀態接著算，結果與從頭重算一致，不會逐筆累積誤差
+        """
+        if tx.transaction_type == "buy":
+            total_shares += tx.quantity
+            total_cost += Decimal(str(tx.quantity)) * tx.price + (tx.fee or Decimal("0"))
+        else:  # sell
+            if total_shares > 0:
+                # 計算已實現損益（先進先出）
+                avg_cost = total_cost / Decimal(str(total_shares)) if total_shares > 0 else Decimal("0")
+                sell_revenue = Decimal(str(tx.quantity)) * tx.price - (tx.fee or Decimal("0")) - (tx.tax or Decimal("0"))
+                sell_cost = avg_cost * Decimal(str(tx.quantity))
+                realized_profit += sell_revenue - sell_cost
+                
+                # 更新持股和成本
+                total_shares -= tx.quantity
+                total_cost -= sell_cost
+                
+                if total_shares <= 0:
+                    total_shares = 0
+                    total_cost = Decimal("0")
+        
+        return total_shares, _to_cent(total_cost), _to_cent(realized_profit)
+    
+    async def _load_symbol_transactions(
         self,
         user_id: int,
         symbol: str,
         market: str,
-        name: Optional[str] = None,
-    ):
-        """更新單一股票的持股彙總"""
-        
-        # 取得該股票的所有交易
+    ) -> List[PortfolioTransaction]:
+        """取得單一股票的所有交易（依日期、id 排序，即套用順序）"""
         stmt = select(PortfolioTransaction).where(
             and_(
                 PortfolioTransaction.user_id == user_id,
                 PortfolioTransaction.symbol == symbol,
                 PortfolioTransaction.market == market,
             )
-        ).order_by(PortfolioTransaction.transaction_date.asc())
+        ).order_by(
+            PortfolioTransaction.transaction_date.asc(),
+            PortfolioTransaction.id.asc(),
+        )
         
         result = await self.db.execute(stmt)
-        transactions = list(result.scalars().all())
-        
-        # 計算持股
+        return list(result.scalars().all())
+    
+    def _replay(self, transactions: List[PortfolioTransaction]) -> Tuple[int, Decimal, Decimal]:
+        """從頭重算持股"""
         total_shares = 0
         total_cost = Decimal("0")
         realized_profit = Decimal("0")
-        latest_name = name
         
         for tx in transactions:
-            if tx.name:
-                latest_name = tx.name
-            
-            if tx.transaction_type == "buy":
-                total_shares += tx.quantity
-                total_cost += Decimal(str(tx.quantity)) * tx.price + (tx.fee or Decimal("0"))
-            else:  # sell
-                if total_shares > 0:
-                    # 計算已實現損益（先進先出）
-                    avg_cost = total_cost / Decimal(str(total_shares)) if total_shares > 0 else Decimal("0")
-                    sell_revenue = Decimal(str(tx.quantity)) * tx.price - (tx.fee or Decimal("0")) - (tx.tax or Decimal("0"))
-                    sell_cost = avg_cost * Decimal(str(tx.quantity))
-                    realized_profit += sell_revenue - sell_cost
-                    
-                    # 更新持股和成本
-                    total_shares -= tx.quantity
-                    total_cost -= sell_cost
-                    
-                    if total_shares <= 0:
-                        total_shares = 0
-                        total_cost = Decimal("0")
-        
-        # 計算平均成本
-        avg_cost = total_cost / Decimal(str(total_shares)) if total_shares > 0 else Decimal("0")
+            total_shares, total_cost, realized_profit = self._apply_transaction(
+                total_shares, total_cost, realized_profit, tx
+            )
         
-        # 更新或建立 Holding
+        return total_shares, total_cost, realized_profit
+    
+    async def _get_holding(self, user_id: int, symbol: str, market: str) -> Optional[PortfolioHolding]:
         stmt = select(PortfolioHolding).where(
             and_(
                 PortfolioHolding.user_id == user_id,
@@ -245,7 +422,93 @@ class PortfolioService:
             )
         )
         result = await self.db.execute(stmt)
-        holding = result.scalar_one_or_none()
+        return result.scalar_one_or_none()
+    
+    async def _apply_to_holding(self, tx: PortfolioTransaction) -> bool:
+        """
+        新增交易時以增量方式更新持股（O(1)，不重讀歷史）
+        
+        只有在交易排在最後一筆已套用交易之後才適用；
+        補登較早日期的交易、或持股紀錄不存在 / 沒有套用紀錄時返回 False，
+        由呼叫端改做完整重算
+        
+        寫入以讀到的 last_tx 為條件：同一股票同時新增兩筆交易時，後寫入的那筆
+        條件不成立（沒有更新任何列），返回 False 改做完整重算，不會蓋掉前一筆的增量
+        """
+        holding = await self._get_holding(tx.user_id, tx.symbol, tx.market)
+        
+        if holding is None or holding.last_tx_date is None or holding.last_tx_id is None:
+            return False
+        
+        if (tx.transaction_date, tx.id) <= (holding.last_tx_date, holding.last_tx_id):
+            return False
+        
+        total_shares, total_cost, realized_profit = self._apply_transaction(
+            holding.total_shares or 0,
+            holding.total_invested or Decimal("0"),
+            holding.realized_profit or Decimal("0"),
+            tx,
+        )
+        
+        unchanged = and_(
+            PortfolioHolding.id == holding.id,
+            PortfolioHolding.last_tx_date == holding.last_tx_date,
+            PortfolioHolding.last_tx_id == holding.last_tx_id,
+        )
+        if total_shares <= 0 and realized_profit == 0:
+            stmt = delete(PortfolioHolding).where(unchanged)
+        else:
+            values = {
+                "total_shares": total_shares,
+                "avg_cost": total_cost / Decimal(str(total_shares)) if total_shares > 0 else Decimal("0"),
+                "total_invested": total_cost,
+                "realized_profit": realized_profit,
+                "last_tx_date": tx.transaction_date,
+                "last_tx_id": tx.id,
+            }
+            if tx.name:
+                values["name"] = tx.name
+            stmt = update(PortfolioHolding).where(unchanged).values(**values)
+        
+        result = await self.db.execute(stmt)
+        if result.rowcount != 1:
+            # 沒有寫入任何列；只讓讀到的舊持股失效，交易物件呼叫端還要用
+            self.db.expire(holding)
+            await self.db.commit()
+            logger.info(f"持股已被其他請求更新，改為完整重算: user={tx.user_id}, {tx.symbol}")
+            return False
+        
+        await self.db.commit()
+        return True
+    
+    async def _update_holding(
+        self,
+        user_id: int,
+        symbol: str,
+        market: str,
+        name: Optional[str] = None,
+        commit: bool = True,
+    ):
+        """
+        完整重算單一股票的持股彙總
+        
+        commit=False 時只寫入 session，由呼叫端統一 commit（批次匯入用）
+        """
+        transactions = await self._load_symbol_transactions(user_id, symbol, market)
+        
+        # 計算持股
+        total_shares, total_cost, realized_profit = self._replay(transactions)
+        latest_name = name
+        for tx in transactions:
+            if tx.name:
+                latest_name = tx.name
+        last_tx = transactions[-1] if transactions else None
+        
+        # 計算平均成本
+        avg_cost = total_cost / Decimal(str(total_shares)) if total_shares > 0 else Decimal("0")
+        
+        # 更新或建立 Holding
+        holding = await self._get_holding(user_id, symbol, market)
         
         if total_shares > 0 or realized_profit != 0:
             if holding:
@@ -268,11 +531,86 @@ class PortfolioService:
                 )
                 self.db.add(holding)
             
-            await self.db.commit()
+            holding.last_tx_date = last_tx.transaction_date if last_tx else None
+            holding.last_tx_id = last_tx.id if last_tx else None
+            
+            if commit:
+                await self.db.commit()
         elif holding:
             # 沒有持股也沒有已實現損益，刪除 Holding
             await self.db.delete(holding)
+            if commit:
+                await self.db.commit()
+    
+    async def verify_holdings(
+        self,
+        user_id: int,
+        repair: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        一致性檢查：比對持股紀錄與完整重算的結果
+        
+        重算與增量更新每筆都四捨五入到分（見 _apply_transaction），
+        兩者必須完全相同，任何差異都是帳本錯誤
+        
+        Args:
+            repair: 發現不一致時以完整重算結果覆寫
+            
+        Returns:
+            {"checked": 檢查檔數, "mismatches": [...], "repaired": 修復檔數}
+        """
+        stmt = select(PortfolioTransaction.symbol, PortfolioTransaction.market).where(
+            PortfolioTransaction.user_id == user_id
+        ).distinct()
+        keys = {(r.symbol, r.market) for r in (await self.db.execute(stmt)).all()}
+        
+        holdings = {(h.symbol, h.market): h for h in await self.get_holdings(user_id)}
+        keys.update(holdings.keys())
+        
+        mismatches = []
+        for symbol, market in sorted(keys):
+            transactions = await self._load_symbol_transactions(user_id, symbol, market)
+            shares, cost, realized = self._replay(transactions)
+            holding = holdings.get((symbol, market))
+            
+            if holding is None:
+                ok = shares <= 0 and realized == 0
+                stored = None
+            else:
+                ok = (
+                    holding.total_shares == shares
+                    and _to_cent(holding.total_invested or Decimal("0")) == cost
+                    and _to_cent(holding.realized_profit or Decimal("0")) == realized
+                )
+                stored = {
+                    "total_shares": holding.total_shares,
+                    "total_invested": float(holding.total_invested or 0),
+                    "realized_profit": float(holding.realized_profit or 0),
+                }
+            
+            if not ok:
+                mismatches.append({
+                    "symbol": symbol,
+                    "market": market,
+                    "stored": stored,
+                    "expected": {
+                        "total_shares": shares,
+                        "total_invested": float(cost),
+                        "realized_profit": float(realized),
+                    },
+                })
+        
+        if repair and mismatches:
+            for m in mismatches:
+                await self._update_holding(user_id, m["symbol"], m["market"], commit=False)
             await self.db.commit()
+            logger.warning(f"持股帳本修復: user={user_id}, {len(mismatches)} 檔")
+        
+        return {
+            "checked": len(keys),
+            "mismatches": mismatches,
+            "repaired": len(mismatches) if repair else 0,
+        }
     
     async def get_holdings(
         self,
@@ -297,50 +635,39 @@ class PortfolioService:
         user_id: int,
         market: Optional[str] = None,
     ) -> List[Dict[str, Any]]:
-        """取得持股列表（含現價）"""
-        holdings = await self.get_holdings(user_id, market)
+        """
+        取得持股列表（含現價）
+        
+        持股與價格快取一次 JOIN 取得；快取沒有的價格排入背景更新，不阻塞回應
+        """
+        stmt = (
+            select(PortfolioHolding, StockPriceCache)
+            .outerjoin(StockPriceCache, StockPriceCache.symbol == PortfolioHolding.symbol)
+            .where(PortfolioHolding.user_id == user_id)
+        )
         
-        if not holdings:
-            return []
+        if market:
+            stmt = stmt.where(PortfolioHolding.market == market)
         
-        # 取得價格快取
-        symbols = [h.symbol for h in holdings]
-        cache_stmt = select(StockPriceCache).where(
-            StockPriceCache.symbol.in_(symbols)
-        )
-        cache_result = await self.db.execute(cache_stmt)
-        price_cache = {r.symbol: r for r in cache_result.scalars().all()}
+        stmt = stmt.order_by(PortfolioHolding.symbol)
         
-        # 找出快取中沒有的 symbols
-        missing_symbols = [h.symbol for h in holdings if h.symbol not in price_cache]
+        rows = (await self.db.execute(stmt)).all()
         
-        # 即時從 Yahoo Finance 取得缺失的價格
-        realtime_prices = {}
+        if not rows:
+            return []
+        
+        # 找出快取中沒有價格的 symbols，交給背景更新
+        missing_symbols = [
+            h.symbol for h, cache in rows
+            if h.total_shares > 0 and not (cache and cache.price)
+        ]
         if missing_symbols:
-            try:
-                for symbol in missing_symbols:
-                    try:
-                        ticker = yf.Ticker(symbol)
-                        info = ticker.info
-                        price = info.get('regularMarketPrice') or info.get('currentPrice')
-                        if price:
-                            realtime_prices[symbol] = float(price)
-                    except Exception:
-                        pass
-            except Exception as e:
-                logger.warning(f"即時價格查詢失敗: {e}")
+            _queue_price_refresh(missing_symbols)
         
         # 組合資料
         result = []
-        for h in holdings:
-            cache = price_cache.get(h.symbol)
-            # 優先用快取，沒有則用即時價格
-            if cache and cache.price:
-                current_price = float(cache.price)
-            elif h.symbol in realtime_prices:
-                current_price = realtime_prices[h.symbol]
-            else:
-                current_price = None
+        for h, cache in rows:
+            current_price = float(cache.price) if cache and cache.price else None
             
             # 計算未實現損益
             unrealized_profit = None
@@ -361,40 +688,37 @@ class PortfolioService:
                 "unrealized_profit": unrealized_profit,
                 "unrealized_profit_pct": unrealized_profit_pct,
                 "price_change_pct": float(cache.change_pct) if cache and cache.change_pct else None,
+                "price_pending": current_price is None and h.total_shares > 0,
             })
         
         return result
     
-    async def _get_exchange_rate(self) -> float:
-        """取得 USD/TWD 匯率"""
+    async def _get_exchange_rate_record(self) -> Optional[ExchangeRate]:
+        """取得 USD/TWD 匯率紀錄"""
         stmt = select(ExchangeRate).where(
             ExchangeRate.from_currency == "USD",
             ExchangeRate.to_currency == "TWD"
         )
         result = await self.db.execute(stmt)
-        rate_record = result.scalar_one_or_none()
-        
+        return result.scalar_one_or_none()
+    
+    async def _get_exchange_rate(self) -> float:
+        """取得 USD/TWD 匯率"""
+        rate_record = await self._get_exchange_rate_record()
         return rate_record.rate if rate_record else DEFAULT_USD_TWD_RATE
     
     async def get_summary(self, user_id: int) -> Dict[str, Any]:
         """取得投資摘要（分台股/美股 + 加總）"""
         
-        # 取得匯率
-        exchange_rate = await self._get_exchange_rate()
-        
-        # 取得匯率更新時間
-        stmt = select(ExchangeRate).where(
-            ExchangeRate.from_currency == "USD",
-            ExchangeRate.to_currency == "TWD"
-        )
-        result = await self.db.execute(stmt)
-        rate_record = result.scalar_one_or_none()
+        # 取得匯率（含更新時間）
+        rate_record = await self._get_exchange_rate_record()
+        exchange_rate = rate_record.rate if rate_record else DEFAULT_USD_TWD_RATE
         rate_updated_at = rate_record.updated_at.isoformat() if rate_record and rate_record.updated_at else None
         
-        # 取得台股持股
-        tw_holdings = await self.get_holdings_with_prices(user_id, "tw")
-        # 取得美股持股
-        us_holdings = await self.get_holdings_with_prices(user_id, "us")
+        # 一次取得全部持股，再分台股 / 美股
+        holdings = await self.get_holdings_with_prices(user_id)
+        tw_holdings = [h for h in holdings if h['market'] == 'tw']
+        us_holdings = [h for h in holdings if h['market'] == 'us']
         
         # 台股統計
         tw_invested = sum(float(h['total_invested'] or 0) for h in tw_holdings)
@@ -6,33 +6,31 @@
 - 簡化程式碼結構
 """
 import logging
-from datetime import datetime, time, timedelta
+from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional, Tuple
 from sqlalchemy.orm import Session
 from sqlalchemy import select, distinct
-import yfinance as yf
 
 from app.models.price_cache import StockPriceCache
 from app.models.watchlist import Watchlist
+from app.data_sources.provider import get_provider
 from app.data_sources.taiwan_stock_names import TAIWAN_STOCK_NAMES, get_stock_name
+from app.utils.market_calendar import ExchangeCalendar, get_calendar
 
 logger = logging.getLogger(__name__)
 
+# 盤中報價快取有效時間；盤後寫入的報價有效到下次開盤
+QUOTE_TTL = timedelta(minutes=5)
+
 
 def is_tw_market_open() -> bool:
-    """台股是否開盤（週一至週五 09:00-13:30）"""
-    now = datetime.now()
-    if now.weekday() >= 5:
-        return False
-    return time(9, 0) <= now.time() <= time(13, 30)
+    """台股是否開盤（證交所交易日 09:00-13:30，排除休市日）"""
+    return get_calendar("tw").is_open()
 
 
 def is_us_market_open() -> bool:
-    """美股是否開盤（台灣時間 21:30-05:00，夏令時 22:30-06:00）"""
-    now = datetime.now()
-    t = now.time()
-    # 簡化判斷：晚上 21:00 後或凌晨 06:00 前
-    return t >= time(21, 0) or t <= time(6, 0)
+    """美股是否開盤（NYSE 美東 09:30-16:00，含夏令時間、假日與提前收盤）"""
+    return get_calendar("us").is_open()
 
 
 def get_market_status() -> Dict[str, bool]:
@@ -47,21 +45,21 @@ def get_market_status() -> Dict[str, bool]:
 def get_symbol_market(symbol: str) -> str:
     """判斷股票所屬市場"""
     s = symbol.upper()
-    if s.endswith(".TW") or s.endswith(".TWO"):
+    if s.endswith(".TW") or s.endswith(".TWO") or s in ("^TWII", "^TWOII"):
         return "tw"
     if s in ["BTC", "ETH", "BNB", "SOL", "XRP", "ADA", "DOGE", "DOT", "AVAX", "MATIC"]:
         return "crypto"
     return "us"
 
 
+def calendar_for_symbol(symbol: str) -> ExchangeCalendar:
+    """股票所屬交易所的行事曆"""
+    return get_calendar(get_symbol_market(symbol))
+
+
 def is_market_open_for_symbol(symbol: str) -> bool:
     """判斷該股票的市場是否開盤"""
-    market = get_symbol_market(symbol)
-    if market == "tw":
-        return is_tw_market_open()
-    elif market == "us":
-        return is_us_market_open()
-    return True  # crypto
+    return calendar_for_symbol(symbol).is_open()
 
 
 class PriceCacheService:
@@ -89,13 +87,19 @@ class PriceCacheService:
         
         updated, failed, skipped = 0, 0, 0
         
+        # 盤後已抓過收盤價、或盤中剛更新過的就不再呼叫 Yahoo
+        cached_at = dict(self.db.execute(
+            select(StockPriceCache.symbol, StockPriceCache.updated_at)
+            .where(StockPriceCache.symbol.in_(symbols))
+        ).all())
+        
         for symbol in symbols:
-            if not is_market_open_for_symbol(symbol):
+            if calendar_for_symbol(symbol).is_fresh(cached_at.get(symbol), QUOTE_TTL):
                 skipped += 1
                 continue
             
             try:
-                ticker = yf.Ticker(symbol)
+                ticker = get_provider().ticker(symbol)
                 info = ticker.info
                 
                 price = info.get("regularMarketPrice") or info.get("currentPrice")
@@ -132,7 +136,7 @@ class PriceCacheService:
         return {"updated": updated, "failed": failed, "skipped": skipped}
 
     def batch_update_crypto_prices(self, symbols: List[str], force: bool = False) -> Dict[str, Any]:
-        """批次更新加密貨幣價格"""
+        """批次更新加密貨幣價格（所有幣種一次 simple/price 請求）"""
         from app.data_sources.coingecko import coingecko
         
         if not symbols:
@@ -140,17 +144,29 @@ class PriceCacheService:
         
         updated, failed = 0, 0
         
+        try:
+            quotes = coingecko.get_current_price(symbols) or {}
+        except Exception as e:
+            logger.error(f"批次取得加密貨幣報價失敗: {e}")
+            return {"updated": 0, "failed": len(symbols)}
+        
         for symbol in symbols:
             try:
-                data = coingecko.get_coin_price(symbol.lower())
-                if data and "price" in data:
+                data = quotes.get(symbol.upper())
+                if data and data.get("price"):
+                    price = data["price"]
+                    # CoinGecko 的 24h 漲跌是百分比，換算回前值與漲跌金額
+                    change_pct = data.get("change_24h")
+                    prev_close = price / (1 + change_pct / 100) if change_pct is not None else None
+                    change = price - prev_close if prev_close is not None else None
+                    
                     self._upsert_cache(
                         symbol=symbol.upper(),
-                        name=data.get("name", symbol),
-                        price=data["price"],
-                        prev_close=None,
-                        change=data.get("change_24h"),
-                        change_pct=data.get("change_pct_24h"),
+                        name=symbol.upper(),
+                        price=price,
+                        prev_close=prev_close,
+                        change=change,
+                        change_pct=change_pct,
                         volume=data.get("volume_24h"),
                         asset_type="crypto",
                     )
@@ -215,8 +231,8 @@ class PriceCacheService:
         """
         智慧取得快取價格
         Returns: (cache_data, needs_update)
-        - 非開盤時間：直接返回快取，不需更新
-        - 開盤時間：返回快取 + 標記是否需更新
+        - 盤中：超過 5 分鐘需更新
+        - 盤後：收盤後抓過就不需更新，直到下次開盤（週末、假日皆同）
         """
         cache = self.db.query(StockPriceCache).filter(
             StockPriceCache.symbol == symbol
@@ -225,13 +241,7 @@ class PriceCacheService:
         if not cache:
             return None, True
         
-        # 非開盤時間：直接返回，不需更新
-        if not is_market_open_for_symbol(symbol):
-            return self._cache_to_dict(cache), False
-        
-        # 開盤時間：檢查時效
-        age = (datetime.now() - cache.updated_at).total_seconds() / 60
-        needs_update = age > 5  # 5 分鐘過期
+        needs_update = not calendar_for_symbol(symbol).is_fresh(cache.updated_at, QUOTE_TTL)
         
         return self._cache_to_dict(cache), needs_update
 
@@ -1,17 +1,36 @@
 """
 訂閱源爬蟲服務
 負責抓取 RSS feed 並解析股票代碼
+
+- 下載走共用的 requests.Session 連線池，多個 feed 並行下載
+- 帶 If-None-Match / If-Modified-Since，沒更新的 feed 回 304 不用解析
+- 每個 feed 有總時間上限（連線 + 下載），慢的 feed 不會拖住整批
 """
 import re
+import html
+import time
 import logging
 import feedparser
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import List, Dict, Set, Optional
-from bs4 import BeautifulSoup
+from typing import List, Dict, Set, Optional, Tuple, Any
 import requests
+from requests.adapters import HTTPAdapter
+
+from app.data_sources.provider import get_provider
+from app.utils.metrics import track_upstream
 
 logger = logging.getLogger(__name__)
 
+# 同時下載的 feed 數（也是連線池大小）
+MAX_CONCURRENT_FEEDS = 8
+
+# 單一 feed 的時間上限（秒）
+CONNECT_TIMEOUT = 5
+FEED_TIMEOUT_BUDGET = 20
+
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
 # 常見英文詞彙，排除這些（不是股票代碼）
 COMMON_WORDS = {
     # 常見詞
@@ -53,6 +72,23 @@ KNOWN_SYMBOLS = {
     # 更多可以持續添加...
 }
 
+# HTML 轉純文字：script/style/註解整段移除，其餘標籤換成空白（避免相鄰段落黏在一起）
+_HTML_NOISE_RE = re.compile(r'<(script|style)\b.*?</\1\s*>|<!--.*?-->', re.IGNORECASE | re.DOTALL)
+_HTML_TAG_RE = re.compile(r'<[^>]*>')
+
+# 一次掃描：$AAPL、(AAPL)、獨立大寫字
+_TICKER_RE = re.compile(r'\$([A-Z]{1,5})\b|\(([A-Z]{1,5})\)|\b([A-Z]{1,5})\b')
+
+
+def strip_html(text: str) -> str:
+    """輕量去除 HTML 標籤並還原實體（不建 DOM）"""
+    if '<' in text:
+        text = _HTML_NOISE_RE.sub(' ', text)
+        text = _HTML_TAG_RE.sub(' ', text)
+    if '&' in text:
+        text = html.unescape(text)
+    return text
+
 
 class RSSFetcher:
     """RSS 爬蟲"""
@@ -62,10 +98,97 @@ class RSSFetcher:
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         })
+        adapter = HTTPAdapter(pool_connections=MAX_CONCURRENT_FEEDS, pool_maxsize=MAX_CONCURRENT_FEEDS)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        # DATA_PROVIDER=replay 時換成回放 adapter，不連外
+        get_provider().mount(self.session)
+    
+    def download(
+        self,
+        url: str,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+        budget: float = FEED_TIMEOUT_BUDGET,
+    ) -> Dict[str, Any]:
+        """
+        條件式下載 feed
+        
+        Args:
+            url: RSS feed URL
+            etag / last_modified: 上次回應的 ETag / Last-Modified
+            budget: 這個 feed 最多花幾秒
+        
+        Returns:
+            {status: "ok" | "not_modified" | "error", content, etag, last_modified, error}
+        """
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        
+        deadline = time.monotonic() + budget
+        
+        try:
+            with track_upstream("rss", "feed") as call, self.session.get(
+                url,
+                headers=headers,
+                timeout=(CONNECT_TIMEOUT, budget),
+                stream=True,
+            ) as response:
+                if response.status_code == 304:
+                    logger.info(f"RSS 未更新 (304): {url}")
+                    call.outcome = "not_modified"
+                    return {'status': 'not_modified', 'etag': etag, 'last_modified': last_modified}
+                
+                response.raise_for_status()
+                
+                chunks = []
+                for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                    chunks.append(chunk)
+                    if time.monotonic() > deadline:
+                        raise TimeoutError(f"超過 {budget} 秒")
+                
+                return {
+                    'status': 'ok',
+                    'content': b''.join(chunks),
+                    'etag': response.headers.get('ETag'),
+                    'last_modified': response.headers.get('Last-Modified'),
+                }
+        except Exception as e:
+            logger.error(f"抓取 RSS 失敗 {url}: {e}")
+            return {'status': 'error', 'error': str(e)}
+    
+    def download_many(
+        self,
+        feeds: List[Tuple[Any, str, Optional[str], Optional[str]]],
+    ) -> Dict[Any, Dict[str, Any]]:
+        """
+        並行下載多個 feed
+        
+        Args:
+            feeds: [(key, url, etag, last_modified), ...]
+        
+        Returns:
+            {key: download() 結果}
+        """
+        if not feeds:
+            return {}
+        
+        with ThreadPoolExecutor(
+            max_workers=min(MAX_CONCURRENT_FEEDS, len(feeds)),
+            thread_name_prefix="rss",
+        ) as executor:
+            futures = {
+                key: executor.submit(self.download, url, etag, last_modified)
+                for key, url, etag, last_modified in feeds
+            }
+            return {key: future.result() for key, future in futures.items()}
     
     def fetch_feed(self, url: str, since_date: datetime = None) -> List[Dict]:
         """
-        抓取 RSS feed
+        抓取 RSS feed（不帶條件式標頭）
         
         Args:
             url: RSS feed URL
@@ -76,8 +199,20 @@ class RSSFetcher:
         """
         logger.info(f"抓取 RSS: {url}")
         
+        result = self.download(url)
+        if result['status'] != 'ok':
+            return []
+        return self.parse_feed(result['content'], since_date)
+    
+    def parse_feed(self, content: bytes, since_date: datetime = None) -> List[Dict]:
+        """
+        解析已下載的 feed 內容
+        
+        Returns:
+            文章列表 [{title, link, published, content}, ...]
+        """
         try:
-            feed = feedparser.parse(url)
+            feed = feedparser.parse(content)
             
             if feed.bozo and feed.bozo_exception:
                 logger.warning(f"RSS 解析警告: {feed.bozo_exception}")
@@ -113,7 +248,7 @@ class RSSFetcher:
             return articles
             
         except Exception as e:
-            logger.error(f"抓取 RSS 失敗: {e}")
+            logger.error(f"解析 RSS 失敗: {e}")
             return []
     
     def extract_symbols(self, text: str) -> Set[str]:
@@ -122,36 +257,24 @@ class RSSFetcher:
         
         規則：
         - 1-5 個大寫字母
-        - 排除常見英文詞
-        - 常見格式：$AAPL, (AAPL), AAPL:
+        - $AAPL、(AAPL) 格式：排除常見英文詞
+        - 獨立大寫字：只收 KNOWN_SYMBOLS（避免誤判）
+        
+        HTML 用正規表示式去標籤，三種格式合併成一個 pattern 一次掃描
         """
         if not text:
             return set()
         
-        # 移除 HTML 標籤
-        soup = BeautifulSoup(text, 'html.parser')
-        clean_text = soup.get_text()
-        
         symbols = set()
         
-        # 模式 1: $AAPL 格式（高可信度）
-        dollar_pattern = r'\$([A-Z]{1,5})\b'
-        for match in re.findall(dollar_pattern, clean_text):
-            if match not in COMMON_WORDS:
-                symbols.add(match)
-        
-        # 模式 2: (AAPL) 括號格式（高可信度）
-        paren_pattern = r'\(([A-Z]{1,5})\)'
-        for match in re.findall(paren_pattern, clean_text):
-            if match not in COMMON_WORDS:
-                symbols.add(match)
-        
-        # 模式 3: 獨立的 1-5 大寫字母（需額外過濾）
-        # 只抓已知的股票代碼，避免誤判
-        word_pattern = r'\b([A-Z]{1,5})\b'
-        for match in re.findall(word_pattern, clean_text):
-            if match in KNOWN_SYMBOLS:
-                symbols.add(match)
+        for dollar, paren, word in _TICKER_RE.findall(strip_html(text)):
+            if word:
+                if word in KNOWN_SYMBOLS:
+                    symbols.add(word)
+            else:
+                match = dollar or paren
+                if match not in COMMON_WORDS or match in KNOWN_SYMBOLS:
+                    symbols.add(match)
         
         return symbols
     
@@ -162,13 +285,19 @@ class RSSFetcher:
         Returns:
             [{symbol, article_url, article_title, article_date}, ...]
         """
-        articles = self.fetch_feed(url, since_date)
+        return self.extract_picks(self.fetch_feed(url, since_date))
+    
+    def extract_picks(self, articles: List[Dict]) -> List[Dict]:
+        """
+        從文章列表取出股票提及
         
+        Returns:
+            [{symbol, article_url, article_title, article_date}, ...]
+        """
         results = []
         for article in articles:
-            symbols = self.extract_symbols(article['content'])
-            # 標題也找一下
-            symbols.update(self.extract_symbols(article['title']))
+            # 標題與內文一起掃
+            symbols = self.extract_symbols(f"{article['title']}\n{article['content']}")
             
             for symbol in symbols:
                 results.append({
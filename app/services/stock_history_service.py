@@ -6,25 +6,42 @@
 修正版 - 2026-01-16
 - 確保資料正確存入 DB
 - 確保從 DB 讀取的格式與 yahoo_finance 完全一致
+
+分割調整
+- 有新 K 棒寫入時才偵測分割，事件存在 stock_splits
+- adj_close 直接寫入 stock_prices，讀取時不再重算
+
+HISTORY_STORE=arrow
+- 讀取改走 history_store 的 Arrow 檔（memory-mapped），stock_prices 照常寫入
+- 寫入 DB 後同步：只有新 K 棒時合併進檔案，分割事件改變時由 DB 整份重建
 """
 import pandas as pd
 from datetime import datetime, date, timedelta
 from typing import Optional, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import select, and_, func, delete, text
+from sqlalchemy import select, and_, func, delete, update, text
 import logging
 
 from app.models.stock_price import StockPrice
+from app.models.stock_split import StockSplit
 from app.data_sources.yahoo_finance import yahoo_finance
+from app.services.history_store import get_history_store
+from app.services.price_cache_service import calendar_for_symbol
+from app.utils.metrics import STOCK_HISTORY_REQUESTS
+from app.utils.perf import span
 
 logger = logging.getLogger(__name__)
 
+# 收盤後多久 Yahoo 的日 K 才算定案
+DAILY_BAR_SETTLE = timedelta(minutes=30)
+
 
 class StockHistoryService:
     """股票歷史資料快取服務"""
     
     def __init__(self, db: Session):
         self.db = db
+        self.store = get_history_store()
     
     def get_stock_history(
         self,
@@ -38,8 +55,16 @@ class StockHistoryService:
         Returns:
             (DataFrame, source) - DataFrame 格式與 yahoo_finance.get_stock_history() 完全相同
         """
-        symbol = symbol.upper()
-        
+        df, source = self._get_stock_history(symbol.upper(), years, force_refresh)
+        STOCK_HISTORY_REQUESTS.inc(source=source)
+        return df, source
+    
+    def _get_stock_history(
+        self,
+        symbol: str,
+        years: int,
+        force_refresh: bool,
+    ) -> Tuple[Optional[pd.DataFrame], str]:
         # 強制刷新
         if force_refresh:
             logger.info(f"🔄 強制刷新: {symbol}")
@@ -55,13 +80,14 @@ class StockHistoryService:
             df = self._fetch_and_save(symbol, years)
             return df, "yahoo"
         
-        latest_date, record_count = cache_info
+        latest_date, record_count, latest_updated_at = cache_info
         today = date.today()
         
         # 判斷快取是否足夠新
-        if self._is_cache_fresh(latest_date, today):
+        if self._is_cache_fresh(symbol, latest_date, latest_updated_at):
             logger.info(f"📦 快取命中: {symbol} ({record_count} 筆，最新 {latest_date})")
-            df = self._load_from_db(symbol, years)
+            with span("history_load"):
+                df = self._load(symbol, years)
             return df, "cache"
         else:
             # 需要補抓
@@ -70,39 +96,49 @@ class StockHistoryService:
             df = self._fetch_incremental(symbol, latest_date, years)
             return df, "partial" if df is not None else "cache"
     
-    def _get_cache_info(self, symbol: str) -> Optional[Tuple[date, int]]:
-        """取得快取資訊"""
+    def _get_cache_info(self, symbol: str) -> Optional[Tuple[date, int, Optional[datetime]]]:
+        """取得快取資訊（最新日期、筆數、最新一根的寫入時間）"""
+        if self.store is not None:
+            info = self.store.info(symbol)
+            if info is not None:
+                return info
+            # 啟用欄式儲存前已存在 DB 的代號，第一次查詢時匯出
+            info = self._get_db_cache_info(symbol)
+            if info is not None:
+                self._export_to_store(symbol)
+            return info
+        return self._get_db_cache_info(symbol)
+    
+    def _get_db_cache_info(self, symbol: str) -> Optional[Tuple[date, int, Optional[datetime]]]:
         try:
             stmt = select(
                 func.max(StockPrice.date),
-                func.count(StockPrice.id)
+                func.count()
             ).where(StockPrice.symbol == symbol)
             
             result = self.db.execute(stmt).first()
             
             if result and result[0] is not None:
-                return result[0], result[1]
+                updated_at = self.db.execute(
+                    select(StockPrice.updated_at).where(
+                        StockPrice.symbol == symbol, StockPrice.date == result[0]
+                    )
+                ).scalar()
+                return result[0], result[1], updated_at
         except Exception as e:
             logger.warning(f"查詢快取資訊失敗: {e}")
         return None
     
-    def _is_cache_fresh(self, latest_date: date, today: date) -> bool:
-        """判斷快取是否足夠新"""
-        if latest_date >= today:
-            return True
-        
-        # 週末判斷
-        if today.weekday() >= 5:
-            days_since_friday = today.weekday() - 4
-            last_friday = today - timedelta(days=days_since_friday)
-            if latest_date >= last_friday:
-                return True
-        
-        # 允許 1 天延遲（假日）
-        if (today - latest_date).days <= 1:
-            return True
+    def _is_cache_fresh(self, symbol: str, latest_date: date, latest_updated_at: Optional[datetime]) -> bool:
+        """
+        判斷快取是否足夠新（依交易所行事曆）
         
-        return False
+        週末、假日不會因為「今天沒有資料」而重抓；
+        盤中寫入的當天 K 棒在收盤定案後會重抓一次
+        """
+        return calendar_for_symbol(symbol).is_daily_bar_fresh(
+            latest_date, latest_updated_at, settle=DAILY_BAR_SETTLE
+        )
     
     def _fetch_and_save(self, symbol: str, years: int) -> Optional[pd.DataFrame]:
         """從 Yahoo 抓取並存入 DB"""
@@ -130,14 +166,14 @@ class StockHistoryService:
         df_new = yahoo_finance.get_stock_history(symbol, period=period)
         
         if df_new is not None and not df_new.empty:
-            # 只存新資料
-            df_to_save = df_new[df_new['date'] > last_date]
+            # 只存新資料（含最後一天：可能是盤中寫入的未完成 K 棒）
+            df_to_save = df_new[df_new['date'] >= last_date]
             if not df_to_save.empty:
                 saved = self._save_to_db(symbol, df_to_save)
                 logger.info(f"💾 增量存入: {symbol} ({saved} 筆)")
         
         # 返回完整資料
-        return self._load_from_db(symbol, years)
+        return self._load(symbol, years)
     
     def _save_to_db(self, symbol: str, df: pd.DataFrame) -> int:
         """存入資料庫"""
@@ -146,6 +182,7 @@ class StockHistoryService:
         
         count = 0
         symbol = symbol.upper()
+        now = datetime.now()
         
         for _, row in df.iterrows():
             try:
@@ -156,11 +193,8 @@ class StockHistoryService:
                 elif not isinstance(row_date, date):
                     row_date = pd.to_datetime(row_date).date()
                 
-                # 檢查是否已存在
-                existing = self.db.query(StockPrice).filter(
-                    StockPrice.symbol == symbol,
-                    StockPrice.date == row_date
-                ).first()
+                # 檢查是否已存在（主鍵查詢）
+                existing = self.db.get(StockPrice, (symbol, row_date))
                 
                 if existing:
                     # 更新
@@ -169,6 +203,9 @@ class StockHistoryService:
                     existing.low = float(row['low']) if pd.notna(row.get('low')) else None
                     existing.close = float(row['close']) if pd.notna(row.get('close')) else None
                     existing.volume = int(row['volume']) if pd.notna(row.get('volume')) else 0
+                    existing.adj_close = None  # 交給 _sync_splits 重算
+                    # 明確寫入時間：值沒變時 onupdate 不會觸發，行事曆判斷需要知道這次抓取的時間
+                    existing.updated_at = now
                 else:
                     # 新增
                     price = StockPrice(
@@ -179,6 +216,7 @@ class StockHistoryService:
                         low=float(row['low']) if pd.notna(row.get('low')) else None,
                         close=float(row['close']) if pd.notna(row.get('close')) else None,
                         volume=int(row['volume']) if pd.notna(row.get('volume')) else 0,
+                        updated_at=now,
                     )
                     self.db.add(price)
                     count += 1
@@ -194,8 +232,114 @@ class StockHistoryService:
             self.db.rollback()
             return 0
         
+        splits, changed = self._sync_splits(symbol)
+        if self.store is not None:
+            self._sync_store(symbol, df, splits, changed)
+        
         return count
     
+    def _sync_store(self, symbol: str, df: pd.DataFrame, splits: Optional[pd.DataFrame], changed: bool):
+        """把剛寫入 DB 的 K 棒同步到欄式儲存"""
+        try:
+            if splits is None:
+                # 分割同步失敗，adj_close 不可靠，刪掉讓下次查詢從 DB 重建
+                self.store.delete(symbol)
+                return
+            
+            dates = pd.to_datetime(df["date"]).dt.date
+            last_split = max(splits["date"]) if len(splits) else None
+            if changed or self.store.info(symbol) is None or (last_split is not None and dates.min() < last_split):
+                self._export_to_store(symbol)
+                return
+            
+            # 最後一次分割之後的 K 棒，調整係數為 1
+            frame = df[["date", "open", "high", "low", "close", "volume"]].assign(adj_close=df["close"])
+            self.store.append(symbol, frame)
+        except Exception as e:
+            logger.warning(f"同步欄式儲存失敗 {symbol}: {e}")
+            self.store.delete(symbol)
+    
+    def _export_to_store(self, symbol: str):
+        """由 DB 整份重建欄式檔案"""
+        df = self._load_from_db(symbol, years=100)
+        if df is not None:
+            info = self._get_db_cache_info(symbol)
+            count = self.store.write(symbol, df, written_at=info[2] if info else None)
+            logger.info(f"🗄️ 欄式儲存重建: {symbol} ({count} 筆)")
+    
+    def _sync_splits(self, symbol: str) -> Tuple[Optional[pd.DataFrame], bool]:
+        """
+        重新偵測分割事件並寫入 adj_close
+        
+        分割沒變時只補 adj_close 為空的列；
+        有變時每個區段一個 UPDATE，不逐列處理
+        
+        Returns:
+            (DataFrame(date, ratio), 分割事件是否改變)，失敗時為 (None, False)
+        """
+        symbol = symbol.upper()
+        
+        try:
+            rows = self.db.execute(
+                select(StockPrice.date, StockPrice.close)
+                .where(StockPrice.symbol == symbol)
+                .order_by(StockPrice.date)
+            ).all()
+            
+            df = pd.DataFrame(rows, columns=["date", "close"]).dropna()
+            with span("splits"):
+                splits = yahoo_finance.detect_splits(df)
+            
+            stored = self.db.execute(
+                select(StockSplit.date, StockSplit.ratio).where(StockSplit.symbol == symbol)
+            ).all()
+            
+            detected_set = {(d, float(r)) for d, r in zip(splits["date"], splits["ratio"])}
+            changed = detected_set != {(d, float(r)) for d, r in stored}
+            
+            if changed:
+                self.db.execute(delete(StockSplit).where(StockSplit.symbol == symbol))
+                self.db.add_all([
+                    StockSplit(symbol=symbol, date=d, ratio=float(r))
+                    for d, r in zip(splits["date"], splits["ratio"])
+                ])
+                logger.info(f"✂️ {symbol} 分割事件更新: {len(splits)} 筆")
+            
+            # 分割日把歷史切成多段，每段的係數 = 之後所有分割比例的乘積
+            split_dates = list(splits["date"])
+            ratios = [float(r) for r in splits["ratio"]]
+            
+            for i in range(len(split_dates) + 1):
+                factor = 1.0
+                for r in ratios[i:]:
+                    factor *= r
+                
+                stmt = update(StockPrice).where(StockPrice.symbol == symbol)
+                if i > 0:
+                    stmt = stmt.where(StockPrice.date >= split_dates[i - 1])
+                if i < len(split_dates):
+                    stmt = stmt.where(StockPrice.date < split_dates[i])
+                if not changed:
+                    stmt = stmt.where(StockPrice.adj_close.is_(None), StockPrice.close.isnot(None))
+                
+                self.db.execute(stmt.values(adj_close=StockPrice.close / factor))
+            
+            self.db.commit()
+            return splits, changed
+            
+        except Exception as e:
+            logger.error(f"同步分割資料失敗 {symbol}: {e}")
+            self.db.rollback()
+            return None, False
+    
+    def _load(self, symbol: str, years: int) -> Optional[pd.DataFrame]:
+        """載入歷史資料：欄式儲存優先，沒有檔案時讀 DB"""
+        if self.store is not None:
+            df = self.store.load(symbol, date.today() - timedelta(days=years * 365))
+            if df is not None:
+                return df
+        return self._load_from_db(symbol, years)
+    
     def _load_from_db(self, symbol: str, years: int) -> Optional[pd.DataFrame]:
         """
         從資料庫載入，返回格式與 yahoo_finance.get_stock_history() 完全相同
@@ -203,31 +347,41 @@ class StockHistoryService:
         start_date = date.today() - timedelta(days=years * 365)
         
         try:
-            results = self.db.query(StockPrice).filter(
-                StockPrice.symbol == symbol.upper(),
-                StockPrice.date >= start_date
-            ).order_by(StockPrice.date).all()
+            rows = self.db.execute(
+                select(
+                    StockPrice.date,
+                    StockPrice.open,
+                    StockPrice.high,
+                    StockPrice.low,
+                    StockPrice.close,
+                    StockPrice.volume,
+                    StockPrice.adj_close,
+                )
+                .where(
+                    StockPrice.symbol == symbol.upper(),
+                    StockPrice.date >= start_date,
+                )
+                .order_by(StockPrice.date)
+            ).all()
             
-            if not results:
+            if not rows:
                 return None
             
             # 建立與 yahoo_finance 相同格式的 DataFrame
-            data = []
-            for r in results:
-                data.append({
-                    "date": r.date,
-                    "open": float(r.open) if r.open else None,
-                    "high": float(r.high) if r.high else None,
-                    "low": float(r.low) if r.low else None,
-                    "close": float(r.close) if r.close else None,
-                    "volume": int(r.volume) if r.volume else 0,
-                    "symbol": symbol.upper(),
-                })
-            
-            df = pd.DataFrame(data)
+            df = pd.DataFrame(
+                rows,
+                columns=["date", "open", "high", "low", "close", "volume", "adj_close"],
+            )
+            for col in ("open", "high", "low", "close", "adj_close"):
+                df[col] = df[col].astype(float)
+            df["volume"] = df["volume"].fillna(0).astype("int64")
+            df["symbol"] = symbol.upper()
             
-            # 調用 yahoo_finance 的分割調整邏輯，產生 adj_close
-            df = yahoo_finance._detect_and_adjust_splits(df, symbol)
+            # 舊資料（欄位新增前寫入）還沒有 adj_close，補算一次並寫回；
+            # close 本身是 NULL 的 K 棒（Yahoo 的 NaN 列）adj_close 永遠是 NULL，不算
+            if (df["adj_close"].isna() & df["close"].notna()).any():
+                splits, _ = self._sync_splits(symbol)
+                df["adj_close"] = yahoo_finance.apply_split_factors(df, splits)
             
             return df
             
@@ -250,7 +404,7 @@ class StockHistoryService:
         try:
             stmt = select(
                 StockPrice.symbol,
-                func.count(StockPrice.id),
+                func.count(),
                 func.max(StockPrice.date)
             ).group_by(StockPrice.symbol)
             
@@ -274,10 +428,16 @@ class StockHistoryService:
                 count = self.db.query(StockPrice).filter(
                     StockPrice.symbol == symbol.upper()
                 ).delete()
+                self.db.query(StockSplit).filter(
+                    StockSplit.symbol == symbol.upper()
+                ).delete()
             else:
                 count = self.db.query(StockPrice).delete()
+                self.db.query(StockSplit).delete()
             
             self.db.commit()
+            if self.store is not None:
+                self.store.delete(symbol)
             logger.info(f"🗑️ 已清除快取: {symbol or '全部'} ({count} 筆)")
             return count
         except Exception as e:
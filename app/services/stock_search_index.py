@@ -0,0 +1,165 @@
+"""
+股票搜尋索引
+============
+/api/stock-info/search 的記憶體 n-gram 索引（typeahead 用）
+
+- 代號、英文名、中文名切成 1-gram / 2-gram 建倒排索引，中文逐字切也適用
+- 查詢時取候選集合交集後再驗證子字串，不掃整張表
+- 排序：代號完全符合 > 代號開頭 > 名稱開頭 > 其他包含；同級熱門優先
+
+PostgreSQL 另有 pg_trgm GIN 索引（見 database.py），索引未載入時 DB 查詢也能走索引
+"""
+import logging
+import threading
+import time
+import unicodedata
+from typing import Optional, Dict, Any, List, Set
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.stock_info import StockInfo
+from app.utils.cache_bus import cache_bus
+
+logger = logging.getLogger(__name__)
+
+# 索引最長使用時間（異動會透過 cache_bus 通知各 worker，TTL 只是保險）
+INDEX_TTL_SECONDS = 600
+
+
+def _normalize(text: Optional[str]) -> str:
+    """全形轉半形、轉小寫"""
+    if not text:
+        return ""
+    return unicodedata.normalize("NFKC", text).lower().strip()
+
+
+def _grams(text: str) -> Set[str]:
+    """取得 1-gram 與 2-gram"""
+    grams = set(text)
+    grams.update(text[i:i + 2] for i in range(len(text) - 1))
+    return grams
+
+
+class StockSearchIndex:
+    """股票搜尋索引（線程安全，整批替換）"""
+
+    def __init__(self):
+        self._entries: List[Dict[str, Any]] = []
+        self._keys: List[tuple] = []  # 每筆的 (symbol, name, name_zh) 正規化字串
+        self._postings: Dict[str, Set[int]] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return (
+            self._loaded_at is not None
+            and time.monotonic() - self._loaded_at < INDEX_TTL_SECONDS
+        )
+
+    def invalidate(self):
+        """stock_info 異動後（commit 之後）呼叫：所有 worker 的索引在下一次搜尋時重建"""
+        cache_bus.publish("stock_info")
+
+    def mark_stale(self, key: Optional[str] = None):
+        """標記索引過期，下一次搜尋時重建"""
+        self._loaded_at = None
+
+    def build(self, stocks: List[Dict[str, Any]]) -> int:
+        """由 StockInfo.to_dict() 列表建立索引"""
+        entries = []
+        keys = []
+        postings: Dict[str, Set[int]] = {}
+
+        for stock in stocks:
+            idx = len(entries)
+            key = (
+                _normalize(stock.get("symbol")),
+                _normalize(stock.get("name")),
+                _normalize(stock.get("name_zh")),
+            )
+            entries.append(stock)
+            keys.append(key)
+
+            for field in key:
+                for gram in _grams(field):
+                    postings.setdefault(gram, set()).add(idx)
+
+        with self._lock:
+            self._entries = entries
+            self._keys = keys
+            self._postings = postings
+            self._loaded_at = time.monotonic()
+
+        logger.info(f"🔎 股票搜尋索引已建立: {len(entries)} 筆")
+        return len(entries)
+
+    async def load(self, db: AsyncSession) -> int:
+        """從 stock_info 載入啟用中的股票"""
+        result = await db.execute(select(StockInfo).where(StockInfo.is_active == True))
+        return self.build([s.to_dict() for s in result.scalars().all()])
+
+    def search(
+        self,
+        q: str,
+        market: Optional[str] = None,
+        limit: int = 20,
+    ) -> List[Dict[str, Any]]:
+        """
+        搜尋股票
+
+        Args:
+            q: 關鍵字（代號、英文名或中文名的任意片段）
+            market: 市場篩選 us / tw / crypto
+            limit: 最多筆數
+
+        Returns:
+            StockInfo.to_dict() 列表，依相關度排序
+        """
+        query = _normalize(q)
+        if not query:
+            return []
+
+        with self._lock:
+            entries, keys, postings = self._entries, self._keys, self._postings
+
+        # 用最稀有的 gram 開始取交集
+        grams = [query] if len(query) == 1 else [query[i:i + 2] for i in range(len(query) - 1)]
+        candidate_sets = sorted((postings.get(g, set()) for g in grams), key=len)
+        if not candidate_sets or not candidate_sets[0]:
+            return []
+
+        candidates = set(candidate_sets[0])
+        for s in candidate_sets[1:]:
+            candidates &= s
+            if not candidates:
+                return []
+
+        ranked = []
+        for idx in candidates:
+            stock = entries[idx]
+            if market and stock.get("market") != market:
+                continue
+
+            symbol, name, name_zh = keys[idx]
+            if symbol == query:
+                rank = 0
+            elif symbol.startswith(query):
+                rank = 1
+            elif name.startswith(query) or name_zh.startswith(query):
+                rank = 2
+            elif query in symbol or query in name or query in name_zh:
+                rank = 3
+            else:
+                continue
+
+            ranked.append((rank, not stock.get("is_popular"), stock.get("symbol") or "", idx))
+
+        ranked.sort()
+        return [entries[r[3]] for r in ranked[:limit]]
+
+
+# 單例
+stock_search_index = StockSearchIndex()
+cache_bus.subscribe("stock_info", stock_search_index.mark_stale)
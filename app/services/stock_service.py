@@ -12,6 +12,7 @@ import logging
 from app.models.stock_price import StockPrice
 from app.data_sources.yahoo_finance import yahoo_finance
 from app.services.indicator_service import indicator_service, TrendDirection
+from app.services.price_cache_service import calendar_for_symbol
 from app.config import settings
 
 logger = logging.getLogger(__name__)
@@ -27,12 +28,10 @@ class StockService:
         """
         檢查快取是否有效
         
-        規則：
-        1. 有今日資料
-        2. 或是週末/假日時有最近交易日資料
+        規則（依交易所行事曆）：
+        1. 有最近一個已收盤交易日的資料，且是收盤後寫入
+        2. 或是盤中寫入、仍在 STOCK_DATA_CACHE_HOURS 內
         """
-        today = date.today()
-        
         # 查詢最新資料
         stmt = (
             select(StockPrice)
@@ -45,25 +44,14 @@ class StockService:
         if not result:
             return False
         
-        # 如果有今日資料，快取有效
-        if result.date == today:
+        # 已有最近一個收盤交易日的資料（週末、假日不會因為沒有今日資料而失效）
+        calendar = calendar_for_symbol(symbol)
+        if calendar.is_daily_bar_fresh(result.date, result.updated_at):
             return True
         
-        # 檢查是否為週末
-        if today.weekday() >= 5:  # 週六=5, 週日=6
-            # 週末時，只要有週五的資料就算有效
-            friday = today - timedelta(days=(today.weekday() - 4))
-            if result.date >= friday:
-                return True
-        
-        # 檢查更新時間是否在快取時間內
-        if result.updated_at:
-            cache_hours = settings.STOCK_DATA_CACHE_HOURS
-            cache_deadline = datetime.now() - timedelta(hours=cache_hours)
-            if result.updated_at > cache_deadline:
-                return True
-        
-        return False
+        # 盤中寫入的資料在快取時間內仍可用（最晚到收盤）
+        cache_ttl = timedelta(hours=settings.STOCK_DATA_CACHE_HOURS)
+        return calendar.is_fresh(result.updated_at, cache_ttl)
     
     def _save_prices_to_db(self, df: pd.DataFrame) -> int:
         """
@@ -76,6 +64,7 @@ class StockService:
             return 0
         
         count = 0
+        now = datetime.now()
         for _, row in df.iterrows():
             # 檢查是否已存在
             stmt = select(StockPrice).where(
@@ -93,6 +82,7 @@ class StockService:
                 existing.low = row["low"]
                 existing.close = row["close"]
                 existing.volume = row["volume"]
+                existing.updated_at = now
             else:
                 # 新增資料
                 price = StockPrice(
@@ -103,6 +93,7 @@ class StockService:
                     low=row["low"],
                     close=row["close"],
                     volume=row["volume"],
+                    updated_at=now,
                 )
                 self.db.add(price)
                 count += 1
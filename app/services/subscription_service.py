@@ -6,7 +6,7 @@ import logging
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import and_, func
 
 from app.models.subscription import SubscriptionSource, AutoPick, UserSubscription
 from app.services.rss_fetcher import rss_fetcher
@@ -74,9 +74,17 @@ class SubscriptionService:
     # 抓取與更新
     # ============================================================
     
+    @staticmethod
+    def _conditional_headers(source: SubscriptionSource, backfill: bool):
+        """回溯模式要完整重抓，不帶 ETag / Last-Modified"""
+        if backfill:
+            return None, None
+        return source.etag, source.last_modified
+    
     def fetch_source(self, source: SubscriptionSource, 
                      since_date: datetime = None, 
-                     backfill: bool = False) -> Dict:
+                     backfill: bool = False,
+                     download: Optional[Dict] = None) -> Dict:
         """
         抓取單一訂閱源
         
@@ -84,9 +92,10 @@ class SubscriptionService:
             source: 訂閱源
             since_date: 起始日期
             backfill: 是否為回溯模式（首次抓取）
+            download: 已下載的結果（fetch_all_sources 並行下載後傳入）
         
         Returns:
-            {new: int, updated: int, symbols: [...]}
+            {new: int, updated: int, symbols: [...], status: ok/not_modified/error}
         """
         logger.info(f"開始抓取: {source.name}")
         
@@ -97,81 +106,128 @@ class SubscriptionService:
             # 使用上次抓取時間，或預設 1 天前
             since_date = source.last_fetched_at or (datetime.now() - timedelta(days=1))
         
-        # 抓取 RSS
-        picks = rss_fetcher.fetch_and_parse(source.url, since_date)
+        if download is None:
+            etag, last_modified = self._conditional_headers(source, backfill)
+            download = rss_fetcher.download(source.url, etag, last_modified)
+        
+        result = {"new": 0, "updated": 0, "symbols": [], "status": download["status"]}
+        
+        if download["status"] == "not_modified":
+            source.last_fetched_at = datetime.now()
+            self.db.commit()
+            logger.info(f"{source.name} 沒有更新，略過解析")
+            return result
         
-        result = {"new": 0, "updated": 0, "symbols": []}
+        if download["status"] == "error":
+            # 不更新 last_fetched_at，下次抓取會涵蓋這段時間
+            result["error"] = download.get("error")
+            return result
         
-        # 用來追蹤本次處理過的 symbols（避免重複插入）
-        processed_symbols = {}
+        picks = rss_fetcher.extract_picks(
+            rss_fetcher.parse_feed(download["content"], since_date)
+        )
+        
+        # 這個來源已有的代號一次載入，不逐筆查詢
+        existing_symbols = {
+            row.symbol
+            for row in self.db.query(AutoPick.symbol).filter(AutoPick.source_id == source.id)
+        }
         
+        # 同一代號的多次提及先在記憶體合併：次數累加，文章欄位取最後一次有值的
+        aggregated: Dict[str, Dict] = {}
         for pick in picks:
             symbol = pick["symbol"]
+            entry = aggregated.get(symbol)
             
-            # 檢查是否在本次迴圈中已處理過
-            if symbol in processed_symbols:
-                # 更新本次迴圈中的記錄
-                existing_pick = processed_symbols[symbol]
-                existing_pick.update_mention(
-                    article_url=pick["article_url"],
-                    article_title=pick["article_title"],
-                    article_date=pick["article_date"],
-                )
-                result["updated"] += 1
-                continue
+            if entry is None:
+                entry = aggregated[symbol] = {
+                    "symbol": symbol,
+                    "mention_count": 0,
+                    "article_url": None,
+                    "article_title": None,
+                    "article_date": None,
+                }
+                result["symbols"].append(symbol)
             
-            # 檢查資料庫中是否已存在
-            existing = self.db.query(AutoPick).filter(
-                and_(
-                    AutoPick.source_id == source.id,
-                    AutoPick.symbol == symbol
-                )
-            ).first()
+            entry["mention_count"] += 1
+            for key in ("article_url", "article_title", "article_date"):
+                if pick[key]:
+                    entry[key] = pick[key]
             
-            if existing:
-                # 更新提及
-                existing.update_mention(
-                    article_url=pick["article_url"],
-                    article_title=pick["article_title"],
-                    article_date=pick["article_date"],
-                )
-                processed_symbols[symbol] = existing
-                result["updated"] += 1
-            else:
-                # 新增
-                new_pick = AutoPick(
-                    source_id=source.id,
-                    symbol=symbol,
-                    article_url=pick["article_url"],
-                    article_title=pick["article_title"],
-                    article_date=pick["article_date"],
-                    first_seen_at=datetime.now(),
-                    last_seen_at=datetime.now(),
-                    expires_at=datetime.now() + timedelta(days=30),
-                    mention_count=1,
-                )
-                self.db.add(new_pick)
-                processed_symbols[symbol] = new_pick
+            # 計數規則與逐筆處理時相同：第一次看到且不在資料庫才算新增
+            if entry["mention_count"] == 1 and symbol not in existing_symbols:
                 result["new"] += 1
-            
-            if symbol not in result["symbols"]:
-                result["symbols"].append(symbol)
+            else:
+                result["updated"] += 1
+        
+        if aggregated:
+            self._upsert_picks(source.id, list(aggregated.values()))
         
-        # 更新最後抓取時間
+        # 更新最後抓取時間與條件式請求標頭
         source.last_fetched_at = datetime.now()
+        source.etag = download.get("etag")
+        source.last_modified = download.get("last_modified")
         self.db.commit()
         
         logger.info(f"抓取完成: 新增 {result['new']}, 更新 {result['updated']}")
         return result
     
+    def _upsert_picks(self, source_id: int, mentions: List[Dict]):
+        """
+        以 (source_id, symbol) 為鍵一次 upsert
+        
+        新代號直接新增；既有代號累加提及次數、重算過期時間，
+        文章欄位只在這次有值時覆蓋
+        """
+        if self.db.get_bind().dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        
+        now = datetime.now()
+        rows = [
+            {
+                **mention,
+                "source_id": source_id,
+                "first_seen_at": now,
+                "last_seen_at": now,
+                "expires_at": now + timedelta(days=30),
+            }
+            for mention in mentions
+        ]
+        
+        stmt = insert(AutoPick).values(rows)
+        excluded = stmt.excluded
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[AutoPick.source_id, AutoPick.symbol],
+            set_={
+                "last_seen_at": excluded.last_seen_at,
+                "expires_at": excluded.expires_at,
+                "mention_count": AutoPick.mention_count + excluded.mention_count,
+                "article_url": func.coalesce(excluded.article_url, AutoPick.article_url),
+                "article_title": func.coalesce(excluded.article_title, AutoPick.article_title),
+                "article_date": func.coalesce(excluded.article_date, AutoPick.article_date),
+            },
+        )
+        self.db.execute(stmt)
+    
     def fetch_all_sources(self, backfill: bool = False) -> Dict:
-        """抓取所有啟用的訂閱源"""
+        """
+        抓取所有啟用的訂閱源
+        
+        下載在 thread pool 並行，解析與寫入仍在目前的 session 依序處理
+        """
         sources = self.get_all_sources(enabled_only=True)
         
+        downloads = rss_fetcher.download_many([
+            (source.id, source.url, *self._conditional_headers(source, backfill))
+            for source in sources
+        ])
+        
         total_result = {"sources": [], "total_new": 0, "total_updated": 0}
         
         for source in sources:
-            result = self.fetch_source(source, backfill=backfill)
+            result = self.fetch_source(source, backfill=backfill, download=downloads[source.id])
             total_result["sources"].append({
                 "name": source.name,
                 "slug": source.slug,
@@ -0,0 +1,181 @@
+"""
+標的名稱索引
+============
+統一的記憶體內名稱查詢，取代各處為了顯示名稱而呼叫 Yahoo `.info`
+
+來源（後者覆蓋前者）：
+1. 靜態對照表（yahoo_finance / taiwan_stocks / taiwan_stock_names）
+2. 指數對照表 INDEX_SYMBOLS
+3. stock_price_cache 已存的名稱（只補缺）
+4. stock_info 種子表
+
+查不到的代號會在背景向 Yahoo 查詢一次，請求本身直接返回代號
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Set
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.utils.cache_bus import cache_bus
+
+logger = logging.getLogger(__name__)
+
+
+def _base_code(symbol: str) -> str:
+    """去掉台股後綴，取得代號本體"""
+    return symbol.replace(".TWO", "").replace(".TW", "")
+
+
+class SymbolIndex:
+    """標的名稱索引（線程安全）"""
+
+    def __init__(self):
+        self._names: Dict[str, str] = {}
+        self._attempted: Set[str] = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="symbol-index")
+        self._loaded = False
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def load(self, db: Session) -> int:
+        """
+        從靜態對照表與資料庫建立索引
+
+        Returns:
+            索引筆數
+        """
+        from app.data_sources.yahoo_finance import TAIWAN_STOCK_NAMES as YF_TW_NAMES
+        from app.data_sources.taiwan_stocks import TAIWAN_STOCK_NAMES as TW_NAMES
+        from app.data_sources.taiwan_stock_names import TAIWAN_STOCK_NAMES as TW_NAMES_EXTRA
+        from app.models.index_price import INDEX_SYMBOLS
+        from app.models.price_cache import StockPriceCache
+        from app.models.stock_info import StockInfo
+
+        names: Dict[str, str] = {}
+
+        for table in (YF_TW_NAMES, TW_NAMES, TW_NAMES_EXTRA):
+            names.update(table)
+
+        for symbol, info in INDEX_SYMBOLS.items():
+            names[symbol] = info.get("name_zh") or info.get("name") or symbol
+
+        try:
+            rows = db.execute(
+                select(StockPriceCache.symbol, StockPriceCache.name)
+            ).all()
+            for symbol, name in rows:
+                if name and self._lookup(names, symbol) is None:
+                    names[symbol.upper()] = name
+
+            rows = db.execute(
+                select(StockInfo.symbol, StockInfo.name, StockInfo.name_zh, StockInfo.market)
+                .where(StockInfo.is_active == True)
+            ).all()
+            for symbol, name, name_zh, market in rows:
+                display = self._display_name(name, name_zh, market)
+                if display:
+                    names[symbol.upper()] = display
+        except Exception as e:
+            logger.warning(f"⚠️ 名稱索引載入資料庫失敗，只使用靜態對照表: {e}")
+
+        with self._lock:
+            self._names = names
+            self._loaded = True
+
+        logger.info(f"📇 名稱索引已載入: {len(names)} 筆")
+        return len(names)
+
+    @staticmethod
+    def _display_name(name: Optional[str], name_zh: Optional[str], market: Optional[str]) -> Optional[str]:
+        """台股優先顯示中文名稱，其他市場優先原文"""
+        if market == "tw":
+            return name_zh or name
+        return name or name_zh
+
+    @staticmethod
+    def _lookup(names: Dict[str, str], symbol: str) -> Optional[str]:
+        name = names.get(symbol)
+        if name is None and symbol.endswith((".TW", ".TWO")):
+            name = names.get(_base_code(symbol))
+        return name
+
+    def get_name(self, symbol: str, default: Optional[str] = None) -> str:
+        """
+        取得顯示名稱（不會發出網路請求）
+
+        Args:
+            symbol: 標的代號（AAPL、2330.TW、^GSPC）
+            default: 查不到時的返回值，預設為代號本身
+
+        Returns:
+            名稱
+        """
+        symbol = symbol.upper().strip()
+        name = self._lookup(self._names, symbol)
+
+        if name:
+            return name
+
+        self._schedule_refresh(symbol)
+        return default if default is not None else symbol
+
+    def set_name(self, symbol: str, name: str):
+        """寫入或更新名稱（例如 stock_info 異動時）"""
+        if not name:
+            return
+        with self._lock:
+            self._names[symbol.upper()] = name
+
+    def set_from_stock_info(self, stock) -> None:
+        """stock_info 新增或修改後同步到索引"""
+        self.set_name(stock.symbol, self._display_name(stock.name, stock.name_zh, stock.market))
+
+    def schedule_reload(self, key: Optional[str] = None):
+        """stock_info 異動（可能來自其他 worker）後在背景重新載入"""
+        self._executor.submit(self._reload)
+
+    def _reload(self):
+        from app.database import SyncSessionLocal
+
+        db = SyncSessionLocal()
+        try:
+            self.load(db)
+        except Exception as e:
+            logger.warning(f"⚠️ 名稱索引重新載入失敗: {e}")
+        finally:
+            db.close()
+
+    def _schedule_refresh(self, symbol: str):
+        """未知代號在背景查詢一次"""
+        with self._lock:
+            if symbol in self._attempted:
+                return
+            self._attempted.add(symbol)
+
+        self._executor.submit(self._refresh, symbol)
+
+    def _refresh(self, symbol: str):
+        from app.data_sources.yahoo_finance import yahoo_finance
+
+        try:
+            info = yahoo_finance.get_stock_info(symbol)
+            name = info.get("name") if info else None
+            if name and name != symbol:
+                self.set_name(symbol, name)
+                logger.debug(f"📇 背景補齊名稱: {symbol} -> {name}")
+        except Exception as e:
+            logger.debug(f"背景查詢名稱失敗 {symbol}: {e}")
+
+
+# 單例
+symbol_index = SymbolIndex()
+cache_bus.subscribe("stock_info", symbol_index.schedule_reload)
@@ -0,0 +1,180 @@
+"""
+代號解析快取
+============
+台股 .TW 查不到時改查 .TWO，以前每次都要先白白下載一次失敗的 .TW 歷史；
+無效代號也每次重查。這裡把解析結果記在記憶體與 symbol_resolutions 表：
+
+- 有效：記住實際代號，30 天內直接用
+- 無效：記住查無資料，1 小時內不再查（避免 Yahoo 暫時故障被記太久）
+
+只有每個候選代號都被 Yahoo 明確回報「沒有資料」才記為無效；
+逾時、429、例外只算這次抓不到，不寫入解析結果，已知的有效對應也不會被覆蓋
+"""
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from app.data_sources.yahoo_finance import track_missing
+from app.models.symbol_resolution import SymbolResolution
+
+logger = logging.getLogger(__name__)
+
+POSITIVE_TTL = timedelta(days=30)
+NEGATIVE_TTL = timedelta(hours=1)
+
+
+class SymbolResolver:
+    """代號解析（記憶體 + DB 兩層）"""
+
+    def __init__(self):
+        # input_symbol -> (resolved_symbol, checked_at)
+        self._memo: Dict[str, Tuple[Optional[str], datetime]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _is_fresh(resolved: Optional[str], checked_at: datetime) -> bool:
+        ttl = POSITIVE_TTL if resolved else NEGATIVE_TTL
+        return datetime.now() - checked_at < ttl
+
+    def lookup(self, symbol: str) -> Tuple[bool, Optional[str]]:
+        """
+        查詢解析結果
+
+        Returns:
+            (known, resolved_symbol)；known=False 表示沒有有效紀錄，
+            known=True 且 resolved_symbol=None 表示已知無效
+        """
+        symbol = symbol.upper()
+
+        with self._lock:
+            entry = self._memo.get(symbol)
+        if entry is not None:
+            if self._is_fresh(*entry):
+                return True, entry[0]
+            return False, None
+
+        try:
+            from app.database import SyncSessionLocal
+
+            db = SyncSessionLocal()
+            try:
+                row = db.get(SymbolResolution, symbol)
+            finally:
+                db.close()
+        except Exception as e:
+            logger.debug(f"查詢代號解析失敗 {symbol}: {e}")
+            return False, None
+
+        if row is None:
+            return False, None
+
+        with self._lock:
+            self._memo[symbol] = (row.resolved_symbol, row.checked_at)
+
+        if self._is_fresh(row.resolved_symbol, row.checked_at):
+            return True, row.resolved_symbol
+        return False, None
+
+    def remember(self, symbol: str, resolved: Optional[str]):
+        """寫入解析結果（resolved=None 表示無效）"""
+        symbol = symbol.upper()
+        now = datetime.now()
+
+        with self._lock:
+            self._memo[symbol] = (resolved, now)
+
+        try:
+            from app.database import SyncSessionLocal
+
+            db = SyncSessionLocal()
+            try:
+                db.merge(SymbolResolution(
+                    input_symbol=symbol,
+                    resolved_symbol=resolved,
+                    checked_at=now,
+                ))
+                db.commit()
+            finally:
+                db.close()
+        except Exception as e:
+            logger.debug(f"寫入代號解析失敗 {symbol}: {e}")
+
+    def forget(self, symbol: str):
+        """清除記憶體中的解析結果（DB 紀錄會在下一次 remember 覆蓋）"""
+        with self._lock:
+            self._memo.pop(symbol.upper(), None)
+
+    @staticmethod
+    def candidates(symbol: str) -> List[str]:
+        """依序要嘗試的代號：上市 .TW 查不到再試上櫃 .TWO"""
+        if symbol.endswith(".TW"):
+            return [symbol, symbol[:-3] + ".TWO"]
+        return [symbol]
+
+    def fetch(
+        self,
+        symbol: str,
+        fetcher: Callable[[str], Optional[pd.DataFrame]],
+    ) -> Tuple[Optional[pd.DataFrame], str]:
+        """
+        依解析結果抓取資料
+
+        已知代號只抓一次；未知代號依 candidates 嘗試並記住結果。
+
+        Args:
+            symbol: 標準化後的輸入代號
+            fetcher: 以代號取得 DataFrame 的函數
+
+        Returns:
+            (DataFrame 或 None, 實際代號)
+        """
+        symbol = symbol.upper()
+        known, resolved = self.lookup(symbol)
+
+        if known and resolved is None:
+            logger.info(f"🚫 已知無效代號，略過查詢: {symbol}")
+            return None, symbol
+
+        # 明確查無資料的候選代號（抓取失敗的不算）
+        confirmed_missing = set()
+
+        def attempt(candidate: str) -> Optional[pd.DataFrame]:
+            with track_missing() as missing:
+                df = fetcher(candidate)
+            if df is not None and not df.empty:
+                return df
+            if candidate.upper() in missing:
+                confirmed_missing.add(candidate)
+            return None
+
+        if known:
+            df = attempt(resolved)
+            if df is not None:
+                return df, resolved
+            # 解析結果失效（例如轉上市），重新嘗試所有候選
+            logger.info(f"🔁 代號解析失效，重新解析: {symbol} -> {resolved}")
+
+        for candidate in self.candidates(symbol):
+            if known and candidate == resolved:
+                continue
+            df = attempt(candidate)
+            if df is not None:
+                if candidate != symbol:
+                    logger.info(f"✅ 代號解析: {symbol} -> {candidate}")
+                self.remember(symbol, candidate)
+                return df, candidate
+
+        tried = set(self.candidates(symbol)) | ({resolved} if known else set())
+        if confirmed_missing >= tried:
+            self.remember(symbol, None)
+        else:
+            # 有候選只是暫時抓不到：不記為無效，已知的對應保留到 TTL 到期
+            logger.warning(f"⚠️ 代號暫時無法取得，不寫入解析結果: {symbol}")
+        return None, symbol
+
+
+# 單例
+symbol_resolver = SymbolResolver()
@@ -13,6 +13,7 @@ import pandas as pd
 from app.models.watchlist import Watchlist
 from app.models.user import User
 from app.data_sources.coingecko import CRYPTO_MAP
+from app.services.symbol_index import symbol_index
 
 logger = logging.getLogger(__name__)
 
@@ -121,7 +122,7 @@ class WatchlistService:
         from app.database import SyncSessionLocal
         from app.services.price_cache_service import PriceCacheService
         from app.data_sources.yahoo_finance import yahoo_finance
-        from app.data_sources.coingecko import coingecko
+        from app.data_sources.coingecko import coingecko_async
         from app.services.indicator_service import indicator_service
         
         # 使用同步 session（因為 PriceCacheService 是同步的）
@@ -131,16 +132,19 @@ class WatchlistService:
             
             if asset_type == "crypto":
                 # 加密貨幣
-                price_data = coingecko.get_price(symbol)
-                if price_data:
+                price_data = await coingecko_async.get_price(symbol)
+                if price_data and price_data.get("price"):
+                    price = price_data["price"]
+                    change_pct = price_data.get("change_24h")
+                    prev_close = price / (1 + change_pct / 100) if change_pct is not None else None
                     cache_service._upsert_cache(
                         symbol=symbol,
-                        name=price_data.get("name", symbol),
-                        price=price_data.get("price"),
-                        prev_close=price_data.get("prev_close"),
-                        change=price_data.get("change"),
-                        change_pct=price_data.get("change_pct"),
-                        volume=price_data.get("volume"),
+                        name=symbol,
+                        price=price,
+                        prev_close=prev_close,
+                        change=price - prev_close if prev_close is not None else None,
+                        change_pct=change_pct,
+                        volume=price_data.get("volume_24h"),
                         asset_type="crypto",
                     )
                     sync_db.commit()
@@ -161,8 +165,7 @@ class WatchlistService:
                     ma20 = float(latest.get('ma20')) if 'ma20' in latest and not pd.isna(latest.get('ma20')) else None
                     
                     # 取得股票名稱
-                    info = yahoo_finance.get_stock_info(symbol)
-                    name = info.get("name", symbol) if info else symbol
+                    name = symbol_index.get_name(symbol)
                     
                     cache_service._upsert_cache(
                         symbol=symbol,
@@ -0,0 +1,203 @@
+"""
+排程 Leader 選舉
+================
+多個 uvicorn worker / 副本時，每個行程都會在 lifespan 啟動 APScheduler，
+每日預載、指標預計算、訂閱源抓取會被執行 N 次。
+
+所有行程都以 paused 狀態啟動排程器，只有拿到鎖的行程（leader）resume：
+- PostgreSQL：session 層級的 advisory lock，鎖綁在一條專用連線上，
+  行程結束或連線中斷時資料庫自動釋放
+- SQLite：資料庫檔旁的 lock file（flock），行程結束時由作業系統釋放
+
+非 leader 每 SCHEDULER_LEADER_RETRY_SECONDS 秒重試一次；leader 同時檢查
+連線是否還活著，斷線就 pause 排程器，交給下一個拿到鎖的行程
+"""
+import logging
+import os
+import threading
+import zlib
+from typing import Callable, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+
+from app.config import settings
+from app.database import database_url, is_postgres, sync_engine
+from app.utils.metrics import SCHEDULER_LEADER
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# advisory lock 的 key（bigint），由名稱固定算出
+LOCK_NAME = "autostock:scheduler"
+
+
+class _AdvisoryLock:
+    """PostgreSQL pg_try_advisory_lock，持有期間連線不歸還"""
+    
+    def __init__(self, name: str):
+        self.key = zlib.crc32(name.encode())
+        self._conn = None
+    
+    def acquire(self) -> bool:
+        conn = sync_engine.connect()
+        try:
+            acquired = conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": self.key}).scalar()
+            conn.commit()
+        except Exception:
+            conn.close()
+            raise
+        if not acquired:
+            conn.close()
+            return False
+        self._conn = conn
+        return True
+    
+    def alive(self) -> bool:
+        try:
+            self._conn.execute(text("SELECT 1"))
+            self._conn.commit()
+            return True
+        except Exception as e:
+            logger.warning(f"⚠️ 排程鎖連線中斷: {e}")
+            return False
+    
+    def release(self):
+        if self._conn is None:
+            return
+        try:
+            self._conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": self.key})
+            self._conn.commit()
+        except Exception:
+            pass
+        finally:
+            self._conn.close()
+            self._conn = None
+
+
+class _FileLock:
+    """flock 互斥鎖（SQLite 只會有同一台機器上的行程共用資料庫）"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+    
+    def acquire(self) -> bool:
+        if fcntl is None:
+            # 沒有 flock 的平台只會是單機開發，直接當 leader
+            return True
+        f = open(self.path, "a+")
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        f.seek(0)
+        f.truncate()
+        f.write(f"{os.getpid()}\n")
+        f.flush()
+        self._file = f
+        return True
+    
+    def alive(self) -> bool:
+        return True
+    
+    def release(self):
+        if self._file is None:
+            return
+        try:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        finally:
+            self._file.close()
+            self._file = None
+
+
+def _default_lock_file() -> str:
+    """SQLite 資料庫檔旁的 .scheduler.lock（記憶體資料庫則放在暫存目錄）"""
+    db_path = make_url(database_url).database
+    if db_path and db_path != ":memory:":
+        return os.path.abspath(db_path) + ".scheduler.lock"
+    import tempfile
+    return os.path.join(tempfile.gettempdir(), "autostock-scheduler.lock")
+
+
+class LeaderElection:
+    """
+    以鎖選出唯一執行排程的行程
+    
+    start() 後在背景執行緒取得 / 維持鎖，狀態改變時呼叫 on_elected / on_demoted
+    """
+    
+    def __init__(self, name: str = LOCK_NAME, retry_seconds: Optional[float] = None):
+        self.name = name
+        self.retry_seconds = retry_seconds or settings.SCHEDULER_LEADER_RETRY_SECONDS
+        if is_postgres(database_url):
+            self._lock = _AdvisoryLock(name)
+            self.backend = "postgres"
+        else:
+            self._lock = _FileLock(settings.SCHEDULER_LOCK_FILE or _default_lock_file())
+            self.backend = "file"
+        self.is_leader = False
+        self._on_elected: Callable[[], None] = lambda: None
+        self._on_demoted: Callable[[], None] = lambda: None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def start(self, on_elected: Callable[[], None], on_demoted: Callable[[], None]):
+        self._on_elected = on_elected
+        self._on_demoted = on_demoted
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="scheduler-leader", daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        """停止選舉並釋放鎖（關閉時呼叫，讓其他行程盡快接手）"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        if self.is_leader:
+            self._set_leader(False)
+        self._lock.release()
+    
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._tick()
+            except Exception as e:
+                logger.error(f"❌ 排程 leader 選舉錯誤: {e}")
+            self._stop.wait(self.retry_seconds)
+    
+    def _tick(self):
+        if self.is_leader:
+            if not self._lock.alive():
+                self._lock.release()
+                self._set_leader(False)
+            return
+    
+        if self._lock.acquire():
+            self._set_leader(True)
+    
+    def _set_leader(self, leader: bool):
+        self.is_leader = leader
+        SCHEDULER_LEADER.set(1 if leader else 0)
+        if leader:
+            logger.info(f"👑 取得排程 leader（{self.backend}，pid {os.getpid()}），排程開始執行")
+            self._on_elected()
+        else:
+            logger.warning(f"⚠️ 失去排程 leader（pid {os.getpid()}），排程暫停")
+            self._on_demoted()
+    
+    def get_status(self) -> dict:
+        return {
+            "leader": self.is_leader,
+            "backend": self.backend,
+            "pid": os.getpid(),
+        }
+
+
+scheduler_leader = LeaderElection()
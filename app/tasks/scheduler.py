@@ -381,14 +381,11 @@ class SchedulerService:
         # 格式化訊息
         message = self._format_notification_message(bullish, bearish)
         
-        # 發送訊息（使用 asyncio 執行）
+        # 發送訊息（asyncio.run 結束前會關閉這個 loop 上的連線池）
         try:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            success = loop.run_until_complete(
+            success = asyncio.run(
                 line_notify_service.push_text_message(line_user_id, message)
             )
-            loop.close()
         except Exception as e:
             logger.error(f"發送 LINE 訊息失敗: {e}")
             success = False
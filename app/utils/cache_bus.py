@@ -0,0 +1,196 @@
+"""
+跨 worker 快取失效通知
+======================
+MemoryCache、名稱索引、搜尋索引都是行程內的記憶體，多個 worker 時
+其中一個寫入新的指數 / 情緒 / 交易後，其他 worker 仍會回傳舊資料直到 TTL 到期。
+
+寫入端在 commit 之後呼叫 cache_bus.publish(cache, key)：
+- 本行程立即清除（所有資料庫都一樣）
+- PostgreSQL：再以 NOTIFY 送到 CHANNEL，每個 worker 的 listener 執行緒收到後
+  清除同名快取的 key（自己送出的訊息會略過）
+- SQLite：只有單一行程會寫入，本行程清除即可
+
+listener 斷線重連後，期間可能漏掉通知，所有訂閱的快取整個清空一次
+"""
+import json
+import logging
+import os
+import select
+import socket
+import threading
+import uuid
+from typing import Callable, Dict, List, Optional
+
+from app.utils.metrics import CACHE_INVALIDATIONS
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "autostock_cache_invalidate"
+
+# 重連間隔（秒）
+RECONNECT_MIN = 1.0
+RECONNECT_MAX = 60.0
+
+Handler = Callable[[Optional[str]], None]
+
+
+class _PostgresTransport:
+    """LISTEN / NOTIFY；發送與接收各用一條專用連線"""
+    
+    def __init__(self, on_message: Callable[[str], None], on_reconnect: Callable[[], None]):
+        self._on_message = on_message
+        self._on_reconnect = on_reconnect
+        self._publish_conn = None
+        self._publish_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    @staticmethod
+    def _connect():
+        """driver 層的連線（psycopg2），autocommit 讓 LISTEN / NOTIFY 立即生效"""
+        from app.database import sync_engine
+        proxy = sync_engine.raw_connection()
+        conn = proxy.driver_connection
+        conn.autocommit = True
+        return proxy, conn
+    
+    def notify(self, payload: str):
+        with self._publish_lock:
+            for attempt in range(2):
+                try:
+                    if self._publish_conn is None:
+                        self._publish_conn = self._connect()
+                    with self._publish_conn[1].cursor() as cur:
+                        cur.execute("SELECT pg_notify(%s, %s)", (CHANNEL, payload))
+                    return
+                except Exception as e:
+                    self._close_publisher()
+                    if attempt:
+                        logger.warning(f"⚠️ 快取失效通知送出失敗: {e}")
+    
+    def _close_publisher(self):
+        if self._publish_conn is not None:
+            try:
+                self._publish_conn[0].close()
+            except Exception:
+                pass
+            self._publish_conn = None
+    
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._listen_forever, name="cache-bus", daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        with self._publish_lock:
+            self._close_publisher()
+    
+    def _listen_forever(self):
+        delay = RECONNECT_MIN
+        first = True
+        while not self._stop.is_set():
+            try:
+                proxy, conn = self._connect()
+            except Exception as e:
+                logger.warning(f"⚠️ 快取失效 listener 連線失敗，{delay:.0f} 秒後重試: {e}")
+                self._stop.wait(delay)
+                delay = min(delay * 2, RECONNECT_MAX)
+                continue
+    
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {CHANNEL}")
+                if not first:
+                    self._on_reconnect()
+                first = False
+                delay = RECONNECT_MIN
+                logger.info(f"📡 快取失效 listener 已連線（{CHANNEL}）")
+                self._listen(conn)
+            except Exception as e:
+                if not self._stop.is_set():
+                    logger.warning(f"⚠️ 快取失效 listener 中斷: {e}")
+            finally:
+                try:
+                    proxy.close()
+                except Exception:
+                    pass
+    
+    def _listen(self, conn):
+        while not self._stop.is_set():
+            # 逾時只是為了檢查 stop，順便讓斷線及早被 poll 發現
+            if select.select([conn], [], [], 5.0) == ([], [], []):
+                conn.poll()
+                continue
+            conn.poll()
+            while conn.notifies:
+                notify = conn.notifies.pop(0)
+                self._on_message(notify.payload)
+
+
+class CacheBus:
+    """快取失效的發佈 / 訂閱"""
+    
+    def __init__(self):
+        self.origin = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._handlers: Dict[str, List[Handler]] = {}
+        self._lock = threading.Lock()
+        self._transport: Optional[_PostgresTransport] = None
+    
+    def subscribe(self, cache: str, handler: Handler):
+        """handler(key) 在本行程或其他 worker 發佈 cache 失效時呼叫；key 為 None 表示全部"""
+        with self._lock:
+            self._handlers.setdefault(cache, []).append(handler)
+    
+    def publish(self, cache: str, key: Optional[str] = None):
+        """寫入 commit 後呼叫：清除本行程，並通知其他 worker"""
+        self._dispatch(cache, key, "local")
+        if self._transport is not None:
+            self._transport.notify(json.dumps({"o": self.origin, "c": cache, "k": key}))
+    
+    def _dispatch(self, cache: str, key: Optional[str], origin: str):
+        with self._lock:
+            handlers = list(self._handlers.get(cache, ()))
+        CACHE_INVALIDATIONS.inc(cache=cache, origin=origin)
+        for handler in handlers:
+            try:
+                handler(key)
+            except Exception as e:
+                logger.warning(f"⚠️ 快取失效處理失敗 {cache}:{key}: {e}")
+    
+    def _on_message(self, payload: str):
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            logger.warning(f"⚠️ 無法解析快取失效通知: {payload[:200]}")
+            return
+        if message.get("o") == self.origin:
+            return
+        self._dispatch(message.get("c", ""), message.get("k"), "remote")
+    
+    def _flush_all(self):
+        """重連後清空所有訂閱的快取（斷線期間的通知已遺失）"""
+        with self._lock:
+            caches = list(self._handlers)
+        logger.info(f"📡 listener 重新連線，清空快取: {caches}")
+        for cache in caches:
+            self._dispatch(cache, None, "reconnect")
+    
+    def start(self):
+        """啟動跨 worker 通知（PostgreSQL 才需要）"""
+        from app.database import database_url, is_postgres
+        if not is_postgres(database_url) or self._transport is not None:
+            return
+        self._transport = _PostgresTransport(self._on_message, self._flush_all)
+        self._transport.start()
+    
+    def stop(self):
+        if self._transport is not None:
+            self._transport.stop()
+            self._transport = None
+
+
+cache_bus = CacheBus()
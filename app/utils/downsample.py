@@ -0,0 +1,98 @@
+"""
+圖表降採樣（Largest-Triangle-Three-Buckets）
+============================================
+前端圖表只有幾百像素寬，送 1500 根 K 棒只是多花傳輸與 JSON 編碼時間。
+LTTB 把資料切成 n-2 個區間，每個區間挑一點：與「上一個選中的點」、
+「下一區間平均」圍成的三角形面積最大者，峰谷與轉折會被保留下來。
+
+- 區間邊界、下一區間平均用 numpy 一次算完（np.add.reduceat）
+- 挑點的頂點是「上一個選中的點」，只能是上一區間的某個候選點：
+  先對每個區間、上一區間的每個候選頂點，一次算出最佳點（區間數 × L × L，
+  L 為區間長度），剩下的依序步驟只是沿著整數表查下去
+- 區間很長（輸出點數很少）時這張表太大，改為逐區間計算，迴圈次數本來就少
+- 回傳的是位置，多條序列（收盤、均線、成交量）套同一組位置，日期不會錯開
+"""
+from typing import Optional
+
+import numpy as np
+
+# 一次建表的元素上限（float64，約 16 MB），超過就逐區間計算
+TABLE_LIMIT = 2_000_000
+
+
+def lttb_indices(y, n_out: int, x: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    選出 n_out 個點的位置（含第一與最後一點），依 y 的形狀決定
+
+    Args:
+        y: 數值序列（NaN 以前後內插值參與挑選，不影響輸出的位置意義）
+        n_out: 輸出點數；小於 3 或不小於資料筆數時回傳全部位置
+        x: 橫軸；省略時用序號（交易日等距）
+
+    Returns:
+        遞增的位置陣列
+    """
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n_out < 3 or n_out >= n:
+        return np.arange(n)
+
+    x = np.arange(n, dtype=float) if x is None else np.asarray(x, dtype=float)
+    missing = np.isnan(y)
+    if missing.any():
+        if missing.all():
+            return np.linspace(0, n - 1, n_out).round().astype(np.int64)
+        y = y.copy()
+        y[missing] = np.interp(x[missing], x[~missing], y[~missing])
+
+    # 中間 n-2 點切成 n_out-2 個區間，edges[i]:edges[i+1] 是第 i 個區間
+    n_buckets = n_out - 2
+    edges = (np.arange(n_buckets + 1) * (n - 2) // n_buckets + 1).astype(np.int64)
+    counts = np.diff(edges)
+    starts = edges[:-1] - 1
+    avg_x = np.add.reduceat(x[1:n - 1], starts) / counts
+    avg_y = np.add.reduceat(y[1:n - 1], starts) / counts
+    # 第 i 個區間的第三點：下一區間的平均，最後一個區間用最後一點
+    next_x = np.append(avg_x[1:], x[n - 1])
+    next_y = np.append(avg_y[1:], y[n - 1])
+
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    width = int(counts.max())
+    if n_buckets * width * width > TABLE_LIMIT:
+        ax, ay = x[0], y[0]
+        for i in range(n_buckets):
+            lo, hi = edges[i], edges[i + 1]
+            j = lo + int(_area(ax, ay, x[lo:hi], y[lo:hi], next_x[i], next_y[i]).argmax())
+            out[i + 1] = j
+            ax, ay = x[j], y[j]
+        return out
+
+    # 候選點補齊成 (區間數, width)，不足的位置面積設為 -1 不會被選到
+    offsets = np.arange(width)
+    valid = offsets < counts[:, None]
+    cand = np.minimum(edges[:-1, None] + offsets, n - 2)
+    cx, cy = x[cand], y[cand]
+    cnx, cny = next_x[:, None], next_y[:, None]
+
+    first = np.where(valid[0], _area(x[0], y[0], cx[0], cy[0], cnx[0], cny[0]), -1.0)
+    # best[i-1, k]：上一區間選第 k 個候選點時，第 i 區間要選的候選點
+    area = _area(
+        cx[:-1, :, None], cy[:-1, :, None],
+        cx[1:, None, :], cy[1:, None, :],
+        cnx[1:, :, None], cny[1:, :, None],
+    )
+    best = np.where(valid[1:, None, :], area, -1.0).argmax(axis=2).tolist()
+
+    k = int(first.argmax())
+    picks = [k]
+    for row in best:
+        k = row[k]
+        picks.append(k)
+    out[1:-1] = edges[:-1] + np.array(picks)
+    return out
+
+
+def _area(ax, ay, px, py, cx, cy):
+    """頂點 a、候選點 p、下一區間平均 c 圍成的三角形面積（兩倍，比較大小用）"""
+    return np.abs((ax - cx) * (py - ay) - (ax - px) * (cy - ay))
@@ -0,0 +1,423 @@
+"""
+交易所行事曆
+============
+台股（TWSE）、美股（NYSE）的交易時段、休市日、提前收盤與美東夏令時間，
+用來判斷「現在是否開盤」「最近一個已收盤的交易日」以及報價快取何時過期
+
+- 交易日表在建立時預先算好（前後數年），每個日曆日都記下「當天或之前最近的交易日」，
+  查詢只是 dict 查表，不會逐日往回找
+- 美股假日依 NYSE 規則計算（週末補假、耶穌受難日、提前收盤），另列臨時休市
+- 台股假日依證交所每年公告（農曆春節、補假、颱風假無法用規則推算），新年度公告後補上
+  TWSE_HOLIDAYS；臨時休市可用 MARKET_EXTRA_CLOSURES 設定，不必改程式
+- 加密貨幣 24 小時交易，日 K 以 UTC 日界收盤
+
+時間都換成交易所時區計算；naive datetime 視為伺服器本地時間（與 datetime.now() 一致）
+"""
+import logging
+import threading
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, List, Optional, Set, Tuple
+from zoneinfo import ZoneInfo
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 預先建表的範圍：往前幾年、往後幾年（超出範圍時自動擴充）
+YEARS_BACK = 12
+YEARS_AHEAD = 1
+
+
+# ============================================================
+# 台股休市日（證交所公告，不含週末）
+# ============================================================
+
+TWSE_HOLIDAYS: Dict[int, List[str]] = {
+    2023: [
+        "2023-01-02",                                            # 元旦補假
+        "2023-01-18", "2023-01-19",                              # 春節前僅交割
+        "2023-01-20", "2023-01-23", "2023-01-24", "2023-01-25",
+        "2023-01-26", "2023-01-27",                              # 春節
+        "2023-02-27", "2023-02-28",                              # 和平紀念日
+        "2023-04-03", "2023-04-04", "2023-04-05",                # 兒童節、清明節
+        "2023-05-01",                                            # 勞動節
+        "2023-06-22", "2023-06-23",                              # 端午節
+        "2023-09-29",                                            # 中秋節
+        "2023-10-09", "2023-10-10",                              # 國慶日
+    ],
+    2024: [
+        "2024-01-01",
+        "2024-02-06", "2024-02-07",                              # 春節前僅交割
+        "2024-02-08", "2024-02-09", "2024-02-12", "2024-02-13",
+        "2024-02-14",                                            # 春節
+        "2024-02-28",
+        "2024-04-04", "2024-04-05",
+        "2024-05-01",
+        "2024-06-10",
+        "2024-07-24", "2024-07-25",                              # 颱風（凱米）
+        "2024-09-17",
+        "2024-10-02", "2024-10-03",                              # 颱風（山陀兒）
+        "2024-10-10",
+        "2024-10-31",                                            # 颱風（康芮）
+    ],
+    2025: [
+        "2025-01-01",
+        "2025-01-23", "2025-01-24",                              # 春節前僅交割
+        "2025-01-27", "2025-01-28", "2025-01-29", "2025-01-30",
+        "2025-01-31",                                            # 春節
+        "2025-02-28",
+        "2025-04-03", "2025-04-04",
+        "2025-05-01",
+        "2025-05-30",
+        "2025-09-29",                                            # 教師節補假
+        "2025-10-06",
+        "2025-10-10",
+        "2025-10-24",                                            # 光復節補假
+        "2025-12-25",                                            # 行憲紀念日
+    ],
+    2026: [
+        "2026-01-01",
+        "2026-02-12", "2026-02-13",                              # 春節前僅交割
+        "2026-02-16", "2026-02-17", "2026-02-18", "2026-02-19",
+        "2026-02-20",                                            # 春節
+        "2026-02-27",
+        "2026-04-03", "2026-04-06",
+        "2026-05-01",
+        "2026-06-19",
+        "2026-09-25",
+        "2026-09-28",
+        "2026-10-09",
+        "2026-10-26",
+        "2026-12-25",
+    ],
+}
+
+# 沒有公告表的年份至少排除固定日期的國定假日（不含補假）
+TWSE_FIXED_HOLIDAYS = [(1, 1), (2, 28), (4, 4), (5, 1), (10, 10)]
+
+# NYSE 臨時休市（國喪、颶風）
+NYSE_SPECIAL_CLOSURES = [
+    "2012-10-29", "2012-10-30",
+    "2018-12-05",
+    "2025-01-09",
+]
+
+
+# ============================================================
+# 日期工具
+# ============================================================
+
+def _nth_weekday(year: int, month: int, weekday: int, n: int) -> date:
+    """某月第 n 個星期幾（n=-1 為最後一個）"""
+    if n > 0:
+        d = date(year, month, 1)
+        d += timedelta(days=(weekday - d.weekday()) % 7)
+        return d + timedelta(weeks=n - 1)
+    nxt = date(year + (month == 12), month % 12 + 1, 1)
+    d = nxt - timedelta(days=1)
+    return d - timedelta(days=(d.weekday() - weekday) % 7)
+
+
+def _easter(year: int) -> date:
+    """復活節（Anonymous Gregorian algorithm）"""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _observed(d: date) -> date:
+    """遇週六提前到週五、遇週日延到週一"""
+    if d.weekday() == 5:
+        return d - timedelta(days=1)
+    if d.weekday() == 6:
+        return d + timedelta(days=1)
+    return d
+
+
+def _parse_dates(values) -> Set[date]:
+    return {date.fromisoformat(v) for v in values}
+
+
+def _extra_closures(market: str) -> Set[date]:
+    """MARKET_EXTRA_CLOSURES，例如 "tw:2026-07-24,us:2026-01-09\""""
+    result = set()
+    for item in (settings.MARKET_EXTRA_CLOSURES or "").split(","):
+        key, _, value = item.strip().partition(":")
+        if key.strip().lower() != market or not value.strip():
+            continue
+        try:
+            result.add(date.fromisoformat(value.strip()))
+        except ValueError:
+            logger.warning(f"⚠️ MARKET_EXTRA_CLOSURES 日期格式錯誤: {item}")
+    return result
+
+
+def nyse_holidays(year: int) -> Set[date]:
+    holidays = {
+        _nth_weekday(year, 1, 0, 3),                 # 馬丁路德金恩紀念日
+        _nth_weekday(year, 2, 0, 3),                 # 總統日
+        _easter(year) - timedelta(days=2),           # 耶穌受難日
+        _nth_weekday(year, 5, 0, -1),                # 陣亡將士紀念日
+        _observed(date(year, 7, 4)),                 # 獨立紀念日
+        _nth_weekday(year, 9, 0, 1),                 # 勞動節
+        _nth_weekday(year, 11, 3, 4),                # 感恩節
+        _observed(date(year, 12, 25)),               # 聖誕節
+    }
+    # 元旦遇週六不提前到前一年的 12/31
+    new_year = date(year, 1, 1)
+    if new_year.weekday() != 5:
+        holidays.add(_observed(new_year))
+    if year >= 2022:
+        holidays.add(_observed(date(year, 6, 19)))   # 六月節
+    holidays |= {d for d in _parse_dates(NYSE_SPECIAL_CLOSURES) if d.year == year}
+    return holidays
+
+
+def nyse_early_closes(year: int) -> Dict[date, time]:
+    """13:00 提前收盤：獨立紀念日前一天、感恩節隔天、聖誕夜"""
+    early = {_nth_weekday(year, 11, 3, 4) + timedelta(days=1): time(13, 0)}
+    if date(year, 7, 4).weekday() in (1, 2, 3, 4):
+        early[date(year, 7, 3)] = time(13, 0)
+    if date(year, 12, 24).weekday() in (0, 1, 2, 3):
+        early[date(year, 12, 24)] = time(13, 0)
+    return early
+
+
+_missing_years_warned: Set[int] = set()
+
+
+def twse_holidays(year: int) -> Set[date]:
+    if year in TWSE_HOLIDAYS:
+        return _parse_dates(TWSE_HOLIDAYS[year])
+    if year == date.today().year and year not in _missing_years_warned:
+        _missing_years_warned.add(year)
+        logger.warning(f"⚠️ 沒有 {year} 年台股休市表，只排除固定國定假日，請補上 TWSE_HOLIDAYS")
+    return {date(year, m, d) for m, d in TWSE_FIXED_HOLIDAYS}
+
+
+# ============================================================
+# 行事曆
+# ============================================================
+
+class ExchangeCalendar:
+    """
+    單一交易所的行事曆
+    
+    _sessions 是排序好的交易日；_last_index 對範圍內每個日曆日記錄
+    「當天或之前最近的交易日」在 _sessions 的位置，前後一個交易日都是 O(1)
+    """
+    
+    def __init__(
+        self,
+        market: str,
+        tz: str,
+        open_time: time,
+        close_time: time,
+        holidays=None,
+        early_closes=None,
+        weekdays: Tuple[int, ...] = (0, 1, 2, 3, 4),
+    ):
+        self.market = market
+        self.tz = ZoneInfo(tz)
+        self.open_time = open_time
+        self.close_time = close_time
+        self._holidays_for = holidays or (lambda year: set())
+        self._early_closes_for = early_closes or (lambda year: {})
+        self.weekdays = weekdays
+    
+        self._lock = threading.Lock()
+        self._first_year = 0
+        self._last_year = -1
+        self._sessions: List[date] = []
+        self._last_index: Dict[date, int] = {}
+        self._early: Dict[date, time] = {}
+    
+        today = date.today()
+        self._build(today.year - YEARS_BACK, today.year + YEARS_AHEAD)
+    
+    def _build(self, first_year: int, last_year: int):
+        extra = _extra_closures(self.market)
+        sessions: List[date] = []
+        last_index: Dict[date, int] = {}
+        early: Dict[date, time] = {}
+    
+        for year in range(first_year, last_year + 1):
+            closed = self._holidays_for(year) | {d for d in extra if d.year == year}
+            early.update(self._early_closes_for(year))
+            d = date(year, 1, 1)
+            while d.year == year:
+                if d.weekday() in self.weekdays and d not in closed:
+                    sessions.append(d)
+                last_index[d] = len(sessions) - 1
+                d += timedelta(days=1)
+    
+        self._sessions = sessions
+        self._last_index = last_index
+        self._early = {d: t for d, t in early.items() if d in last_index and sessions[last_index[d]] == d}
+        self._first_year, self._last_year = first_year, last_year
+    
+    def _ensure(self, d: date):
+        if self._first_year <= d.year <= self._last_year:
+            return
+        with self._lock:
+            if not self._first_year <= d.year <= self._last_year:
+                self._build(min(self._first_year, d.year), max(self._last_year, d.year + YEARS_AHEAD))
+    
+    def _index(self, d: date) -> int:
+        self._ensure(d)
+        return self._last_index[d]
+    
+    def _local(self, now: Optional[datetime] = None) -> datetime:
+        if now is None:
+            return datetime.now(self.tz)
+        return now.astimezone(self.tz)
+    
+    # ==================== 交易日 ====================
+    
+    def is_session(self, d: date) -> bool:
+        i = self._index(d)
+        return i >= 0 and self._sessions[i] == d
+    
+    def session_on_or_before(self, d: date) -> Optional[date]:
+        i = self._index(d)
+        return self._sessions[i] if i >= 0 else None
+    
+    def previous_session(self, d: date) -> Optional[date]:
+        """d 之前（不含 d）最近的交易日"""
+        return self.session_on_or_before(d - timedelta(days=1))
+    
+    def next_session(self, d: date) -> date:
+        """d 之後（不含 d）最近的交易日"""
+        i = self._index(d) + 1
+        if i >= len(self._sessions):
+            self._ensure(date(self._last_year + 1, 1, 1))
+            i = self._index(d) + 1
+        return self._sessions[i]
+    
+    def session_open(self, d: date) -> datetime:
+        return datetime.combine(d, self.open_time, tzinfo=self.tz)
+    
+    def session_close(self, d: date) -> datetime:
+        return datetime.combine(d, self._early.get(d, self.close_time), tzinfo=self.tz)
+    
+    # ==================== 目前狀態 ====================
+    
+    def is_open(self, now: Optional[datetime] = None) -> bool:
+        local = self._local(now)
+        d = local.date()
+        return self.is_session(d) and self.session_open(d) <= local < self.session_close(d)
+    
+    def last_completed_session(
+        self,
+        now: Optional[datetime] = None,
+        settle: timedelta = timedelta(0),
+    ) -> Optional[date]:
+        """
+        最近一個已收盤的交易日
+    
+        settle: 收盤後多久才算數（資料源發布日 K 需要一點時間）
+        """
+        local = self._local(now)
+        d = local.date()
+        if self.is_session(d) and local >= self.session_close(d) + settle:
+            return d
+        return self.previous_session(d)
+    
+    def next_open(self, now: Optional[datetime] = None) -> datetime:
+        """下一次開盤時間（開盤中則為下一個交易日的開盤）"""
+        local = self._local(now)
+        d = local.date()
+        if self.is_session(d) and local < self.session_open(d):
+            return self.session_open(d)
+        return self.session_open(self.next_session(d))
+    
+    # ==================== 快取時效 ====================
+    
+    def is_daily_bar_fresh(
+        self,
+        latest_date: date,
+        written_at: Optional[datetime] = None,
+        now: Optional[datetime] = None,
+        settle: timedelta = timedelta(0),
+    ) -> bool:
+        """
+        日 K 快取是否夠新
+    
+        已有最近一個收盤交易日的 K 棒，且那根是收盤 + settle 之後才寫入
+        （盤中的半根、收盤後資料源還沒定案時抓到的都要重抓）；
+        盤中只存在當天未完成的 K 棒時也算夠新。written_at 為 None 時不檢查寫入時間
+        """
+        required = self.last_completed_session(now, settle)
+        if required is None or latest_date > required:
+            return True
+        if latest_date < required:
+            return False
+        if written_at is None:
+            return True
+        return self._local(written_at) >= self.session_close(required) + settle
+    
+    def expires_at(self, written_at: datetime, intraday_ttl: timedelta) -> datetime:
+        """
+        written_at 寫入的報價何時過期
+    
+        - 盤中寫入：intraday_ttl 後，但不晚於當天收盤（收盤後要再抓一次收盤價）
+        - 盤後寫入：下一次開盤（週末、假日期間都有效）
+        """
+        local = self._local(written_at)
+        if self.is_open(local):
+            return min(local + intraday_ttl, self.session_close(local.date()))
+        return self.next_open(local)
+    
+    def is_fresh(
+        self,
+        written_at: Optional[datetime],
+        intraday_ttl: timedelta,
+        now: Optional[datetime] = None,
+    ) -> bool:
+        if written_at is None:
+            return False
+        return self._local(now) < self.expires_at(written_at, intraday_ttl)
+
+
+class AlwaysOpenCalendar(ExchangeCalendar):
+    """24 小時交易（加密貨幣）：每天都是交易日，日 K 在 UTC 00:00 收盤"""
+    
+    def __init__(self, market: str):
+        super().__init__(market, "UTC", time(0, 0), time(0, 0), weekdays=(0, 1, 2, 3, 4, 5, 6))
+    
+    def session_close(self, d: date) -> datetime:
+        return datetime.combine(d + timedelta(days=1), time(0, 0), tzinfo=timezone.utc)
+    
+    def is_open(self, now: Optional[datetime] = None) -> bool:
+        return True
+    
+    def next_open(self, now: Optional[datetime] = None) -> datetime:
+        return self._local(now)
+    
+    def expires_at(self, written_at: datetime, intraday_ttl: timedelta) -> datetime:
+        return self._local(written_at) + intraday_ttl
+
+
+CALENDARS: Dict[str, ExchangeCalendar] = {
+    "tw": ExchangeCalendar(
+        "tw", "Asia/Taipei", time(9, 0), time(13, 30), holidays=twse_holidays,
+    ),
+    "us": ExchangeCalendar(
+        "us", "America/New_York", time(9, 30), time(16, 0),
+        holidays=nyse_holidays, early_closes=nyse_early_closes,
+    ),
+    "crypto": AlwaysOpenCalendar("crypto"),
+}
+
+
+def get_calendar(market: str) -> ExchangeCalendar:
+    """依市場代碼（tw / us / crypto）取得行事曆，未知市場視為美股"""
+    return CALENDARS.get(market, CALENDARS["us"])
@@ -0,0 +1,351 @@
+"""
+Prometheus 指標
+===============
+不依賴 prometheus_client，自己維護計數器 / 直方圖並輸出 text format（0.0.4），
+由 GET /metrics 提供給 Prometheus 抓取
+
+- 快取：MemoryCache、StockDetailCache、IndicatorCache 命中率與筆數，
+  StockHistoryService 的 cache / partial / yahoo 來源
+- 上游：Yahoo、CoinGecko、RSS 的呼叫次數與延遲
+- 排程：APScheduler 每個 job 的執行時間、成功 / 失敗 / 錯過次數
+"""
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+LabelValues = Tuple[str, ...]
+
+# 上游 API 延遲（秒）
+UPSTREAM_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# 排程 job 執行時間（秒）
+JOB_BUCKETS = (1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """指標共用：名稱、說明、標籤與鎖"""
+    
+    type_name = ""
+    
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+    
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} 需要標籤 {self.labelnames}，收到 {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+    
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+    
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+            *self.samples(),
+        ]
+
+
+class Counter(_Metric):
+    """只增不減的計數器（名稱以 _total 結尾）"""
+    
+    type_name = "counter"
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+    
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    
+    def get(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+    
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in items
+        ]
+
+
+class Gauge(_Metric):
+    """
+    目前值
+    
+    set() 直接設定；track() 登記一個函式，輸出時才呼叫（例如快取筆數）
+    """
+    
+    type_name = "gauge"
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+        self._functions: Dict[LabelValues, Callable[[], float]] = {}
+    
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+    
+    def track(self, func: Callable[[], float], **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._functions[key] = func
+    
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+            functions = list(self._functions.items())
+        for key, func in functions:
+            try:
+                values[key] = func()
+            except Exception:
+                continue
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(values.items())
+        ]
+
+
+class Histogram(_Metric):
+    """累積分桶直方圖（_bucket / _sum / _count）"""
+    
+    type_name = "histogram"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = UPSTREAM_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # key -> [各桶計數（非累積）, sum, count]
+        self._values: Dict[LabelValues, list] = {}
+    
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+    
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, [list(e[0]), e[1], e[2]]) for key, e in self._values.items())
+    
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+REGISTRY: List[_Metric] = []
+
+
+def render_metrics() -> str:
+    """所有指標的 Prometheus text format"""
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ============================================================
+# 應用程式指標
+# ============================================================
+
+CACHE_REQUESTS = Counter(
+    "autostock_cache_requests_total",
+    "快取查詢次數（result: hit / miss / expired）",
+    ("cache", "result"),
+)
+
+CACHE_ENTRIES = Gauge(
+    "autostock_cache_entries",
+    "記憶體快取目前的筆數（含尚未被讀取清除的過期資料）",
+    ("cache",),
+)
+
+CACHE_INVALIDATIONS = Counter(
+    "autostock_cache_invalidations_total",
+    "快取失效通知（origin: local 本行程發佈 / remote 其他 worker / reconnect 重連後清空）",
+    ("cache", "origin"),
+)
+
+STOCK_HISTORY_REQUESTS = Counter(
+    "autostock_stock_history_requests_total",
+    "StockHistoryService 歷史資料來源（cache / partial / yahoo）",
+    ("source",),
+)
+
+UPSTREAM_REQUESTS = Counter(
+    "autostock_upstream_requests_total",
+    "上游 API 呼叫次數（outcome: ok / empty / not_modified / error）",
+    ("service", "operation", "outcome"),
+)
+
+UPSTREAM_DURATION = Histogram(
+    "autostock_upstream_request_duration_seconds",
+    "上游 API 呼叫耗時",
+    ("service", "operation"),
+    buckets=UPSTREAM_BUCKETS,
+)
+
+JOB_RUNS = Counter(
+    "autostock_scheduler_job_runs_total",
+    "排程 job 執行次數（status: success / error / missed）",
+    ("job", "status"),
+)
+
+JOB_DURATION = Histogram(
+    "autostock_scheduler_job_duration_seconds",
+    "排程 job 執行時間",
+    ("job",),
+    buckets=JOB_BUCKETS,
+)
+
+SCHEDULER_LEADER = Gauge(
+    "autostock_scheduler_leader",
+    "此行程是否為排程 leader（1 = 負責執行排程 job）",
+)
+
+JOB_LAST_SUCCESS = Gauge(
+    "autostock_scheduler_job_last_success_timestamp_seconds",
+    "排程 job 最後一次成功完成的時間（Unix 秒）",
+    ("job",),
+)
+
+
+class _UpstreamCall:
+    __slots__ = ("outcome",)
+    
+    def __init__(self):
+        self.outcome = "ok"
+
+
+@contextmanager
+def track_upstream(service: str, operation: str):
+    """
+    量測一次上游呼叫；區塊內拋出例外記為 error
+
+    用法：
+        with track_upstream("coingecko", "simple/price") as call:
+            response = session.get(...)
+            if not data:
+                call.outcome = "empty"
+    """
+    call = _UpstreamCall()
+    start = time.perf_counter()
+    try:
+        yield call
+    except BaseException:
+        call.outcome = "error"
+        raise
+    finally:
+        UPSTREAM_DURATION.observe(time.perf_counter() - start, service=service, operation=operation)
+        UPSTREAM_REQUESTS.inc(service=service, operation=operation, outcome=call.outcome)
+
+
+def upstream(service: str, operation: Optional[str] = None):
+    """
+    裝飾上游 client 的方法：以方法名稱為 operation，回傳 None 記為 empty
+
+    （client 方法多半自己吃掉例外回傳 None，所以 empty 也包含失敗）
+    """
+    def decorator(func):
+        op = operation or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with track_upstream(service, op) as call:
+                result = func(*args, **kwargs)
+                if result is None:
+                    call.outcome = "empty"
+                return result
+
+        return wrapper
+
+    return decorator
+
+
+def instrument_scheduler(scheduler):
+    """
+    用 APScheduler 事件量測 job 執行時間
+
+    submitted 記下開始時間，executed / error 時計算耗時；
+    以 (job_id, scheduled_run_time) 對應同一次執行
+    """
+    from apscheduler.events import (
+        EVENT_JOB_SUBMITTED, EVENT_JOB_EXECUTED, EVENT_JOB_ERROR, EVENT_JOB_MISSED,
+    )
+
+    started: Dict[tuple, float] = {}
+    lock = threading.Lock()
+
+    def listener(event):
+        if event.code == EVENT_JOB_SUBMITTED:
+            now = time.perf_counter()
+            with lock:
+                for run_time in event.scheduled_run_times:
+                    started[(event.job_id, run_time)] = now
+            return
+
+        if event.code == EVENT_JOB_MISSED:
+            JOB_RUNS.inc(job=event.job_id, status="missed")
+            return
+
+        with lock:
+            start = started.pop((event.job_id, event.scheduled_run_time), None)
+        if start is not None:
+            JOB_DURATION.observe(time.perf_counter() - start, job=event.job_id)
+
+        if event.code == EVENT_JOB_ERROR:
+            JOB_RUNS.inc(job=event.job_id, status="error")
+        else:
+            JOB_RUNS.inc(job=event.job_id, status="success")
+            JOB_LAST_SUCCESS.set(time.time(), job=event.job_id)
+
+    scheduler.add_listener(
+        listener,
+        EVENT_JOB_SUBMITTED | EVENT_JOB_EXECUTED | EVENT_JOB_ERROR | EVENT_JOB_MISSED,
+    )
@@ -0,0 +1,212 @@
+"""
+請求效能量測
+============
+每個請求記錄各階段耗時，回應帶 Server-Timing 標頭，並依端點累計百分位數
+
+- span(name)：量測一段程式碼，累加到目前請求（沒有請求時不做事）
+- ServerTimingMiddleware：建立請求的量測、輸出 Server-Timing、寫入統計
+- instrument_engine(engine)：SQLAlchemy 每次 cursor 執行記成 db
+- perf_stats：依端點保留最近 WINDOW_SIZE 筆，給 /api/admin/perf 查詢
+
+目前請求用 contextvars 傳遞；Starlette 的 thread pool（同步路由、
+run_in_threadpool）會複製 context，loop.run_in_executor 不會，後者的量測會略過
+"""
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional, Dict, List, Any
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# 每個端點保留的樣本數
+WINDOW_SIZE = 1000
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+class RequestTimings:
+    """單一請求的各階段耗時（ms）與次數"""
+    
+    __slots__ = ("durations", "counts", "_lock")
+    
+    def __init__(self):
+        self.durations: Dict[str, float] = defaultdict(float)
+        self.counts: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+    
+    def add(self, name: str, elapsed_ms: float):
+        with self._lock:
+            self.durations[name] += elapsed_ms
+            self.counts[name] += 1
+    
+    def header_value(self, total_ms: float) -> str:
+        parts = [
+            f'{name};dur={ms:.1f};desc="x{self.counts[name]}"'
+            for name, ms in self.durations.items()
+        ]
+        parts.append(f"total;dur={total_ms:.1f}")
+        return ", ".join(parts)
+
+
+_current: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+@contextmanager
+def span(name: str):
+    """
+    量測一段程式碼的耗時
+
+    用法：
+        with span("yahoo"):
+            df = ticker.history(...)
+    """
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, (time.perf_counter() - start) * 1000)
+
+
+def record(name: str, elapsed_ms: float):
+    """直接記錄一段已量好的耗時"""
+    timings = _current.get()
+    if timings is not None:
+        timings.add(name, elapsed_ms)
+
+
+class PerfStats:
+    """依端點累計最近 WINDOW_SIZE 筆請求的耗時"""
+    
+    def __init__(self, window: int = WINDOW_SIZE):
+        self._window = window
+        self._samples: Dict[str, deque] = {}
+        self._requests: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+    
+    def add(self, endpoint: str, total_ms: float, timings: RequestTimings):
+        sample = {"total": total_ms, **timings.durations}
+        with self._lock:
+            samples = self._samples.get(endpoint)
+            if samples is None:
+                samples = self._samples[endpoint] = deque(maxlen=self._window)
+            samples.append(sample)
+            self._requests[endpoint] += 1
+    
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+            self._requests.clear()
+    
+    @staticmethod
+    def _percentiles(values: List[float]) -> Dict[str, float]:
+        values = sorted(values)
+        n = len(values)
+        result = {
+            f"p{p}": round(values[min(n - 1, int(n * p / 100))], 1)
+            for p in PERCENTILES
+        }
+        result["max"] = round(values[-1], 1)
+        return result
+    
+    def summary(self, endpoint: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        各端點的百分位數
+    
+        Returns:
+            [{endpoint, requests, samples, total: {p50, ...}, spans: {name: {p50, ...}}}]，
+            依 total p95 由慢到快排序
+        """
+        with self._lock:
+            items = [
+                (name, self._requests[name], list(samples))
+                for name, samples in self._samples.items()
+                if endpoint is None or name == endpoint
+            ]
+    
+        result = []
+        for name, requests, samples in items:
+            span_names = sorted({key for s in samples for key in s} - {"total"})
+            result.append({
+                "endpoint": name,
+                "requests": requests,
+                "samples": len(samples),
+                "total": self._percentiles([s["total"] for s in samples]),
+                # 沒用到該階段的請求算 0，才能和 total 對照
+                "spans": {
+                    span_name: self._percentiles([s.get(span_name, 0.0) for s in samples])
+                    for span_name in span_names
+                },
+            })
+    
+        result.sort(key=lambda x: x["total"]["p95"], reverse=True)
+        return result
+
+
+perf_stats = PerfStats()
+
+
+class ServerTimingMiddleware:
+    """
+    ASGI middleware：量測每個 HTTP 請求
+    
+    - 回應標頭加上 Server-Timing（瀏覽器 DevTools 可直接看）
+    - 依路由樣板（/api/stock/{symbol}）累計到 perf_stats
+    """
+    
+    def __init__(self, app, path_prefix: str = "/api"):
+        self.app = app
+        self.path_prefix = path_prefix
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope.get("path", "").startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+    
+        timings = RequestTimings()
+        token = _current.set(timings)
+        start = time.perf_counter()
+    
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                total_ms = (time.perf_counter() - start) * 1000
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timings.header_value(total_ms).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+    
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            total_ms = (time.perf_counter() - start) * 1000
+            # 用路由樣板當 key；沒有對到路由（404）的全部歸一類，避免 key 無限增加
+            route = scope.get("route")
+            endpoint = f"{scope.get('method', '')} {getattr(route, 'path', None) or '(unmatched)'}"
+            perf_stats.add(endpoint, total_ms, timings)
+            _current.reset(token)
+
+
+def instrument_engine(engine):
+    """為同步 Engine（AsyncEngine 請傳 .sync_engine）加上 db 量測"""
+
+    # 開始時間放在這次執行的 context 上：語句失敗時不會觸發 after，context 丟掉就沒了，
+    # 不會像放在 conn.info 那樣留在連線池的連線上
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._perf_start = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, "_perf_start", None)
+        if start is not None:
+            record("db", (time.perf_counter() - start) * 1000)
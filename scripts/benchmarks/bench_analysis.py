@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+分析熱路徑效能測試（離線）
+
+不連 Yahoo / CoinGecko，也不碰正式資料庫：
+- 輸入：fixtures.py 的凍結 OHLCV（預設 data/ohlcv_synthetic_10y.csv.gz）
+- 資料庫：暫存目錄裡的 SQLite（啟動前設定 DATABASE_URL）
+- 結果：寫成 JSON（含 commit、套件版本），--compare 和舊結果比較
+
+測試項目：
+    indicators      IndicatorService.calculate_all_indicators
+    ma_advanced     analyze_ma_advanced
+    signals         SignalService.detect_signals（最近 250 天的指標快照）
+    cagr_dividends  CompareService._calculate_cagr_with_dividends（5 年、含配息）
+    split_adjust    YahooFinanceClient._detect_and_adjust_splits
+    db_save         StockHistoryService._save_to_db（SQLite）
+    db_load         StockHistoryService._load_from_db（SQLite）
+    api_stock       GET /api/stock/{symbol}（TestClient，資料來自 SQLite 快取）
+    store_load_cold ArrowHistoryStore.load，每次重新 memory-map（需要 pyarrow）
+    store_load      ArrowHistoryStore.load，已快取的檔案（需要 pyarrow）
+
+使用方式:
+    python scripts/benchmarks/bench_analysis.py
+    python scripts/benchmarks/bench_analysis.py --only indicators,signals --repeat 20
+    python scripts/benchmarks/bench_analysis.py --compare results/analysis-abc1234.json
+    python scripts/benchmarks/bench_analysis.py --frame ohlcv_aapl
+    python scripts/benchmarks/bench_analysis.py --record AAPL   # 需要網路
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# app 匯入時就會建立 engine，必須先指到暫存 SQLite
+_TMP_DIR = tempfile.mkdtemp(prefix="autostock-bench-")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(_TMP_DIR, 'bench.db')}"
+os.environ["DEBUG"] = "false"
+
+import logging  # noqa: E402
+
+import pandas as pd  # noqa: E402
+
+from fixtures import (  # noqa: E402
+    DEFAULT_FRAME, load_frame, rebase_dates, record_frame, synthetic_dividends,
+)
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+BENCH_SYMBOL = "BENCH"
+
+# 超過這個比例視為退步
+DEFAULT_THRESHOLD = 0.10
+
+
+class Case:
+    """
+    一個測試項目
+    
+    setup() 每輪執行一次（不計時），回傳值傳給 run()
+    """
+    
+    def __init__(
+        self,
+        name: str,
+        run: Callable[[Any], Any],
+        setup: Optional[Callable[[], Any]] = None,
+        repeat: Optional[int] = None,
+    ):
+        self.name = name
+        self.run = run
+        self.setup = setup
+        self.repeat = repeat
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, stderr=subprocess.DEVNULL,
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+def build_cases(frame: pd.DataFrame) -> Tuple[List[Case], Callable[[], None]]:
+    """
+    建立測試項目
+
+    Returns:
+        (cases, seed_db)；seed_db 把 fixture 寫入 SQLite，db_load / api_stock 之前呼叫
+    """
+    # SQLite 上 Postgres 專用的遷移會逐條印出 skipped，匯入時先靜音
+    with contextlib.redirect_stdout(io.StringIO()):
+        from app.main import app
+    from app.data_sources.yahoo_finance import yahoo_finance
+    from app.database import Base, SyncSessionLocal, sync_engine
+    from app.models.stock_price import StockPrice
+    from app.services.compare_service import CompareService
+    from app.services.indicator_service import IndicatorService
+    from app.services.ma_advanced_service import analyze_ma_advanced
+    from app.services.signal_service import SignalService
+    from app.services.stock_history_service import StockHistoryService
+    from app.services.stock_service import StockService
+
+    Base.metadata.create_all(sync_engine)
+
+    indicator_service = IndicatorService()
+    signal_service = SignalService()
+    compare_service = CompareService()
+
+    with_adj = yahoo_finance._detect_and_adjust_splits(frame, BENCH_SYMBOL)
+    with_adj["close_raw"] = with_adj["close"]
+    with_adj["close"] = with_adj["adj_close"]
+    indicators_df = indicator_service.calculate_all_indicators(with_adj.copy())
+    current_price = float(indicators_df["close"].iloc[-1])
+    dividends = synthetic_dividends(frame)
+
+    # 與股票報告相同格式的指標摘要，取最近 250 天各一份
+    summary = StockService(None)
+    snapshots = []
+    for i in range(len(indicators_df) - 250, len(indicators_df)):
+        window = indicators_df.iloc[: i + 1]
+        latest = window.iloc[-1]
+        snapshot = summary._get_indicators_summary(window, latest)
+        snapshot["current_price"] = float(latest["close"])
+        snapshot["volume"] = {"ratio": float(latest.get("volume_ratio", 1.0))}
+        snapshots.append(snapshot)
+
+    def detect_all(_):
+        for snapshot in snapshots:
+            signal_service.detect_signals(BENCH_SYMBOL, snapshot)
+
+    def clean_db():
+        db = SyncSessionLocal()
+        db.query(StockPrice).delete()
+        db.commit()
+        return db
+
+    def save(db):
+        try:
+            StockHistoryService(db)._save_to_db(BENCH_SYMBOL, frame)
+        finally:
+            db.close()
+
+    def seed_db():
+        db = clean_db()
+        StockHistoryService(db)._save_to_db(BENCH_SYMBOL, rebase_dates(frame))
+        db.close()
+
+    def load(_):
+        db = SyncSessionLocal()
+        try:
+            df = StockHistoryService(db)._load_from_db(BENCH_SYMBOL, 10)
+            assert df is not None and len(df) == len(frame), "db_load 筆數不符"
+        finally:
+            db.close()
+
+    from fastapi.testclient import TestClient
+    client = TestClient(app)
+
+    def get_stock(_):
+        response = client.get(f"/api/stock/{BENCH_SYMBOL}")
+        assert response.status_code == 200, f"api_stock 回應 {response.status_code}"
+        # 必須完全由 SQLite 快取提供，否則量到的是網路
+        assert response.json().get("data_source") == "cache", "api_stock 沒有使用快取"
+
+    store_cases = []
+    try:
+        from app.services.history_store import ArrowHistoryStore
+        store = ArrowHistoryStore(os.path.join(_TMP_DIR, "history"))
+        store.write(BENCH_SYMBOL, with_adj)
+
+        def store_load(s):
+            df = s.load(BENCH_SYMBOL)
+            assert df is not None and len(df) == len(frame), "store_load 筆數不符"
+
+        store_cases = [
+            Case("store_load_cold", store_load, setup=lambda: ArrowHistoryStore(store.root)),
+            Case("store_load", store_load, setup=lambda: store),
+        ]
+    except ImportError:
+        print("（未安裝 pyarrow，略過 store_load）")
+
+    return [
+        Case("indicators", lambda df: indicator_service.calculate_all_indicators(df),
+             setup=lambda: with_adj.copy()),
+        Case("ma_advanced", lambda _: analyze_ma_advanced(indicators_df, current_price)),
+        Case("signals", detect_all),
+        Case("cagr_dividends",
+             lambda df: compare_service._calculate_cagr_with_dividends(BENCH_SYMBOL, df, 5, dividends),
+             setup=lambda: with_adj.copy()),
+        Case("split_adjust", lambda _: yahoo_finance._detect_and_adjust_splits(frame, BENCH_SYMBOL)),
+        Case("db_save", save, setup=clean_db, repeat=3),
+        # seed_db 寫入一次（日期平移到今天），之後的 load / api 都讀這份
+        Case("db_load", load),
+        Case("api_stock", get_stock),
+        *store_cases,
+    ], seed_db
+
+
+def run_case(case: Case, repeat: int, warmup: int) -> Dict[str, Any]:
+    repeat = case.repeat or repeat
+    timings = []
+
+    for i in range(warmup + repeat):
+        arg = case.setup() if case.setup else None
+        start = time.perf_counter()
+        case.run(arg)
+        elapsed = (time.perf_counter() - start) * 1000
+        if i >= warmup:
+            timings.append(elapsed)
+
+    return {
+        "repeat": repeat,
+        "ms_min": round(min(timings), 3),
+        "ms_median": round(statistics.median(timings), 3),
+        "ms_mean": round(statistics.mean(timings), 3),
+        "ms_stdev": round(statistics.stdev(timings), 3) if len(timings) > 1 else 0.0,
+    }
+
+
+def compare(results: Dict[str, Dict], baseline_path: str, threshold: float) -> List[str]:
+    """和舊結果比較 median，回傳退步的項目"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+
+    print("-" * 72)
+    print(f"比較基準: {baseline_path} (commit {baseline['meta'].get('commit')})")
+    regressions = []
+    for name, result in results.items():
+        old = baseline["results"].get(name)
+        if not old:
+            print(f"{name:<16} {'(新項目)':>12}")
+            continue
+        ratio = result["ms_median"] / old["ms_median"] if old["ms_median"] else float("inf")
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "⚠️ 退步"
+            regressions.append(name)
+        elif ratio < 1 - threshold:
+            flag = "✅ 進步"
+        print(f"{name:<16} {old['ms_median']:>10.2f} -> {result['ms_median']:>10.2f} ms  x{ratio:5.2f} {flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分析熱路徑效能測試（離線）")
+    parser.add_argument("--frame", default=DEFAULT_FRAME, help="data/ 下的 fixture 名稱（不含 .csv.gz）")
+    parser.add_argument("--repeat", type=int, default=10, help="每個項目量測次數")
+    parser.add_argument("--warmup", type=int, default=1, help="每個項目預熱次數（不計入）")
+    parser.add_argument("--only", help="只跑指定項目，逗號分隔")
+    parser.add_argument("--output", help="結果 JSON 路徑（預設 results/analysis-<commit>.json）")
+    parser.add_argument("--compare", help="和舊的結果 JSON 比較")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="退步門檻（比例）")
+    parser.add_argument("--fail-on-regression", action="store_true", help="有退步時 exit code 1")
+    parser.add_argument("--record", metavar="SYMBOL", help="從 Yahoo 錄製 fixture 後結束（需要網路）")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    if args.record:
+        print(f"已儲存: {record_frame(args.record)}")
+        return
+
+    frame = load_frame(args.frame)
+    cases, seed_db = build_cases(frame)
+    if args.only:
+        wanted = set(args.only.split(","))
+        cases = [c for c in cases if c.name in wanted]
+
+    print(f"資料: {args.frame} ({len(frame)} 筆), repeat={args.repeat}, warmup={args.warmup}")
+    print("-" * 72)
+
+    results = {}
+    seeded = False
+    for case in cases:
+        if case.name in ("db_load", "api_stock") and not seeded:
+            seed_db()
+            seeded = True
+        result = run_case(case, args.repeat, args.warmup)
+        results[case.name] = result
+        print(f"{case.name:<16} median {result['ms_median']:>10.2f} ms   min {result['ms_min']:>10.2f} ms"
+              f"   ±{result['ms_stdev']:.2f}")
+
+    import numpy
+    import sqlalchemy
+    commit = git_commit()
+    output = {
+        "meta": {
+            "commit": commit,
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "frame": args.frame,
+            "rows": len(frame),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": numpy.__version__,
+            "sqlalchemy": sqlalchemy.__version__,
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+
+    path = args.output or os.path.join(RESULTS_DIR, f"analysis-{commit or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(output, f, ensure_ascii=False, indent=2)
+    print("-" * 72)
+    print(f"結果已寫入: {path}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
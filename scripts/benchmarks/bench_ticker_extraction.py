@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+RSS 股票代碼擷取效能測試
+
+比較舊版（BeautifulSoup + 三次 regex）與目前 RSSFetcher.extract_symbols
+在同一份文章語料上的吞吐量（MB/s）與結果差異
+
+語料：
+- data/rss_articles.jsonl：存下來的文章（每行 {"title", "content"}）
+- --feed：另外加入存成檔案的 RSS/Atom feed（例如 curl 下載的 substack feed）
+
+使用方式:
+    python scripts/benchmarks/bench_ticker_extraction.py
+    python scripts/benchmarks/bench_ticker_extraction.py --mb 20 --feed saved_feed.xml
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+sys.path.insert(0, ROOT)
+
+from app.services.rss_fetcher import RSSFetcher, COMMON_WORDS, KNOWN_SYMBOLS  # noqa: E402
+
+CORPUS = os.path.join(os.path.dirname(__file__), "data", "rss_articles.jsonl")
+
+
+def legacy_extract_symbols(text):
+    """舊版實作：每段文字建一次 DOM，再跑三次 regex"""
+    from bs4 import BeautifulSoup
+
+    if not text:
+        return set()
+
+    clean_text = BeautifulSoup(text, "html.parser").get_text()
+    symbols = set()
+
+    for match in re.findall(r"\$([A-Z]{1,5})\b", clean_text):
+        if match not in COMMON_WORDS:
+            symbols.add(match)
+    for match in re.findall(r"\(([A-Z]{1,5})\)", clean_text):
+        if match not in COMMON_WORDS:
+            symbols.add(match)
+    for match in re.findall(r"\b([A-Z]{1,5})\b", clean_text):
+        if match in KNOWN_SYMBOLS:
+            symbols.add(match)
+
+    return symbols
+
+
+def load_articles(feed_paths):
+    articles = []
+    with open(CORPUS, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                articles.append(json.loads(line))
+
+    fetcher = RSSFetcher()
+    for path in feed_paths:
+        with open(path, "rb") as f:
+            for article in fetcher.parse_feed(f.read()):
+                articles.append({"title": article["title"], "content": article["content"]})
+
+    return articles
+
+
+def corpus_size(articles):
+    return sum(len(a["title"].encode()) + len(a["content"].encode()) for a in articles)
+
+
+def run(name, extract, articles, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for article in articles:
+            extract(article)
+    elapsed = time.perf_counter() - start
+
+    mb = corpus_size(articles) * repeat / 1024 / 1024
+    print(f"{name:<8} {elapsed:8.3f}s  {mb / elapsed:8.2f} MB/s  {len(articles) * repeat / elapsed:10.0f} 篇/s")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RSS 股票代碼擷取效能測試")
+    parser.add_argument("--mb", type=float, default=5, help="總處理量（MB），語料會重複到這個大小")
+    parser.add_argument("--feed", action="append", default=[], help="額外的 RSS/Atom 檔案")
+    args = parser.parse_args()
+
+    fetcher = RSSFetcher()
+    articles = load_articles(args.feed)
+    size = corpus_size(articles)
+    repeat = max(1, int(args.mb * 1024 * 1024 / size))
+
+    print(f"語料: {len(articles)} 篇, {size / 1024:.1f} KB, 重複 {repeat} 次 (~{size * repeat / 1024 / 1024:.1f} MB)")
+    print("-" * 60)
+
+    # 舊版：內文與標題各解析一次；新版：合併一次掃描（與 extract_picks 相同）
+    legacy = run(
+        "legacy",
+        lambda a: legacy_extract_symbols(a["content"]) | legacy_extract_symbols(a["title"]),
+        articles, repeat,
+    )
+    current = run(
+        "current",
+        lambda a: fetcher.extract_symbols(f"{a['title']}\n{a['content']}"),
+        articles, repeat,
+    )
+    print("-" * 60)
+    print(f"加速: {legacy / current:.1f}x")
+
+    # 結果差異（新版把標籤換成空白，相鄰段落不會黏在一起，可能多抓到代碼）
+    diffs = 0
+    for article in articles:
+        old = legacy_extract_symbols(article["content"]) | legacy_extract_symbols(article["title"])
+        new = fetcher.extract_symbols(f"{article['title']}\n{article['content']}")
+        if old != new:
+            diffs += 1
+            print(f"差異: {article['title'][:40]!r} 舊版多 {sorted(old - new)} 新版多 {sorted(new - old)}")
+    print(f"結果不同的文章: {diffs} / {len(articles)}")
+
+
+if __name__ == "__main__":
+    main()
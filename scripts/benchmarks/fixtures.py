@@ -0,0 +1,80 @@
+"""
+效能測試用的 OHLCV 資料
+======================
+- synthetic_ohlcv：固定 seed 的幾何布朗運動（與 replay 資料來源共用），預設在中間插入一次 1 拆 4
+- synthetic_dividends：每季配息
+- load_frame / save_frame：data/ 下凍結的資料（csv.gz），避免 numpy 版本
+  改變亂數序列時輸入跟著變動
+- record_frame：從 Yahoo 抓真實資料存成 fixture（需要網路，只在錄製時用）
+
+DataFrame 欄位與 yahoo_finance.get_stock_history() 相同：
+date, open, high, low, close, volume（adj_close 由被測程式自己計算）
+"""
+import os
+from datetime import date
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from app.data_sources.replay import last_business_day, synthetic_ohlcv  # noqa: F401
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+# 預設凍結資料：10 年日線，第 1500 根 K 棒 1 拆 4
+DEFAULT_FRAME = "ohlcv_synthetic_10y"
+
+OHLCV_COLUMNS = ["date", "open", "high", "low", "close", "volume"]
+
+
+def synthetic_dividends(df: pd.DataFrame, every: int = 63, yield_pct: float = 0.5) -> pd.DataFrame:
+    """每 every 根 K 棒配一次息，金額為當時收盤價的 yield_pct%"""
+    picks = df.iloc[every::every]
+    return pd.DataFrame({
+        "date": picks["date"].to_numpy(),
+        "amount": np.round(picks["close"].to_numpy() * yield_pct / 100, 4),
+    })
+
+
+def rebase_dates(df: pd.DataFrame, end: Optional[date] = None) -> pd.DataFrame:
+    """把資料平移到以 end（預設最近的平日）結束，讓「快取是否夠新」的判斷成立"""
+    dates = pd.bdate_range(end=pd.Timestamp(last_business_day(end)), periods=len(df))
+    df = df.copy()
+    df["date"] = dates.date
+    return df
+
+
+def frame_path(name: str) -> str:
+    return os.path.join(DATA_DIR, f"{name}.csv.gz")
+
+
+def save_frame(df: pd.DataFrame, name: str) -> str:
+    path = frame_path(name)
+    df[OHLCV_COLUMNS].to_csv(path, index=False, compression="gzip")
+    return path
+
+
+def load_frame(name: str = DEFAULT_FRAME) -> pd.DataFrame:
+    """讀取凍結的 fixture；預設資料不存在時用 synthetic_ohlcv() 產生"""
+    path = frame_path(name)
+    if not os.path.exists(path):
+        if name != DEFAULT_FRAME:
+            raise FileNotFoundError(path)
+        return synthetic_ohlcv()
+
+    df = pd.read_csv(path, compression="gzip")
+    df["date"] = pd.to_datetime(df["date"]).dt.date
+    df["volume"] = df["volume"].astype("int64")
+    return df
+
+
+def record_frame(symbol: str, period: str = "10y") -> str:
+    """從 Yahoo 下載真實日線存成 fixture（ohlcv_<symbol>）"""
+    from app.data_sources.yahoo_finance import yahoo_finance
+
+    df = yahoo_finance.get_stock_history(symbol, period=period)
+    if df is None or df.empty:
+        raise RuntimeError(f"無法取得 {symbol} 的資料")
+
+    name = "ohlcv_" + symbol.lower().replace(".", "_").replace("^", "")
+    return save_frame(df, name)
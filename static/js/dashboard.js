@@ -19,6 +19,9 @@
     let currentSentimentMarket = '';
     let currentSentimentName = '';
     
+    // 指數走勢圖的點數（後端 LTTB 降採樣，5Y 不再送每一天）
+    const INDEX_CHART_POINTS = 400;
+    
     // ============================================================
     // BTC 價格
     // ============================================================
@@ -177,7 +180,7 @@
         });
         
         try {
-            const res = await fetch(`/api/market/indices/${currentIndexSymbol}/history?days=${days}`);
+            const res = await fetch(`/api/market/indices/${currentIndexSymbol}/history?days=${days}&points=${INDEX_CHART_POINTS}`);
             const data = await res.json();
             
             if (data.success && data.data && data.data.history) {